@@ -1,5 +1,6 @@
 ﻿import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,6 +21,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Работает только при DDS_PERFORMANCE_MIDDLEWARE = True
+    'dds_app.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,10 +54,86 @@ TEMPLATES = [
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Прагмы SQLite, которые выполняются при каждом подключении (сигнал connection_created)
+DDS_SQLITE_PRAGMAS = {}
+
+# Профиль БД для нескольких воркеров: журнал WAL (чтение не блокирует запись),
+# прагмы производительности и BEGIN IMMEDIATE для транзакций записи
+DDS_DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'default')
+if DDS_DB_PROFILE == 'production':
+    DATABASES['default']['ENGINE'] = 'dds_app.backends.sqlite3'
+    DDS_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        # В режиме WAL NORMAL не теряет целостность, а fsync нужен только при checkpoint
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        # Отрицательное значение - размер кеша страниц в КиБ
+        'cache_size': -64 * 1024,
+        # Ожидание блокировки записи вместо немедленной ошибки, мс
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    }
+
+# Версии кешированных данных должны быть общими для всех воркеров. LocMemCache
+# годится только для одного процесса (runserver, тесты); в профиле production
+# по умолчанию файловый кеш рядом с файлом БД, а LocMemCache не допускается
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+if DDS_DB_PROFILE == 'production':
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ.get(
+                'DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+            ),
+            'LOCATION': os.environ.get(
+                'DJANGO_CACHE_LOCATION', f"{DATABASES['default']['NAME']}-cache"
+            ),
+        }
+    }
+    if CACHES['default']['BACKEND'] == LOCMEM_CACHE:
+        raise ImproperlyConfigured(
+            'Профиль production требует кеша, общего для процессов: '
+            'LocMemCache у каждого воркера свой, и версии кеша расходятся'
+        )
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', LOCMEM_CACHE),
+            'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+        }
+    }
+
+# Замеры запросов: заголовок Server-Timing и журнал dds_app.performance.
+# Выключенный middleware исключается из цепочки и ничего не стоит
+DDS_PERFORMANCE_MIDDLEWARE = os.environ.get('DJANGO_PERFORMANCE_MIDDLEWARE') == '1'
+# Запросы к БД дольше порога (мс) записываются в журнал целиком
+DDS_SLOW_QUERY_MS = float(os.environ.get('DJANGO_SLOW_QUERY_MS', '100'))
+
+# Токен API пакетной загрузки (Authorization: Bearer ...). Без токена API
+# отвечает 503, если загрузка без проверки не разрешена явно
+DDS_INGEST_TOKEN = os.environ.get('DJANGO_INGEST_TOKEN', '')
+DDS_INGEST_ALLOW_ANONYMOUS = os.environ.get('DJANGO_INGEST_ALLOW_ANONYMOUS') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'dds_app.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 LANGUAGE_CODE = 'ru-ru'
 TIME_ZONE = 'Europe/Moscow'
 USE_I18N = True
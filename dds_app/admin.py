@@ -1,5 +1,10 @@
 ﻿from django.contrib import admin
-from .models import Status, TransactionType, Category, Subcategory, Transaction
+from django.db.models import Q
+from .models import (
+    Status, TransactionType, Category, Subcategory, Transaction, DailyCashFlowSummary,
+    IngestionBatch, TransactionArchive
+)
+from .search import search_transactions
 
 @admin.register(Status)
 class StatusAdmin(admin.ModelAdmin):
@@ -9,9 +14,9 @@ class StatusAdmin(admin.ModelAdmin):
 
 @admin.register(TransactionType)
 class TransactionTypeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description', 'created_at']
+    list_display = ['name', 'direction', 'description', 'created_at']
     search_fields = ['name', 'description']
-    list_filter = ['created_at']
+    list_filter = ['direction', 'created_at']
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -34,10 +39,20 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = [
         'created_date', 'transaction_type', 'category', 'status', 'created_at'
     ]
-    search_fields = ['comment', 'amount']
+    # Комментарии ищутся по полнотекстовому индексу в get_search_results
+    search_fields = ['amount']
     date_hierarchy = 'created_date'
     readonly_fields = ['created_at', 'updated_at']
     
+    def get_search_results(self, request, queryset, search_term):
+        by_amount, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        by_comment = search_transactions(queryset, search_term)
+        if by_comment is queryset:
+            return by_amount, may_have_duplicates
+        return queryset.filter(
+            Q(pk__in=by_comment.values('pk')) | Q(pk__in=by_amount.values('pk'))
+        ), may_have_duplicates
+    
     fieldsets = (
         ('Основная информация', {
             'fields': ('created_date', 'status', 'transaction_type')
@@ -52,4 +67,51 @@ class TransactionAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(DailyCashFlowSummary)
+class DailyCashFlowSummaryAdmin(admin.ModelAdmin):
+    list_display = [
+        'created_date', 'transaction_type', 'category', 'subcategory',
+        'status', 'total', 'transaction_count'
+    ]
+    list_filter = ['transaction_type', 'status']
+    date_hierarchy = 'created_date'
+    
+    # Итоги поддерживаются автоматически, ручное редактирование запрещено
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(IngestionBatch)
+class IngestionBatchAdmin(admin.ModelAdmin):
+    list_display = ['key', 'transaction_count', 'created_at']
+    search_fields = ['key']
+    date_hierarchy = 'created_at'
+    
+    # Пакеты создаются только через API загрузки
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    list_display = ['year', 'row_count', 'archived_at']
+    
+    # Архивы создаются командой archive_transactions, строка без таблицы сломала бы журнал
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
\ No newline at end of file
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DdsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dds_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,179 @@
+from datetime import date
+from django.db import connection
+from django.db.models import Count, F
+from django.db.models.functions import ExtractYear
+from .caching import get_or_compute, invalidate
+from .locking import write_atomic
+from .models import LedgerState, LedgerTransaction, Transaction, TransactionArchive
+from .search import index_rows, rebuild_search_source
+
+# По умолчанию архивируются годы до позапрошлого включительно:
+# текущий и прошлый год остаются в рабочей таблице
+HOT_YEARS = 2
+ARCHIVE_BATCH_SIZE = 10000
+
+def archive_table(year):
+    return f'{Transaction._meta.db_table}_{year}'
+
+def transaction_columns():
+    """Колонки транзакции в порядке модели - общие для рабочей и архивных таблиц"""
+    return [connection.ops.quote_name(field.column) for field in Transaction._meta.concrete_fields]
+
+def archived_years():
+    """Годы, перенесенные в архив, из кеша; пустой кортеж, если архива нет"""
+    return get_or_compute('archive', 'years', lambda: tuple(
+        TransactionArchive.objects.order_by('year').values_list('year', flat=True)
+    ))
+
+def hot_start():
+    """Первый день открытого периода или None, если архива нет.
+
+    Все дни до него закрыты: транзакции с такими датами не создаются
+    и не редактируются, а читаются через журнал с архивом.
+    """
+    years = archived_years()
+    return date(years[-1] + 1, 1, 1) if years else None
+
+def is_closed(value):
+    """Относится ли дата к закрытому (архивному) периоду"""
+    start = hot_start()
+    return start is not None and value < start
+
+def ledger_for(start_date=None):
+    """Транзакции для выборки с началом периода start_date.
+
+    Если период целиком открыт, запрос идет только к рабочей таблице,
+    иначе - к представлению с архивными таблицами.
+    """
+    start = hot_start()
+    if start is None or (start_date is not None and start_date >= start):
+        return Transaction.objects.all()
+    return LedgerTransaction.objects.all()
+
+def pending_years(until_year):
+    """Годы до until_year включительно с транзакциями в рабочей таблице: {год: количество}"""
+    rows = Transaction.objects.filter(created_date__lt=date(until_year + 1, 1, 1)).order_by().annotate(
+        year=ExtractYear('created_date')
+    ).values('year').annotate(count=Count('id')).order_by('year')
+    return {row['year']: row['count'] for row in rows}
+
+def create_archive_table(year):
+    """Архивная таблица года с колонками и внешними ключами рабочей таблицы.
+
+    Внешние ключи проверяются сразу, а не при фиксации: справочник, на который
+    ссылаются только архивные строки, нельзя удалить - PROTECT рабочей таблицы
+    Django проверяет сам, а об архивных таблицах он не знает. Индексы по
+    ключам нужны, чтобы проверка при удалении справочника не читала архив целиком.
+    """
+    quote = connection.ops.quote_name
+    table = archive_table(year)
+    editor = connection.schema_editor()
+    columns = []
+    indexes = [('date_idx', [quote('created_date'), quote('created_at')])]
+    for field in Transaction._meta.concrete_fields:
+        definition, _ = editor.column_sql(Transaction, field)
+        if field.remote_field and field.db_constraint:
+            target = field.target_field
+            definition += f' REFERENCES {quote(target.model._meta.db_table)} ({quote(target.column)})'
+            indexes.append((f'{field.column}_idx', [quote(field.column)]))
+        columns.append(f'{quote(field.column)} {definition}')
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {quote(table)} ({", ".join(columns)})')
+        for suffix, index_columns in indexes:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {quote(f"{table}_{suffix}")} '
+                f'ON {quote(table)} ({", ".join(index_columns)})'
+            )
+
+def rebuild_ledger_view(years):
+    """Пересоздает представление журнала и источник текста поискового индекса:
+    рабочая таблица и архивы годов years"""
+    years = list(years)
+    rebuild_search_source([Transaction._meta.db_table] + [archive_table(year) for year in years])
+    quote = connection.ops.quote_name
+    columns = ', '.join(transaction_columns())
+    selects = [f'SELECT {columns}, 0 AS archived FROM {quote(Transaction._meta.db_table)}']
+    selects += [f'SELECT {columns}, 1 AS archived FROM {quote(archive_table(year))}' for year in years]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP VIEW IF EXISTS {quote(LedgerTransaction._meta.db_table)}')
+        cursor.execute(
+            f'CREATE VIEW {quote(LedgerTransaction._meta.db_table)} AS ' + ' UNION ALL '.join(selects)
+        )
+
+def archive_year(year, batch_size=ARCHIVE_BATCH_SIZE):
+    """Переносит транзакции года из рабочей таблицы в архивную пакетами.
+
+    Сначала архивная таблица включается в представление журнала, затем каждый
+    пакет копируется и удаляется из рабочей таблицы в отдельной транзакции БД:
+    блокировка записи держится только на время пакета, а строка в любой момент
+    видна в журнале ровно один раз. Дневные итоги не меняются - суммы
+    по закрытому году остаются прежними. Возвращает число перенесенных строк.
+    """
+    quote = connection.ops.quote_name
+    with write_atomic():
+        create_archive_table(year)
+        TransactionArchive.objects.get_or_create(year=year)
+        rebuild_ledger_view(TransactionArchive.objects.order_by('year').values_list('year', flat=True))
+        invalidate('archive')
+
+    period = Transaction.objects.filter(
+        created_date__gte=date(year, 1, 1), created_date__lt=date(year + 1, 1, 1)
+    )
+    columns = ', '.join(transaction_columns())
+    date_column = quote(Transaction._meta.get_field('created_date').column)
+    pk_column = quote(Transaction._meta.pk.column)
+    condition = (
+        f'{date_column} >= %s AND {date_column} < %s '
+        f'AND {pk_column} > %s AND {pk_column} <= %s'
+    )
+    with connection.cursor() as cursor:
+        # Повторный запуск продолжает после уже перенесенных строк года:
+        # они не должны попасть в поисковый индекс второй раз
+        cursor.execute(f'SELECT MAX({pk_column}) FROM {quote(archive_table(year))}')
+        first_id = cursor.fetchone()[0] or 0
+    moved = 0
+    while True:
+        # Граница пакета по первичному ключу: пакет - не больше batch_size строк
+        last_ids = list(period.order_by('pk').values_list('pk', flat=True)[batch_size - 1:batch_size])
+        last_id = last_ids[0] if last_ids else period.order_by('-pk').values_list('pk', flat=True).first()
+        if last_id is None:
+            break
+        params = [date(year, 1, 1), date(year + 1, 1, 1), first_id, last_id]
+        with write_atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {quote(archive_table(year))} ({columns}) '
+                    f'SELECT {columns} FROM {quote(Transaction._meta.db_table)} WHERE {condition}',
+                    params,
+                )
+                cursor.execute(
+                    f'DELETE FROM {quote(Transaction._meta.db_table)} WHERE {condition}', params
+                )
+                count = cursor.rowcount
+            # Триггер удаления убрал строки из поискового индекса, а у архивной
+            # таблицы триггеров нет - пакет индексируется заново явно
+            index_rows(archive_table(year), condition, params)
+            TransactionArchive.objects.filter(year=year).update(row_count=F('row_count') + count)
+            # Для условных GET-запросов перенос выглядит как удаление из рабочей таблицы
+            LedgerState.record(moved=count)
+            invalidate('ledger')
+        moved += count
+        first_id = last_id
+    return moved
+
+def drop_archives():
+    """Удаляет все архивные таблицы вместе с транзакциями; возвращает число удаленных строк"""
+    quote = connection.ops.quote_name
+    with write_atomic():
+        archives = list(TransactionArchive.objects.all())
+        if not archives:
+            return 0
+        rebuild_ledger_view([])
+        with connection.cursor() as cursor:
+            for archive in archives:
+                index_rows(archive_table(archive.year), delete=True)
+                cursor.execute(f'DROP TABLE IF EXISTS {quote(archive_table(archive.year))}')
+        TransactionArchive.objects.all().delete()
+        invalidate('archive')
+        invalidate('ledger')
+    return sum(archive.row_count for archive in archives)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from django.db.backends.sqlite3 import base
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, в котором транзакции записи начинаются с BEGIN IMMEDIATE.
+
+    Обычный BEGIN берет блокировку записи только на первом изменении: если
+    транзакция сначала читает, а параллельная запись успевает завершиться,
+    SQLite отвечает "database is locked" сразу, не дожидаясь busy_timeout.
+    BEGIN IMMEDIATE берет блокировку записи в начале транзакции, и
+    конкурирующие записи ждут в очереди по busy_timeout. Так начинаются
+    только блоки dds_app.locking.write_atomic(): читающие транзакции
+    остаются на обычном BEGIN и не ждут записей.
+    """
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
\ No newline at end of file
@@ -0,0 +1,245 @@
+import asyncio
+import math
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Category, Transaction, TransactionType
+from .pagination import CursorPaginator
+from .search import search_words
+
+# Допустимый рост p95 относительно базового прогона и минимальный рост в мс,
+# который считается регрессией, а не шумом измерений
+DEFAULT_THRESHOLD = 0.2
+MIN_REGRESSION_MS = 2.0
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+def default_scenarios():
+    """Сценарии (название, путь, параметры GET) по текущему содержимому БД"""
+    scenarios = [
+        ('dashboard', reverse('dashboard'), {}),
+        ('list', reverse('transaction_list'), {}),
+        ('reference_management', reverse('reference_management'), {}),
+        ('ajax_reference_tree', reverse('ajax_reference_tree'), {}),
+        ('report_by_category', reverse('cash_flow_report'), {'group_by': 'category'}),
+    ]
+    transaction_type = TransactionType.objects.filter(
+        direction=TransactionType.Direction.EXPENSE
+    ).first()
+    category = Category.objects.order_by('pk').first()
+    latest = Transaction.objects.first()
+    if transaction_type:
+        scenarios.append(
+            ('list_by_type', reverse('transaction_list'), {'transaction_type': transaction_type.pk})
+        )
+        scenarios.append(
+            ('ajax_load_categories', reverse('ajax_load_categories'),
+             {'transaction_type_id': transaction_type.pk})
+        )
+    if category:
+        scenarios.append(
+            ('ajax_load_subcategories', reverse('ajax_load_subcategories'),
+             {'category_id': category.pk})
+        )
+    if category and latest:
+        scenarios.append((
+            'list_by_category_quarter', reverse('transaction_list'), {
+                'category': category.pk,
+                'start_date': latest.created_date - timedelta(days=90),
+                'end_date': latest.created_date,
+            }
+        ))
+    # Поиск по первому слову комментария самой новой транзакции с комментарием
+    commented = Transaction.objects.exclude(comment='').values_list('comment', flat=True).first()
+    words = search_words(commented or '')
+    if words:
+        scenarios.append(('list_search', reverse('transaction_list'), {'search': words[0]}))
+
+    count = Transaction.objects.count()
+    if count:
+        # Глубокая страница: середина журнала в обычном и курсорном режиме
+        per_page = 15
+        middle_page = max(math.ceil(count / per_page) // 2, 1)
+        scenarios.append(('list_deep_page', reverse('transaction_list'), {'page': middle_page}))
+        middle = Transaction.objects.order_by('-created_date', '-created_at', '-id')[count // 2]
+        cursor = CursorPaginator(Transaction.objects.all(), per_page).encode_cursor(middle, 'next')
+        scenarios.append(
+            ('list_deep_cursor', reverse('transaction_list'),
+             {'pagination': 'cursor', 'cursor': cursor})
+        )
+    return scenarios
+
+def measure(client, path, params, iterations=30, warmup=3):
+    """Задержка, запросы к БД и пиковая память для одного URL"""
+    for _ in range(warmup):
+        client.get(path, params)
+
+    latencies, query_counts, sql_times = [], [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(path, params)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} {params}: HTTP {response.status_code}')
+        query_counts.append(len(queries))
+        sql_times.append(sum(float(query['time']) for query in queries.captured_queries) * 1000)
+
+    # Память измеряется отдельным запросом: tracemalloc заметно замедляет выполнение
+    tracemalloc.start()
+    try:
+        client.get(path, params)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries': max(query_counts),
+        'sql_ms': round(percentile(sql_times, 50), 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+def run_scenarios(scenarios=None, iterations=30, warmup=3, user=None):
+    """Результаты measure() по всем сценариям в порядке их следования"""
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    if scenarios is None:
+        scenarios = default_scenarios()
+    return {
+        name: measure(client, path, params, iterations=iterations, warmup=warmup)
+        for name, path, params in scenarios
+    }
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Регрессии относительно базового прогона.
+
+    results и baseline - словари {размер: {сценарий: метрики}}; сравниваются
+    только пары, присутствующие в обоих. Регрессия - рост числа запросов или
+    рост p95 больше чем на threshold (и не меньше MIN_REGRESSION_MS).
+    """
+    regressions = []
+    for size, scenarios in results.items():
+        for name, metrics in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if metrics['queries'] > base['queries']:
+                regressions.append(
+                    f'{size}/{name}: запросов {base["queries"]} -> {metrics["queries"]}'
+                )
+            growth = metrics['p95_ms'] - base['p95_ms']
+            if growth > MIN_REGRESSION_MS and growth > base['p95_ms'] * threshold:
+                regressions.append(
+                    f'{size}/{name}: p95 {base["p95_ms"]} -> {metrics["p95_ms"]} мс'
+                )
+    return regressions
+
+
+def concurrent_scenarios():
+    """Сценарии сравнения WSGI и ASGI: синхронный и асинхронный дашборд, статистика списка"""
+    latest = Transaction.objects.first()
+    stats_params = {}
+    if latest:
+        stats_params = {'start_date': latest.created_date - timedelta(days=90)}
+    return [
+        ('dashboard', reverse('dashboard'), {}),
+        ('dashboard_async', reverse('dashboard_async'), {}),
+        ('transaction_stats', reverse('transaction_stats'), stats_params),
+    ]
+
+def summarize(latencies, elapsed):
+    return {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'rps': round(len(latencies) / elapsed, 1),
+    }
+
+def check_response(path, params, response):
+    if response.status_code != 200:
+        raise RuntimeError(f'{path} {params}: HTTP {response.status_code}')
+
+def load_wsgi(path, params, clients=8, requests=20, warmup=1, user=None):
+    """Задержки при clients одновременных клиентах на синхронном обработчике в потоках.
+
+    Так работает WSGI-сервер с пулом потоков: каждый запрос целиком
+    обрабатывается своим потоком со своим соединением с БД.
+    """
+    def worker():
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for _ in range(warmup):
+            client.get(path, params)
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(path, params)
+            latencies.append((time.perf_counter() - started) * 1000)
+            check_response(path, params, response)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(worker) for _ in range(clients)]
+        latencies = [latency for future in futures for latency in future.result()]
+    return summarize(latencies, time.perf_counter() - started)
+
+def load_asgi(path, params, clients=8, requests=20, warmup=1, user=None):
+    """Задержки при clients одновременных клиентах на асинхронном обработчике.
+
+    Так работает ASGI-сервер: все запросы обслуживает один цикл событий,
+    синхронные части (middleware, синхронные представления) выполняются
+    в общем потоке через sync_to_async.
+    """
+    async_clients = [AsyncClient() for _ in range(clients)]
+    if user is not None:
+        for client in async_clients:
+            client.force_login(user)
+
+    async def worker(client):
+        for _ in range(warmup):
+            await client.get(path, params)
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get(path, params)
+            latencies.append((time.perf_counter() - started) * 1000)
+            check_response(path, params, response)
+        return latencies
+
+    async def run():
+        return await asyncio.gather(*(worker(client) for client in async_clients))
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    latencies = [latency for result in results for latency in result]
+    return summarize(latencies, time.perf_counter() - started)
+
+def run_concurrent(scenarios=None, clients=8, requests=20, warmup=1, user=None):
+    """Результаты load_wsgi() и load_asgi() по сценариям: {сценарий: {'wsgi': ..., 'asgi': ...}}"""
+    if scenarios is None:
+        scenarios = concurrent_scenarios()
+    options = {'clients': clients, 'requests': requests, 'warmup': warmup, 'user': user}
+    return {
+        name: {
+            'wsgi': load_wsgi(path, params, **options),
+            'asgi': load_asgi(path, params, **options),
+        }
+        for name, path, params in scenarios
+    }
\ No newline at end of file
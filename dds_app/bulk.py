@@ -0,0 +1,77 @@
+from decimal import Decimal
+from django.db import connection
+from django.utils import timezone
+from .caching import invalidate
+from .locking import write_atomic
+from .models import LedgerState, Transaction
+from .summaries import BUCKET_FIELDS, CENT, apply_deltas, grouped_transactions
+
+def summary_groups(queryset):
+    """Суммы и количества выбранных транзакций по ключам дневных итогов"""
+    return [
+        (
+            tuple(row[field] for field in BUCKET_FIELDS),
+            # SUM в SQLite считается в плавающей точке
+            Decimal(row['total']).quantize(CENT),
+            row['transaction_count'],
+        )
+        for row in grouped_transactions(queryset)
+    ]
+
+def add_delta(deltas, key, total, count):
+    old_total, old_count = deltas.get(key, (0, 0))
+    deltas[key] = (old_total + total, old_count + count)
+
+def bulk_update_transactions(queryset, **values):
+    """Изменяет справочники выбранных транзакций одним UPDATE.
+
+    values - новые значения полей дневных итогов (status, category и т.д.)
+    как объекты справочников. Сигналы при UPDATE не отправляются, поэтому
+    дневные итоги переносятся по группам выбранных транзакций, а кеш журнала
+    сбрасывается один раз на всю операцию. Возвращает число измененных строк.
+    """
+    changes = {f'{name}_id': obj.pk for name, obj in values.items()}
+    positions = {field: index for index, field in enumerate(BUCKET_FIELDS)}
+    with write_atomic():
+        groups = summary_groups(queryset)
+        # updated_at обновляется явно: auto_now при UPDATE не срабатывает,
+        # а по нему условные GET-запросы узнают об изменении журнала
+        updated = queryset.order_by().update(updated_at=timezone.now(), **values)
+        deltas = {}
+        for key, total, count in groups:
+            new_key = list(key)
+            for field, value in changes.items():
+                new_key[positions[field]] = value
+            add_delta(deltas, key, -total, -count)
+            add_delta(deltas, tuple(new_key), total, count)
+        apply_deltas(deltas)
+        invalidate('ledger')
+    return updated
+
+def bulk_delete_transactions(queryset):
+    """Удаляет выбранные транзакции одним DELETE, минуя сигналы.
+
+    QuerySet.delete() при наличии обработчиков post_delete загружает
+    и удаляет транзакции по одной, поэтому удаление выполняется запросом
+    с подзапросом первичных ключей. Возвращает число удаленных строк.
+    """
+    quote = connection.ops.quote_name
+    pks, params = queryset.order_by().values('pk').query.sql_with_params()
+    with write_atomic():
+        groups = summary_groups(queryset)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE {} IN ({})'.format(
+                    quote(Transaction._meta.db_table), quote(Transaction._meta.pk.column), pks
+                ),
+                params,
+            )
+            deleted = cursor.rowcount
+        deltas = {}
+        for key, total, count in groups:
+            add_delta(deltas, key, -total, -count)
+        apply_deltas(deltas)
+        if deleted:
+            LedgerState.record_deletions(deleted)
+        invalidate('ledger')
+    return deleted
\ No newline at end of file
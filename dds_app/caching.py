@@ -0,0 +1,42 @@
+import time
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+def version_key(name):
+    return f'dds_app:{name}:version'
+
+def get_version(name):
+    """Возвращает текущую версию набора данных name из общего кеша"""
+    version = cache.get(version_key(name))
+    if version is None:
+        # Начальная версия по времени, чтобы после вытеснения ключа из кеша
+        # не вернуться к номеру, под которым еще лежат устаревшие значения
+        cache.add(version_key(name), int(time.time() * 1000), timeout=None)
+        version = cache.get(version_key(name))
+    return version
+
+def bump_version(name):
+    """Увеличивает версию набора данных name, делая устаревшими все его кешированные значения"""
+    try:
+        return cache.incr(version_key(name))
+    except ValueError:
+        return get_version(name)
+
+def invalidate(name):
+    """Делает устаревшими кешированные данные name сразу и после фиксации транзакции БД.
+
+    Повторное увеличение версии после COMMIT не дает параллельному запросу
+    закешировать данные, прочитанные до фиксации, под новой версией.
+    """
+    bump_version(name)
+    transaction.on_commit(lambda: bump_version(name))
+
+def get_or_compute(name, key, compute, timeout=DEFAULT_TIMEOUT):
+    """Возвращает значение из кеша для текущей версии name или вычисляет и сохраняет его"""
+    cache_key = f'dds_app:{name}:{get_version(name)}:{key}'
+    value = cache.get(cache_key)
+    if value is None:
+        value = compute()
+        cache.set(cache_key, value, timeout)
+    return value
@@ -0,0 +1,101 @@
+import hashlib
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import messages
+from django.db.models import Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+from .models import LedgerState, Transaction
+from .references import get_references
+
+def ledger_fingerprint():
+    """Отпечаток журнала одним запросом: последнее изменение, число строк и число удалений.
+
+    Счетчики читаются из строки состояния журнала по первичному ключу,
+    последнее изменение - по индексу txn_updated_idx.
+    """
+    last_updated = Transaction.objects.order_by('-updated_at').values('updated_at')[:1]
+    return LedgerState.objects.filter(pk=1).annotate(
+        last_updated=Subquery(last_updated),
+    ).values('deletion_count', 'updated_at', 'last_updated', 'transaction_count').first()
+
+def get_request_fingerprint(request):
+    """Отпечаток журнала, вычисленный один раз на запрос"""
+    if not hasattr(request, '_ledger_fingerprint'):
+        request._ledger_fingerprint = ledger_fingerprint()
+    return request._ledger_fingerprint
+
+def ledger_etag(request, *args, **kwargs):
+    """ETag страницы, зависящей от журнала: отпечаток журнала, справочники, URL и пользователь"""
+    # Непоказанные сообщения должны попасть на страницу, поэтому 304 не отдаем
+    if len(messages.get_messages(request)):
+        return None
+    fingerprint = get_request_fingerprint(request)
+    if fingerprint is None:
+        return None
+    source = '|'.join(str(part) for part in (
+        fingerprint['deletion_count'],
+        fingerprint['last_updated'],
+        fingerprint['transaction_count'],
+        get_references().fingerprint,
+        request.get_full_path(),
+        request.user.pk,
+    ))
+    return hashlib.sha256(source.encode()).hexdigest()
+
+def ledger_last_modified(request, *args, **kwargs):
+    """Время последнего изменения журнала, включая удаления"""
+    if len(messages.get_messages(request)):
+        return None
+    fingerprint = get_request_fingerprint(request)
+    if fingerprint is None:
+        return None
+    return max(filter(None, (fingerprint['last_updated'], fingerprint['updated_at'])))
+
+def ledger_validators(request):
+    """ETag в кавычках и время изменения (timestamp) для асинхронных представлений"""
+    etag = ledger_etag(request)
+    last_modified = ledger_last_modified(request)
+    return (
+        quote_etag(etag) if etag is not None else None,
+        int(last_modified.timestamp()) if last_modified else None,
+    )
+
+def ledger_condition(view_func):
+    """Декоратор представлений с данными журнала: ответ 304, пока журнал не изменился"""
+    if iscoroutinefunction(view_func):
+        return async_ledger_condition(view_func)
+    conditional_view = condition(
+        etag_func=ledger_etag, last_modified_func=ledger_last_modified
+    )(view_func)
+    
+    @wraps(view_func)
+    def inner(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        # Браузер хранит страницу, но перепроверяет ее при каждом обращении
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return inner
+
+def async_ledger_condition(view_func):
+    """ledger_condition для асинхронных представлений.
+
+    condition() в Django 4.2 не поддерживает корутины, поэтому проверка
+    заголовков повторяет его логику; отпечаток журнала читается до запуска
+    представления, как и в синхронном варианте.
+    """
+    @wraps(view_func)
+    async def inner(request, *args, **kwargs):
+        etag, last_modified = await sync_to_async(ledger_validators)(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view_func(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return inner
\ No newline at end of file
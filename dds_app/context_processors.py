@@ -1,21 +1,53 @@
-﻿def global_stats(request):
-    """Глобальная статистика для всех шаблонов"""
-    from .models import Transaction
-    from django.db.models import Sum, Q
+﻿class GlobalStats:
+    """Глобальная статистика, которая считается только при обращении из шаблона"""
     
-    if request.user.is_authenticated:
-        total_income = Transaction.objects.filter(
-            transaction_type__name='Пополнение'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
+    def __init__(self):
+        self._stats = None
+    
+    def get_stats(self):
+        from .caching import get_or_compute
         
-        total_expense = Transaction.objects.filter(
-            transaction_type__name='Списание'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
+        if self._stats is None:
+            self._stats = get_or_compute('ledger', 'global_stats', self.compute)
+        return self._stats
+    
+    @staticmethod
+    def compute():
+        from .models import DailyCashFlowSummary, TransactionType
+        from django.db.models import Sum, Q
         
+        # Оба итога одним запросом к дневным итогам
+        direction = TransactionType.Direction
+        totals = DailyCashFlowSummary.objects.aggregate(
+            income=Sum('total', filter=Q(transaction_type__direction=direction.INCOME)),
+            expense=Sum('total', filter=Q(transaction_type__direction=direction.EXPENSE)),
+        )
+        total_income = totals['income'] or 0
+        total_expense = totals['expense'] or 0
         return {
             'global_balance': total_income - total_expense,
             'global_income': total_income,
             'global_expense': total_expense,
         }
     
+    # Шаблоны вызывают вызываемые переменные контекста при обращении к ним
+    def balance(self):
+        return self.get_stats()['global_balance']
+    
+    def income(self):
+        return self.get_stats()['global_income']
+    
+    def expense(self):
+        return self.get_stats()['global_expense']
+
+def global_stats(request):
+    """Глобальная статистика для всех шаблонов"""
+    if request.user.is_authenticated:
+        stats = GlobalStats()
+        return {
+            'global_balance': stats.balance,
+            'global_income': stats.income,
+            'global_expense': stats.expense,
+        }
+    
     return {}
\ No newline at end of file
@@ -0,0 +1,150 @@
+import csv
+import re
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from .importing import IMPORT_FIELDS
+from .summaries import CENT
+
+# Колонки выгрузки - колонки импорта и остаток после операции, который импорт
+# пропускает, поэтому файл можно загрузить обратно
+EXPORT_FIELDS = IMPORT_FIELDS + ('balance',)
+EXPORT_VALUES = (
+    'created_date', 'status__name', 'transaction_type__name', 'category__name',
+    'subcategory__name', 'amount', 'comment', 'running_balance',
+)
+EXPORT_CHUNK_SIZE = 2000
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Кортежи значений транзакций с названиями справочников, читаемые из БД порциями.
+
+    queryset должен быть аннотирован остатком (reports.with_running_balance).
+    """
+    for row in queryset.values_list(*EXPORT_VALUES).iterator(chunk_size=chunk_size):
+        # Вычисленный в SQLite остаток приходит без фиксированных копеек
+        yield row[:-1] + (row[-1].quantize(CENT),)
+
+# Текст, начинающийся с этих символов, табличные редакторы исполняют как формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+def csv_cell(value):
+    """Значение ячейки CSV; текст, похожий на формулу, экранируется апострофом"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+class Echo:
+    """Файлоподобный объект, который возвращает записанное вместо хранения"""
+
+    def write(self, value):
+        return value
+
+def stream_csv(rows):
+    """Строки CSV по одной; BOM в начале нужен Excel для определения кодировки"""
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(map(csv_cell, row))
+
+class StreamBuffer:
+    """Приемник zip-архива без seek: накопленные байты забираются методом pop()"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+XLSX_PARTS = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Транзакции" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+     '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+     '</Relationships>'),
+    # Стиль 1 - дата (встроенный формат 14), стиль 2 - сумма с копейками (формат 4)
+    ('xl/styles.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+     '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+     '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+     '<borders count="1"><border/></borders>'
+     '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+     '<cellXfs count="3">'
+     '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+     '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+     '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+     '</cellXfs>'
+     '</styleSheet>'),
+)
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_TAIL = '</sheetData></worksheet>'
+EXCEL_EPOCH = date(1899, 12, 30)
+# Управляющие символы недопустимы в XML
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def xlsx_cell(value):
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - EXCEL_EPOCH).days}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c s="2"><v>{value}</v></c>'
+    text = escape(INVALID_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def xlsx_row(values):
+    return ('<row>' + ''.join(map(xlsx_cell, values)) + '</row>').encode()
+
+def stream_xlsx(rows):
+    """Книга XLSX из одного листа, отдаваемая порциями по мере сжатия строк.
+
+    Лист пишется прямо в zip-поток без промежуточного файла и без общей
+    таблицы строк, поэтому память не зависит от числа выгружаемых строк.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS:
+            archive.writestr(name, content)
+        yield buffer.pop()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(SHEET_HEAD.encode())
+            sheet.write(xlsx_row(EXPORT_FIELDS))
+            for row in rows:
+                sheet.write(xlsx_row(row))
+                data = buffer.pop()
+                if data:
+                    yield data
+            sheet.write(SHEET_TAIL.encode())
+    yield buffer.pop()
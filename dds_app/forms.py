@@ -1,5 +1,68 @@
-﻿from django import forms
-from .models import Transaction, Status, TransactionType, Category, Subcategory
+﻿import hashlib
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import F, Sum, Value
+from django.forms.models import ModelChoiceIterator
+from django.http import QueryDict
+from .models import (
+    Transaction, Status, TransactionType, Category, Subcategory, DailyCashFlowSummary,
+    LedgerTransaction
+)
+from .archive import hot_start, is_closed, ledger_for
+from .caching import get_or_compute
+from .references import get_references
+from .reports import EXPENSE_FILTER, INCOME_FILTER, balance_totals, money
+from .search import search_transactions, search_words
+
+class ReferenceChoiceIterator(ModelChoiceIterator):
+    """Варианты выбора из реестра справочников вместо запроса к БД"""
+    
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.get_objects():
+            yield self.choice(obj)
+    
+    def __len__(self):
+        return len(self.field.get_objects()) + (self.field.empty_label is not None)
+    
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.get_objects())
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """Поле выбора элемента справочника без запросов к БД.
+
+    Варианты и проверка значения берутся из реестра справочников;
+    objects ограничивает выбор списком (например, категориями одного типа).
+    """
+    iterator = ReferenceChoiceIterator
+    
+    def __init__(self, queryset, *, objects=None, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.objects = objects
+    
+    def get_objects(self):
+        if self.objects is None:
+            return get_references().objects_for(self.queryset.model)
+        return self.objects
+    
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            pk = int(value)
+        except (ValueError, TypeError):
+            pk = None
+        obj = get_references().get(self.queryset.model, pk)
+        if obj is None or (self.objects is not None and obj not in self.objects):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
 
 class TransactionForm(forms.ModelForm):
     """Форма для создания и редактирования транзакций"""
@@ -59,42 +122,63 @@ class TransactionForm(forms.ModelForm):
             'amount': 'Сумма (руб)',
             'comment': 'Комментарий'
         }
+        field_classes = {
+            'status': ReferenceChoiceField,
+            'transaction_type': ReferenceChoiceField,
+            'category': ReferenceChoiceField,
+            'subcategory': ReferenceChoiceField,
+        }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        references = get_references()
         
-        # Устанавливаем начальные queryset для зависимых полей
+        # Устанавливаем начальные варианты для зависимых полей
         if self.instance and self.instance.pk:
             # При редактировании существующей записи
-            self.fields['category'].queryset = Category.objects.filter(
-                transaction_type=self.instance.transaction_type
+            self.fields['category'].objects = references.categories_for_type(
+                self.instance.transaction_type_id
             )
-            self.fields['subcategory'].queryset = Subcategory.objects.filter(
-                category=self.instance.category
+            self.fields['subcategory'].objects = references.subcategories_for_category(
+                self.instance.category_id
             )
         else:
             # При создании новой записи
-            self.fields['category'].queryset = Category.objects.none()
-            self.fields['subcategory'].queryset = Subcategory.objects.none()
-            
-            # Если в запросе уже есть transaction_type
-            if 'transaction_type' in self.data:
-                try:
-                    transaction_type_id = int(self.data.get('transaction_type'))
-                    self.fields['category'].queryset = Category.objects.filter(
-                        transaction_type_id=transaction_type_id
-                    )
-                except (ValueError, TypeError):
-                    pass
-            
-            if 'category' in self.data:
-                try:
-                    category_id = int(self.data.get('category'))
-                    self.fields['subcategory'].queryset = Subcategory.objects.filter(
-                        category_id=category_id
-                    )
-                except (ValueError, TypeError):
-                    pass
+            self.fields['category'].objects = []
+            self.fields['subcategory'].objects = []
+        
+        # Если в запросе уже есть тип или категория
+        if 'transaction_type' in self.data:
+            try:
+                transaction_type_id = int(self.data.get('transaction_type'))
+                self.fields['category'].objects = references.categories_for_type(
+                    transaction_type_id
+                )
+            except (ValueError, TypeError):
+                pass
+        
+        if 'category' in self.data:
+            try:
+                category_id = int(self.data.get('category'))
+                self.fields['subcategory'].objects = references.subcategories_for_category(
+                    category_id
+                )
+            except (ValueError, TypeError):
+                pass
+    
+    def clean_created_date(self):
+        created_date = self.cleaned_data['created_date']
+        # Закрытые годы перенесены в архив, их итоги не меняются
+        if is_closed(created_date):
+            raise ValidationError(
+                f'Период до {hot_start():%d.%m.%Y} закрыт и перенесен в архив'
+            )
+        return created_date
+    
+    def _get_validation_exclusions(self):
+        # Существование элементов справочников уже проверено по реестру,
+        # повторная проверка внешних ключей моделью стоила бы запроса на поле
+        return super()._get_validation_exclusions() | set(self.Meta.field_classes)
 
 class TransactionFilterForm(forms.Form):
     """Форма для фильтрации транзакций"""
@@ -117,7 +201,7 @@ class TransactionFilterForm(forms.Form):
         label='По'
     )
     
-    status = forms.ModelChoiceField(
+    status = ReferenceChoiceField(
         queryset=Status.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'}),
@@ -125,7 +209,7 @@ class TransactionFilterForm(forms.Form):
         empty_label="Все статусы"
     )
     
-    transaction_type = forms.ModelChoiceField(
+    transaction_type = ReferenceChoiceField(
         queryset=TransactionType.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'}),
@@ -133,7 +217,7 @@ class TransactionFilterForm(forms.Form):
         empty_label="Все типы"
     )
     
-    category = forms.ModelChoiceField(
+    category = ReferenceChoiceField(
         queryset=Category.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'}),
@@ -141,13 +225,237 @@ class TransactionFilterForm(forms.Form):
         empty_label="Все категории"
     )
     
-    subcategory = forms.ModelChoiceField(
+    subcategory = ReferenceChoiceField(
         queryset=Subcategory.objects.all(),
         required=False,
         widget=forms.Select(attrs={'class': 'form-control'}),
         label='Подкатегория',
         empty_label="Все подкатегории"
     )
+    
+    search = forms.CharField(
+        required=False,
+        max_length=200,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Слова из комментария...'
+        }),
+        label='Поиск'
+    )
+    
+    @property
+    def searching(self):
+        """Задан ли поиск по комментарию"""
+        return self.is_valid() and bool(search_words(self.cleaned_data['search']))
+    
+    def filter_queryset(self, queryset, history=False):
+        """Применяет фильтры к транзакциям или к их дневным итогам.
+        
+        history=True оставляет операции до начала периода - из них
+        складывается входящий остаток.
+        """
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        
+        # Фильтрация по дате
+        if data.get('start_date') and not history:
+            queryset = queryset.filter(created_date__gte=data['start_date'])
+        if data.get('end_date'):
+            queryset = queryset.filter(created_date__lte=data['end_date'])
+        
+        # Фильтрация по справочникам
+        for field in ('status', 'transaction_type', 'category', 'subcategory'):
+            if data.get(field):
+                queryset = queryset.filter(**{field: data[field]})
+        
+        # Поиск по комментарию возможен только в самих транзакциях
+        if data.get('search'):
+            queryset = search_transactions(queryset, data['search'])
+        
+        return queryset
+    
+    def transactions(self):
+        """Транзакции без фильтров: рабочая таблица или журнал с архивом.
+        
+        Архив читается, только если период начинается в архивном году
+        или не ограничен началом.
+        """
+        start_date = self.cleaned_data['start_date'] if self.is_valid() else None
+        return ledger_for(start_date)
+    
+    def summaries(self, history=False):
+        """Дневные итоги по фильтрам для сумм и количеств.
+        
+        Дневные итоги не хранят комментарии, поэтому при поиске вместо них
+        берутся найденные транзакции с теми же полями total и transaction_count.
+        Если период начинается в открытых годах, найденные архивные транзакции
+        в history не входят - их добавляет во входящий остаток totals().
+        """
+        if self.searching:
+            return self.filter_queryset(self.transactions(), history).annotate(
+                total=F('amount'), transaction_count=Value(1)
+            )
+        return self.filter_queryset(DailyCashFlowSummary.objects.all(), history)
+    
+    def totals(self):
+        """Итоги и остатки по фильтрам (reports.balance_totals)"""
+        start_date = self.cleaned_data['start_date'] if self.is_valid() else None
+        totals = balance_totals(self.summaries(history=True), start_date)
+        if self.searching and hot_start() and self.transactions().model is Transaction:
+            income, expense = self.archived_history()
+            totals['opening_balance'] += income - expense
+            totals['closing_balance'] += income - expense
+        return totals
+    
+    def archived_history(self):
+        """Доходы и расходы найденных архивных транзакций.
+        
+        Архив не меняется до следующей архивации, поэтому суммы кешируются
+        под его версией и повторный поиск читает только рабочую таблицу.
+        """
+        data = self.cleaned_data
+        key = [search_words(data['search']), data['end_date']] + [
+            data[field] and data[field].pk
+            for field in ('status', 'transaction_type', 'category', 'subcategory')
+        ]
+        
+        def compute():
+            queryset = self.filter_queryset(
+                LedgerTransaction.objects.filter(archived=True), history=True
+            )
+            values = queryset.aggregate(
+                income=Sum('amount', filter=INCOME_FILTER),
+                expense=Sum('amount', filter=EXPENSE_FILTER),
+            )
+            return money(values['income'] or 0), money(values['expense'] or 0)
+        
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return get_or_compute('archive', f'search:{digest}', compute)
+
+class ReportForm(TransactionFilterForm):
+    """Параметры отчета о движении средств: фильтры, период и разбивка"""
+    
+    PERIOD_CHOICES = [
+        ('day', 'День'),
+        ('week', 'Неделя'),
+        ('month', 'Месяц'),
+        ('quarter', 'Квартал'),
+    ]
+    GROUP_BY_CHOICES = [
+        ('', 'Без разбивки'),
+        ('category', 'По категориям'),
+        ('subcategory', 'По подкатегориям'),
+    ]
+    
+    period = forms.ChoiceField(choices=PERIOD_CHOICES, required=False, label='Период')
+    group_by = forms.ChoiceField(choices=GROUP_BY_CHOICES, required=False, label='Разбивка')
+    
+    def clean_period(self):
+        return self.cleaned_data['period'] or 'month'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise ValidationError('Начало периода позже его окончания')
+        return cleaned_data
+
+class PrimaryKeyListField(forms.TypedMultipleChoiceField):
+    """Список первичных ключей без списка вариантов.
+
+    Существование записей не проверяется: выборка по ним просто
+    не затронет отсутствующие.
+    """
+    
+    def __init__(self, **kwargs):
+        super().__init__(coerce=int, **kwargs)
+    
+    def valid_value(self, value):
+        return True
+
+class BulkActionForm(forms.Form):
+    """Массовое действие над выбранными транзакциями или над всем текущим фильтром"""
+    
+    ACTION_CHOICES = [
+        ('status', 'Изменить статус'),
+        ('recategorize', 'Перенести в подкатегорию'),
+        ('delete', 'Удалить'),
+    ]
+    SCOPE_CHOICES = [
+        ('selected', 'Выбранные транзакции'),
+        ('filter', 'Все транзакции по фильтру'),
+    ]
+    
+    action = forms.ChoiceField(
+        choices=ACTION_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label='Действие'
+    )
+    scope = forms.ChoiceField(
+        choices=SCOPE_CHOICES,
+        initial='selected',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label='Применить к'
+    )
+    ids = PrimaryKeyListField(
+        required=False,
+        widget=forms.MultipleHiddenInput,
+        label='Транзакции'
+    )
+    new_status = ReferenceChoiceField(
+        queryset=Status.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label='Новый статус',
+        empty_label="Статус..."
+    )
+    # Категория и тип операции берутся из подкатегории, поэтому иерархия не нарушается
+    new_subcategory = ReferenceChoiceField(
+        queryset=Subcategory.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label='Новая подкатегория',
+        empty_label="Подкатегория..."
+    )
+    # Параметры фильтра списка в виде строки запроса
+    filters = forms.CharField(required=False, widget=forms.HiddenInput)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        if action == 'status' and not cleaned_data.get('new_status'):
+            self.add_error('new_status', 'Выберите новый статус')
+        if action == 'recategorize' and not cleaned_data.get('new_subcategory'):
+            self.add_error('new_subcategory', 'Выберите новую подкатегорию')
+        
+        scope = cleaned_data.get('scope')
+        if scope == 'selected' and not cleaned_data.get('ids'):
+            self.add_error('ids', 'Не выбрано ни одной транзакции')
+        if scope == 'filter':
+            self.filter_form = TransactionFilterForm(QueryDict(cleaned_data.get('filters', '')))
+            if not self.filter_form.is_valid():
+                self.add_error('filters', 'Некорректные параметры фильтра')
+        return cleaned_data
+    
+    def get_queryset(self):
+        """Транзакции, к которым применяется действие; архивные не изменяются"""
+        if self.cleaned_data['scope'] == 'filter':
+            return self.filter_form.filter_queryset(Transaction.objects.all())
+        return Transaction.objects.filter(pk__in=self.cleaned_data['ids'])
+    
+    def get_values(self):
+        """Новые значения справочников для действий изменения"""
+        if self.cleaned_data['action'] == 'status':
+            return {'status': self.cleaned_data['new_status']}
+        subcategory = self.cleaned_data['new_subcategory']
+        category = get_references().get(Category, subcategory.category_id)
+        return {
+            'transaction_type': get_references().get(TransactionType, category.transaction_type_id),
+            'category': category,
+            'subcategory': subcategory,
+        }
 
 class ReferenceItemForm(forms.Form):
     """Базовая форма для элементов справочников"""
@@ -0,0 +1,142 @@
+import random
+from datetime import datetime, time, timedelta
+from django.db import connection
+from django.utils import timezone
+from .archive import drop_archives
+from .caching import invalidate
+from .locking import write_atomic
+from .models import DailyCashFlowSummary, LedgerState, Status, Subcategory, Transaction, TransactionType
+from .summaries import rebuild_daily_summary
+
+# Порядок колонок вставляемых строк
+GENERATED_FIELDS = (
+    'created_date', 'status', 'transaction_type', 'category', 'subcategory',
+    'amount', 'comment', 'created_at', 'updated_at',
+)
+COMMENTS = (
+    '', '', '', '', 'Оплата картой', 'Наличные', 'Перевод с карты',
+    'Ежемесячный платеж', 'По договору', 'Возврат не требуется',
+)
+# Доли статусов в порядке pk: большая часть операций выполнена
+STATUS_WEIGHTS = (90, 7, 3)
+
+def wipe_ledger():
+    """Удаляет все транзакции одним DELETE, минуя сигналы, вместе с архивом и дневными итогами"""
+    with write_atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(Transaction._meta.db_table)}')
+            deleted = cursor.rowcount
+        deleted += drop_archives()
+        DailyCashFlowSummary.objects.all().delete()
+        if deleted:
+            LedgerState.record_deletions(deleted)
+        invalidate('ledger')
+
+def insert_sql():
+    quote = connection.ops.quote_name
+    columns = [quote(Transaction._meta.get_field(name).column) for name in GENERATED_FIELDS]
+    return 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(Transaction._meta.db_table), ', '.join(columns), ', '.join(['%s'] * len(columns))
+    )
+
+class LedgerGenerator:
+    """Детерминированный генератор журнала транзакций для нагрузочных тестов.
+
+    Все случайные величины берутся из random.Random(seed), поэтому одинаковые
+    параметры и справочники дают одинаковые данные. Подкатегории выбираются по
+    закону Ципфа (несколько популярных и длинный хвост), суммы - логнормально
+    вокруг медианы подкатегории, доходы на порядок крупнее расходов.
+    """
+
+    def __init__(self, seed=42, years=1, end_date=None):
+        self.rng = random.Random(seed)
+        self.end_date = end_date or timezone.localdate()
+        self.start_date = self.end_date - timedelta(days=365 * years - 1)
+        self.days = (self.end_date - self.start_date).days + 1
+
+        self.statuses = [obj.pk for obj in Status.objects.order_by('pk')]
+        self.status_weights = [
+            STATUS_WEIGHTS[index] if index < len(STATUS_WEIGHTS) else 1
+            for index in range(len(self.statuses))
+        ]
+        subcategories = list(
+            Subcategory.objects.select_related('category__transaction_type').order_by('pk')
+        )
+        if not self.statuses or not subcategories:
+            raise ValueError('Для генерации нужны статусы и подкатегории')
+
+        ranks = list(range(len(subcategories)))
+        self.rng.shuffle(ranks)
+        self.buckets = []
+        self.bucket_weights = []
+        for rank, subcategory in zip(ranks, subcategories):
+            category = subcategory.category
+            income = category.transaction_type.direction == TransactionType.Direction.INCOME
+            median = self.rng.uniform(15000, 80000) if income else self.rng.uniform(300, 6000)
+            self.buckets.append((
+                category.transaction_type_id, category.pk, subcategory.pk, median
+            ))
+            self.bucket_weights.append(1 / (rank + 1) ** 1.1)
+
+    def day_counts(self, count):
+        """Количество транзакций по дням: поровну, остаток - в случайные дни"""
+        base, extra = divmod(count, self.days)
+        extra_days = set(self.rng.sample(range(self.days), extra))
+        for offset in range(self.days):
+            yield self.start_date + timedelta(days=offset), base + (offset in extra_days)
+
+    def rows(self, count):
+        """Кортежи значений GENERATED_FIELDS в хронологическом порядке"""
+        rng = self.rng
+        adapt_date = connection.ops.adapt_datefield_value
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+        tz = timezone.get_current_timezone()
+        for day, day_count in self.day_counts(count):
+            if not day_count:
+                continue
+            created_date = adapt_date(day)
+            opening = timezone.make_aware(datetime.combine(day, time(8)), tz)
+            step = 12 * 60 * 60 / day_count
+            statuses = rng.choices(self.statuses, weights=self.status_weights, k=day_count)
+            buckets = rng.choices(self.buckets, weights=self.bucket_weights, k=day_count)
+            for index in range(day_count):
+                transaction_type_id, category_id, subcategory_id, median = buckets[index]
+                amount = max(min(rng.lognormvariate(0, 0.6) * median, 9999999999), 1)
+                created_at = adapt_datetime(opening + timedelta(seconds=index * step))
+                yield (
+                    created_date, statuses[index], transaction_type_id, category_id,
+                    subcategory_id, f'{amount:.2f}', rng.choice(COMMENTS), created_at, created_at,
+                )
+
+    def generate(self, count, batch_size=20000, progress=None):
+        """Вставляет count транзакций пакетами и пересчитывает дневные итоги.
+
+        Строки вставляются executemany без моделей: bulk_create тратит основное
+        время на подготовку значений каждого поля и не укладывается в минуты
+        на миллионах строк. Сигналы при этом не срабатывают, поэтому итоги
+        пересчитываются один раз в конце.
+        """
+        sql = insert_sql()
+        inserted = 0
+        batch = []
+        for row in self.rows(count):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                inserted += self.insert(sql, batch)
+                batch = []
+                if progress:
+                    progress(inserted)
+        if batch:
+            inserted += self.insert(sql, batch)
+            if progress:
+                progress(inserted)
+        rebuild_daily_summary(batch_size=batch_size)
+        return inserted
+
+    @staticmethod
+    def insert(sql, batch):
+        with write_atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            LedgerState.record_insertions(len(batch))
+        return len(batch)
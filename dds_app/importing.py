@@ -0,0 +1,143 @@
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from .archive import hot_start
+from .caching import invalidate
+from .locking import write_atomic
+from .models import LedgerState, Transaction
+from .references import get_references
+from .summaries import add_transactions
+
+# Поля строки импорта в порядке колонок файла
+IMPORT_FIELDS = (
+    'created_date', 'status', 'transaction_type', 'category', 'subcategory', 'amount', 'comment'
+)
+REQUIRED_FIELDS = IMPORT_FIELDS[:-1]
+DATE_FORMATS = ('%d.%m.%Y', '%d/%m/%Y')
+# Ограничения поля amount: 12 знаков, из них 2 после запятой
+MAX_AMOUNT = Decimal('9999999999.99')
+MIN_AMOUNT = Decimal('0.01')
+CENT = Decimal('0.01')
+
+class RowError(ValueError):
+    """Строка импорта не может быть загружена"""
+
+def normalize_name(name):
+    return ' '.join(str(name).split()).casefold()
+
+def reference_key(value):
+    """Ключ элемента справочника: целое число - первичный ключ, иначе название"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return normalize_name(value)
+
+def parse_date(value):
+    value = str(value).strip()
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise RowError(f'Неверная дата: «{value}»')
+
+def parse_amount(value):
+    text = str(value).strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise RowError(f'Неверная сумма: «{value}»')
+    if not amount.is_finite() or amount != amount.quantize(CENT):
+        raise RowError(f'Неверная сумма: «{value}»')
+    if amount < MIN_AMOUNT or amount > MAX_AMOUNT:
+        raise RowError(f'Сумма вне допустимого диапазона: «{value}»')
+    return amount.quantize(CENT)
+
+class TransactionResolver:
+    """Превращает строки импорта в транзакции по индексу справочников в памяти.
+
+    Индекс строится один раз из снимка реестра справочников: названия
+    сравниваются без учета регистра и лишних пробелов, категория ищется
+    внутри типа, подкатегория - внутри категории. Вместо названия можно
+    передать первичный ключ числом (строки JSON из интеграций).
+    """
+
+    def __init__(self, references=None):
+        references = references or get_references()
+        self.statuses = self.index(references.statuses, lambda obj: ())
+        self.transaction_types = self.index(references.transaction_types, lambda obj: ())
+        self.categories = self.index(
+            references.categories, lambda obj: (obj.transaction_type_id,)
+        )
+        self.subcategories = self.index(
+            references.subcategories, lambda obj: (obj.category_id,)
+        )
+        # Транзакции не загружаются в закрытые (архивные) годы
+        self.hot_start = hot_start()
+
+    @staticmethod
+    def index(objects, parent_key):
+        # При совпадающих названиях побеждает первый объект в порядке сортировки
+        result = {}
+        for obj in objects:
+            result.setdefault(parent_key(obj) + (normalize_name(obj.name),), obj)
+            result[parent_key(obj) + (obj.pk,)] = obj
+        return result
+
+    def lookup(self, index, key, label, value, parent=None):
+        obj = index.get(key)
+        if obj is None:
+            if parent is None:
+                raise RowError(f'{label} «{value}» не найден(а) в справочнике')
+            raise RowError(f'{label} «{value}» не относится к «{parent}»')
+        return obj
+
+    def resolve(self, row):
+        """Транзакция (без сохранения) по словарю полей строки; ошибки - RowError"""
+        missing = [field for field in REQUIRED_FIELDS if not str(row.get(field) or '').strip()]
+        if missing:
+            raise RowError(f'Не заполнены поля: {", ".join(missing)}')
+
+        status = self.lookup(
+            self.statuses, (reference_key(row['status']),), 'Статус', row['status']
+        )
+        transaction_type = self.lookup(
+            self.transaction_types, (reference_key(row['transaction_type']),),
+            'Тип операции', row['transaction_type']
+        )
+        category = self.lookup(
+            self.categories, (transaction_type.pk, reference_key(row['category'])),
+            'Категория', row['category'], transaction_type
+        )
+        subcategory = self.lookup(
+            self.subcategories, (category.pk, reference_key(row['subcategory'])),
+            'Подкатегория', row['subcategory'], category.name
+        )
+        created_date = parse_date(row['created_date'])
+        if self.hot_start and created_date < self.hot_start:
+            raise RowError(f'Период до {self.hot_start:%d.%m.%Y} закрыт и перенесен в архив')
+        return Transaction(
+            created_date=created_date,
+            status_id=status.pk,
+            transaction_type_id=transaction_type.pk,
+            category_id=category.pk,
+            subcategory_id=subcategory.pk,
+            amount=parse_amount(row['amount']),
+            comment=str(row.get('comment') or '').strip(),
+        )
+
+@write_atomic()
+def insert_transactions(transactions, update_summary=True):
+    """Сохраняет транзакции одним bulk_create в транзакции БД.
+
+    bulk_create не вызывает сигналы, поэтому дневные итоги обновляются здесь
+    же (update_summary=False - если итоги будут пересчитаны целиком позже).
+    """
+    created = Transaction.objects.bulk_create(transactions)
+    if update_summary:
+        add_transactions(created)
+    LedgerState.record_insertions(len(created))
+    invalidate('ledger')
+    return created
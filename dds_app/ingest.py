@@ -0,0 +1,96 @@
+import hashlib
+import json
+from decimal import Decimal
+from django.db import IntegrityError
+from .importing import RowError, TransactionResolver, insert_transactions
+from .locking import write_atomic
+from .models import IngestionBatch
+
+# Больше строк в одном пакете не принимается: тело такого пакета
+# укладывается в DATA_UPLOAD_MAX_MEMORY_SIZE по умолчанию
+MAX_BATCH_SIZE = 5000
+
+class BatchError(ValueError):
+    """Пакет не может быть принят целиком (формат, размер, ключ)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def parse_batch(body):
+    """Строки пакета из тела запроса: массив объектов или {"transactions": [...]}.
+
+    Числа читаются как Decimal, чтобы суммы не проходили через float.
+    """
+    try:
+        data = json.loads(body, parse_float=Decimal)
+    except (UnicodeDecodeError, ValueError):
+        raise BatchError('Тело запроса не является JSON')
+    if isinstance(data, dict):
+        data = data.get('transactions')
+    if not isinstance(data, list) or not data:
+        raise BatchError('Ожидается непустой массив транзакций')
+    if len(data) > MAX_BATCH_SIZE:
+        raise BatchError(f'В пакете больше {MAX_BATCH_SIZE} транзакций', status=413)
+    return data
+
+def resolve_batch(rows):
+    """Транзакции пакета и результаты по строкам; проверка без запросов к БД"""
+    resolver = TransactionResolver()
+    transactions = []
+    results = []
+    for index, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise RowError('Строка должна быть объектом')
+            transactions.append(resolver.resolve(row))
+            results.append({'index': index, 'status': 'ok'})
+        except RowError as error:
+            results.append({'index': index, 'status': 'error', 'error': str(error)})
+    return transactions, results
+
+def replay(key, request_hash):
+    """Сохраненный ответ на пакет с тем же ключом или None, если пакета еще не было"""
+    batch = IngestionBatch.objects.filter(key=key).values('request_hash', 'response').first()
+    if batch is None:
+        return None
+    if batch['request_hash'] != request_hash:
+        raise BatchError('Ключ идемпотентности уже использован для другого пакета', status=409)
+    return batch['response']
+
+def ingest_batch(key, body):
+    """Принимает пакет транзакций: (статус HTTP, ответ, повтор ли это).
+
+    Пакет проверяется целиком: при ошибке хотя бы в одной строке ничего
+    не сохраняется, а в ответе указаны ошибки по строкам. Корректный пакет
+    вставляется bulk_create вместе с записью о пакете в одной транзакции БД,
+    поэтому параллельный повтор с тем же ключом не вставит строки дважды.
+    """
+    request_hash = hashlib.sha256(body).hexdigest()
+    response = replay(key, request_hash)
+    if response is not None:
+        return 201, response, True
+
+    transactions, results = resolve_batch(parse_batch(body))
+    errors = sum(result['status'] == 'error' for result in results)
+    if errors:
+        return 400, {'created': 0, 'errors': errors, 'results': results}, False
+
+    try:
+        with write_atomic():
+            created = insert_transactions(transactions)
+            for result, obj in zip(results, created):
+                result['status'] = 'created'
+                result['id'] = obj.pk
+            response = {'batch': key, 'created': len(created), 'errors': 0, 'results': results}
+            IngestionBatch.objects.create(
+                key=key, request_hash=request_hash,
+                transaction_count=len(created), response=response,
+            )
+    except IntegrityError:
+        # Тот же пакет успел сохранить параллельный запрос
+        response = replay(key, request_hash)
+        if response is None:
+            raise
+        return 201, response, True
+    return 201, response, False
\ No newline at end of file
@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+from django.db import transaction
+
+@contextmanager
+def write_atomic(using=None):
+    """transaction.atomic() для путей записи (формы, массовые действия, загрузка, архив).
+
+    На движке dds_app.backends.sqlite3 внешний блок начинается с BEGIN
+    IMMEDIATE и сразу берет блокировку записи. Прочие транзакции, в том
+    числе только читающие, начинаются обычным BEGIN и не встают в очередь
+    за записями. Внутри уже открытой транзакции блок - обычная точка сохранения.
+    Работает и как декоратор.
+    """
+    connection = transaction.get_connection(using)
+    previous = getattr(connection, 'begin_immediate', False)
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN уже выполнен: вложенные atomic() флаг не наследуют
+            connection.begin_immediate = previous
+            yield
+    finally:
+        connection.begin_immediate = previous
\ No newline at end of file
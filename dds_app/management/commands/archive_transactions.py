@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dds_app.archive import ARCHIVE_BATCH_SIZE, HOT_YEARS, archive_year, pending_years
+
+class Command(BaseCommand):
+    help = (
+        'Перенос транзакций закрытых лет из рабочей таблицы в годовые архивные таблицы. '
+        'Списки, отчеты и выгрузки читают архив сами, если период заходит в архивные годы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until-year',
+            type=int,
+            help=f'Последний архивируемый год (по умолчанию текущий минус {HOT_YEARS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help='Число строк, переносимых в одной транзакции БД'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько транзакций будет перенесено'
+        )
+
+    def handle(self, *args, **options):
+        until_year = options['until_year'] or timezone.localdate().year - HOT_YEARS
+        if until_year >= timezone.localdate().year:
+            raise CommandError('Текущий год не может быть закрыт')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        years = pending_years(until_year)
+        if not years:
+            self.stdout.write(self.style.SUCCESS(f'Нет транзакций до {until_year} года включительно'))
+            return
+        total = 0
+        for year, count in years.items():
+            if options['dry_run']:
+                self.stdout.write(f'  {year}: будет перенесено {count}')
+                continue
+            moved = archive_year(year, batch_size=options['batch_size'])
+            self.stdout.write(f'  {year}: перенесено {moved}')
+            total += moved
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Перенесено транзакций: {total}'))
\ No newline at end of file
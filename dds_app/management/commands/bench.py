@@ -0,0 +1,149 @@
+import json
+import os
+import platform
+import tempfile
+from io import StringIO
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from dds_app.benchmark import DEFAULT_THRESHOLD, compare, run_concurrent, run_scenarios
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон представлений на журналах разного размера: перцентили '
+        'задержки, число и время SQL-запросов, пиковая память. Данные создаются '
+        'в отдельной тестовой БД, рабочая база не затрагивается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10000, 100000, 1000000],
+            help='Размеры журнала (число транзакций)'
+        )
+        parser.add_argument('--iterations', type=int, default=30, help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=3, help='Прогревочных запросов на сценарий')
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора данных')
+        parser.add_argument('--output', help='Записать результаты в JSON-файл')
+        parser.add_argument('--baseline', help='JSON-файл прошлого прогона для сравнения')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='Допустимый относительный рост p95 (0.2 = 20%%)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=0,
+            help='Сравнить WSGI и ASGI при стольких одновременных клиентах (0 - не сравнивать)'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=20, help='Запросов на клиента при сравнении WSGI и ASGI'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or any(size < 1 for size in options['sizes']):
+            raise CommandError('--iterations и --sizes должны быть положительными')
+        if options['clients'] < 0 or options['requests'] < 1:
+            raise CommandError('--clients не может быть отрицательным, --requests - меньше 1')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as file:
+                    baseline = json.load(file)['results']
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f'Не удалось прочитать базовый прогон: {error}')
+
+        results, concurrency = self.run(options)
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        if concurrency:
+            report['meta']['clients'] = options['clients']
+            report['concurrency'] = concurrency
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(results, baseline, threshold=options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(f'  {regression}'))
+                raise CommandError(f'Найдено регрессий: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно базового прогона нет'))
+
+    def run(self, options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict['TEST']
+        old_test_name = test_settings.get('NAME')
+        if options['clients'] and connection.vendor == 'sqlite':
+            # Общая БД в памяти разделяет кеш страниц между соединениями и
+            # выполняет их запросы по очереди - для параллельных клиентов нужен файл
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'dds_bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results, concurrency = {}, {}
+            for size in sorted(options['sizes']):
+                self.stdout.write(f'Журнал из {size} транзакций...')
+                # Журнал предыдущего размера во временной БД заменяется целиком
+                call_command(
+                    'load_sample_data', transactions=size, seed=options['seed'],
+                    years=3, flush=True, stdout=StringIO()
+                )
+                user = User.objects.get(username='demo')
+                results[str(size)] = run_scenarios(
+                    iterations=options['iterations'], warmup=options['warmup'], user=user
+                )
+                self.print_table(results[str(size)])
+                if options['clients']:
+                    concurrency[str(size)] = run_concurrent(
+                        clients=options['clients'], requests=options['requests'], user=user
+                    )
+                    self.print_concurrency(concurrency[str(size)], options['clients'])
+            return results, concurrency
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            teardown_test_environment()
+
+    def print_table(self, results):
+        self.stdout.write(
+            f'  {"сценарий":<26}{"p50":>9}{"p95":>9}{"p99":>9}{"SQL":>5}{"SQL мс":>9}{"КБ":>10}'
+        )
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'  {name:<26}{metrics["p50_ms"]:>9.2f}{metrics["p95_ms"]:>9.2f}'
+                f'{metrics["p99_ms"]:>9.2f}{metrics["queries"]:>5}{metrics["sql_ms"]:>9.2f}'
+                f'{metrics["peak_memory_kb"]:>10.1f}'
+            )
+
+
+    def print_concurrency(self, results, clients):
+        self.stdout.write(f'  WSGI и ASGI, {clients} одновременных клиентов:')
+        self.stdout.write(
+            f'  {"сценарий":<26}{"сервер":>7}{"p50":>9}{"p95":>9}{"p99":>9}{"запр/с":>9}'
+        )
+        for name, servers in results.items():
+            for server, metrics in servers.items():
+                self.stdout.write(
+                    f'  {name:<26}{server:>7}{metrics["p50_ms"]:>9.2f}{metrics["p95_ms"]:>9.2f}'
+                    f'{metrics["p99_ms"]:>9.2f}{metrics["rps"]:>9.1f}'
+                )
\ No newline at end of file
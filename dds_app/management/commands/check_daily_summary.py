@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from dds_app.summaries import check_daily_summary
+
+class Command(BaseCommand):
+    help = 'Проверка согласованности дневных итогов с транзакциями'
+
+    def handle(self, *args, **options):
+        mismatches = check_daily_summary()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Дневные итоги согласованы с транзакциями'))
+            return
+
+        for key, expected, actual in mismatches:
+            self.stdout.write(
+                f'  {key}: по транзакциям {expected}, в итогах {actual}'
+            )
+        raise CommandError(
+            f'Найдено расхождений: {len(mismatches)}. '
+            'Выполните rebuild_daily_summary для пересчета.'
+        )
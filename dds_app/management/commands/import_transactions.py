@@ -0,0 +1,132 @@
+import csv
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from dds_app.importing import (
+    IMPORT_FIELDS, REQUIRED_FIELDS, RowError, TransactionResolver, insert_transactions
+)
+from dds_app.summaries import rebuild_daily_summary
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт транзакций из CSV. Колонки: '
+        + ', '.join(IMPORT_FIELDS)
+        + '. Справочники ищутся по названию и должны существовать.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV-файлу')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одном bulk_create и транзакции БД'
+        )
+        parser.add_argument(
+            '--offset',
+            type=int,
+            default=0,
+            help='Пропустить первые N строк данных (продолжение прерванного импорта)'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='CSV-файл для отклоненных строк с номером строки и причиной'
+        )
+        parser.add_argument('--delimiter', default=',', help='Разделитель колонок')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Кодировка файла')
+        parser.add_argument(
+            '--defer-summary',
+            action='store_true',
+            help='Не обновлять дневные итоги по пакетам, а пересчитать их один раз в конце'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['batch_size'] < 1 or options['offset'] < 0:
+            raise CommandError('--batch-size должен быть положительным, --offset - неотрицательным')
+
+        try:
+            source = open(options['path'], newline='', encoding=options['encoding'])
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть файл: {error}')
+
+        rejects_file = rejects = None
+        with source:
+            reader = csv.DictReader(source, delimiter=options['delimiter'])
+            missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+            if missing:
+                raise CommandError(f'В файле нет колонок: {", ".join(missing)}')
+
+            if options['rejects']:
+                # При продолжении импорта отклоненные строки дописываются к прежним
+                rejects_file = open(
+                    options['rejects'], 'a' if options['offset'] else 'w',
+                    newline='', encoding='utf-8'
+                )
+                rejects = csv.writer(rejects_file)
+                if not rejects_file.tell():
+                    rejects.writerow(['line'] + reader.fieldnames + ['error'])
+            try:
+                self.import_rows(reader, rejects, options)
+            finally:
+                if rejects_file:
+                    rejects_file.close()
+
+    def import_rows(self, reader, rejects, options):
+        resolver = TransactionResolver()
+        batch_size, processed = options['batch_size'], options['offset']
+        update_summary = not options['defer_summary']
+        imported = rejected = 0
+        started = time.monotonic()
+
+        # Номер строки в файле: заголовок - первая строка
+        rows = enumerate(islice(reader, processed, None), start=processed + 2)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for line, row in chunk:
+                try:
+                    batch.append(self.resolve(resolver, row))
+                except RowError as error:
+                    rejected += 1
+                    if rejects:
+                        rejects.writerow(
+                            [line] + [row.get(field) for field in reader.fieldnames] + [error]
+                        )
+            if batch:
+                try:
+                    insert_transactions(batch, update_summary=update_summary)
+                except DatabaseError as error:
+                    # Пакет откатился целиком, все предыдущие уже зафиксированы
+                    raise CommandError(
+                        f'Ошибка при сохранении пакета: {error}. '
+                        f'Продолжить импорт можно с --offset {processed}'
+                    )
+            processed += len(chunk)
+            imported += len(batch)
+            self.report(processed, imported, rejected, started)
+
+        if not update_summary and imported:
+            self.stdout.write('Пересчет дневных итогов...')
+            rebuild_daily_summary()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: загружено {imported}, отклонено {rejected}. '
+            f'Обработано строк данных: {processed}'
+        ))
+
+    def resolve(self, resolver, row):
+        if None in row:
+            raise RowError('Лишние колонки в строке')
+        return resolver.resolve(row)
+
+    def report(self, processed, imported, rejected, started):
+        if self.verbosity < 1:
+            return
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f'  Обработано: {processed}, загружено: {imported}, отклонено: {rejected} '
+            f'({(imported + rejected) / elapsed:.0f} строк/с)'
+        )
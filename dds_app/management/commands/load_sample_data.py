@@ -1,22 +1,147 @@
-﻿from django.core.management.base import BaseCommand
+﻿import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
-from dds_app.models import Status, TransactionType, Category, Subcategory, Transaction
+from dds_app.caching import invalidate
+from dds_app.generator import LedgerGenerator, wipe_ledger
+from dds_app.models import (
+    Status, TransactionType, Category, Subcategory, Transaction, DailyCashFlowSummary,
+    LedgerTransaction
+)
 from decimal import Decimal
 
 class Command(BaseCommand):
-    help = 'Загрузка демонстрационных данных в базу'
+    help = (
+        'Загрузка демонстрационных данных в базу. С --transactions N создает '
+        'синтетический журнал из N транзакций для нагрузочных тестов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--transactions',
+            type=int,
+            default=0,
+            help='Сгенерировать N транзакций вместо демонстрационных'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Начальное значение генератора: одинаковый seed дает одинаковые данные'
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=1,
+            help='За сколько лет (до --end-date) распределить транзакции'
+        )
+        parser.add_argument(
+            '--end-date',
+            type=date.fromisoformat,
+            help='Последний день журнала (ГГГГ-ММ-ДД), по умолчанию сегодня'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20000,
+            help='Количество строк в одной вставке'
+        )
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Удалить все транзакции (включая архив) и справочники перед загрузкой'
+        )
 
     def handle(self, *args, **options):
+        if options['transactions'] < 0 or options['years'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--transactions, --years и --batch-size должны быть положительными')
         self.stdout.write('Загрузка демонстрационных данных...')
 
-        # Очистка существующих данных (осторожно!)
-        Transaction.objects.all().delete()
-        Subcategory.objects.all().delete()
-        Category.objects.all().delete()
-        TransactionType.objects.all().delete()
-        Status.objects.all().delete()
+        if options['flush']:
+            # Очистка существующих данных (осторожно!)
+            wipe_ledger()
+            Subcategory.objects.all().delete()
+            Category.objects.all().delete()
+            TransactionType.objects.all().delete()
+            Status.objects.all().delete()
+            invalidate('reference')
+        elif LedgerTransaction.objects.exists():
+            raise CommandError(
+                'Журнал транзакций не пуст. Чтобы удалить все транзакции и справочники '
+                'и загрузить данные заново, укажите --flush'
+            )
+
+        references_exist = any(
+            model.objects.exists() for model in (Status, TransactionType, Category, Subcategory)
+        )
+        if options['transactions'] and references_exist:
+            # Журнал генерируется по уже заведенным справочникам
+            self.stdout.write('Используются существующие справочники')
+            self.generate_transactions(options)
+        elif references_exist:
+            raise CommandError(
+                'Справочники уже заполнены: демонстрационные транзакции загружаются '
+                'только вместе со своими справочниками, укажите --flush'
+            )
+        else:
+            references = self.create_references()
+            if options['transactions']:
+                self.generate_transactions(options)
+            else:
+                self.create_demo_transactions(*references)
+
+        # Создаем демо-пользователя для админки
+        if not User.objects.filter(username='demo').exists():
+            user = User.objects.create_user(
+                username='demo',
+                password='demo12345',
+                email='demo@example.com',
+                is_staff=True,
+                is_superuser=True
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    ' Создан демо-пользователь для админки:'
+                    '\n   Логин: demo'
+                    '\n   Пароль: demo12345'
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(' Демо-пользователь уже существует')
+            )
+
+        # Выводим итоговую статистику (итоги - по дневным итогам, без чтения транзакций)
+        direction = TransactionType.Direction
+        totals = DailyCashFlowSummary.objects.aggregate(
+            income=Coalesce(
+                Sum('total', filter=Q(transaction_type__direction=direction.INCOME)), Decimal('0')
+            ),
+            expense=Coalesce(
+                Sum('total', filter=Q(transaction_type__direction=direction.EXPENSE)), Decimal('0')
+            ),
+            count=Coalesce(Sum('transaction_count'), 0),
+        )
+        income, expense = (totals[key].quantize(Decimal('0.01')) for key in ('income', 'expense'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'  Успешно загружено:'
+                f'\n    {Status.objects.count()} статусов'
+                f'\n    {TransactionType.objects.count()} типов операций' 
+                f'\n    {Category.objects.count()} категорий'
+                f'\n    {Subcategory.objects.count()} подкатегорий'
+                f'\n    {totals["count"]} транзакций'
+                f'\n\n    Общий доход: {income} руб'
+                f'\n    Общий расход: {expense} руб'
+                f'\n    Баланс: {income - expense} руб'
+            )
+        )
 
+    def create_references(self):
+        """Демонстрационные справочники; возвращает объекты для create_demo_transactions"""
         # Создание статусов
         status_completed = Status.objects.create(
             name='Выполнено',
@@ -34,10 +159,12 @@ class Command(BaseCommand):
         # Создание типов операций
         type_income = TransactionType.objects.create(
             name='Пополнение',
+            direction=TransactionType.Direction.INCOME,
             description='Поступление денежных средств'
         )
         type_expense = TransactionType.objects.create(
             name='Списание',
+            direction=TransactionType.Direction.EXPENSE,
             description='Расход денежных средств'
         )
 
@@ -253,6 +380,46 @@ class Command(BaseCommand):
             description='Расходы на спорт и фитнес'
         )
 
+        return (
+            status_completed, status_pending, status_cancelled, type_income, type_expense,
+            category_salary, category_freelance, category_investments,
+            category_food, category_transport, category_utilities,
+            category_entertainment, category_health,
+        )
+
+    def generate_transactions(self, options):
+        """Синтетический журнал для нагрузочных тестов"""
+        count = options['transactions']
+        try:
+            generator = LedgerGenerator(
+                seed=options['seed'], years=options['years'], end_date=options['end_date']
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(
+            f'Генерация {count} транзакций с {generator.start_date} по {generator.end_date} '
+            f'(seed={options["seed"]})...'
+        )
+        started = time.monotonic()
+        step = max(options['batch_size'], count // 20)
+        reported = [0]
+        
+        def progress(inserted):
+            if inserted - reported[0] >= step or inserted == count:
+                reported[0] = inserted
+                elapsed = max(time.monotonic() - started, 1e-9)
+                self.stdout.write(f'  Вставлено: {inserted} ({inserted / elapsed:.0f} строк/с)')
+        
+        generator.generate(count, batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(f'  Готово за {time.monotonic() - started:.1f} с')
+
+    def create_demo_transactions(
+        self, status_completed, status_pending, status_cancelled, type_income, type_expense,
+        category_salary, category_freelance, category_investments,
+        category_food, category_transport, category_utilities,
+        category_entertainment, category_health,
+    ):
+        """Несколько десятков транзакций текущего месяца для демонстрации"""
         # Создание демонстрационных транзакций (доходы)
         income_transactions = [
             {
@@ -400,40 +567,4 @@ class Command(BaseCommand):
         all_transactions = income_transactions + expense_transactions
         
         for data in all_transactions:
-            Transaction.objects.create(**data)
-
-        # Создаем демо-пользователя для админки
-        if not User.objects.filter(username='demo').exists():
-            user = User.objects.create_user(
-                username='demo',
-                password='demo12345',
-                email='demo@example.com',
-                is_staff=True,
-                is_superuser=True
-            )
-            self.stdout.write(
-                self.style.SUCCESS(
-                    ' Создан демо-пользователь для админки:'
-                    '\n   Логин: demo'
-                    '\n   Пароль: demo12345'
-                )
-            )
-        else:
-            self.stdout.write(
-                self.style.WARNING(' Демо-пользователь уже существует')
-            )
-
-        # Выводим итоговую статистику
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'  Успешно загружено:'
-                f'\n    {Status.objects.count()} статусов'
-                f'\n    {TransactionType.objects.count()} типов операций' 
-                f'\n    {Category.objects.count()} категорий'
-                f'\n    {Subcategory.objects.count()} подкатегорий'
-                f'\n    {Transaction.objects.count()} транзакций'
-                f'\n\n    Общий доход: {sum(t.amount for t in Transaction.objects.filter(transaction_type=type_income))} руб'
-                f'\n    Общий расход: {sum(t.amount for t in Transaction.objects.filter(transaction_type=type_expense))} руб'
-                f'\n    Баланс: {sum(t.amount for t in Transaction.objects.filter(transaction_type=type_income)) - sum(t.amount for t in Transaction.objects.filter(transaction_type=type_expense))} руб'
-            )
-        )
\ No newline at end of file
+            Transaction.objects.create(**data)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from dds_app.summaries import rebuild_daily_summary
+
+class Command(BaseCommand):
+    help = 'Полный пересчет дневных итогов по транзакциям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пакета для вставки итогов'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Пересчет дневных итогов...')
+        created = rebuild_daily_summary(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'  Создано строк итогов: {created}'))
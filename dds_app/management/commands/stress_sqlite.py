@@ -0,0 +1,45 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from dds_app.stress import PROFILES, run_stress
+
+class Command(BaseCommand):
+    help = (
+        'Многопроцессный прогон чтений и записей на файле SQLite для профилей БД: '
+        'операции в секунду и ошибки "database is locked". Каждый профиль получает '
+        'новый временный файл, рабочая база не затрагивается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', choices=PROFILES, default=list(PROFILES), help='Профили БД'
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Число процессов')
+        parser.add_argument('--seconds', type=float, default=5, help='Длительность прогона профиля')
+        parser.add_argument(
+            '--write-share', type=float, default=0.3, help='Доля операций записи (0..1)'
+        )
+        parser.add_argument(
+            '--transactions', type=int, default=5000, help='Начальный размер журнала'
+        )
+        parser.add_argument('--output', help='Записать результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['seconds'] <= 0 or options['transactions'] < 1:
+            raise CommandError('--workers, --seconds и --transactions должны быть положительными')
+        if not 0 <= options['write_share'] <= 1:
+            raise CommandError('--write-share должен быть от 0 до 1')
+
+        results = run_stress(
+            options['profiles'], workers=options['workers'], seconds=options['seconds'],
+            write_share=options['write_share'], transactions=options['transactions'],
+        )
+        self.stdout.write(f'  {"профиль":<12}{"чтений/с":>10}{"записей/с":>11}{"блокировок":>12}')
+        for result in results:
+            self.stdout.write(
+                f'  {result["profile"]:<12}{result["reads_per_second"]:>10.1f}'
+                f'{result["writes_per_second"]:>11.1f}{result["locked"]:>12}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты записаны в {options["output"]}')
\ No newline at end of file
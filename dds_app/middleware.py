@@ -0,0 +1,124 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger('dds_app.performance')
+
+# Замеры текущего запроса; None - запрос не измеряется
+current_metrics = ContextVar('dds_app_request_metrics', default=None)
+
+class RequestMetrics:
+    """Время и количество SQL-запросов, время отрисовки шаблонов и общее время запроса"""
+
+    def __init__(self, slow_query_ms):
+        self.slow_query_ms = slow_query_ms
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.total_ms = 0.0
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: замер каждого запроса"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+            self.sql_ms += duration
+            if duration >= self.slow_query_ms:
+                self.slow_queries.append((duration, sql, params))
+
+    def server_timing(self):
+        return ', '.join((
+            f'sql;dur={self.sql_ms:.1f};desc="SQL ({self.sql_count})"',
+            f'tpl;dur={self.template_ms:.1f};desc="Templates"',
+            f'total;dur={self.total_ms:.1f};desc="Total"',
+        ))
+
+def instrument_templates():
+    """Замеряет Template.render для измеряемых запросов.
+
+    Сигнал template_rendered Django отправляет только в тестовом окружении,
+    поэтому время отрисовки считается оберткой; вложенные шаблоны
+    ({% include %}) входят во время внешнего и не учитываются повторно.
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    render = Template.render
+
+    @wraps(render)
+    def instrumented_render(self, context):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return render(self, context)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_ms += (time.perf_counter() - started) * 1000
+
+    instrumented_render.instrumented = True
+    Template.render = instrumented_render
+
+class PerformanceMiddleware:
+    """Замеры каждого запроса: заголовок Server-Timing и строка JSON в журнале.
+
+    Включается настройкой DDS_PERFORMANCE_MIDDLEWARE; когда она выключена,
+    Django исключает middleware из цепочки при запуске (MiddlewareNotUsed)
+    и запросы не проходят через него вовсе. Запросы к БД дольше
+    DDS_SLOW_QUERY_MS записываются в журнал вместе с SQL и параметрами.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DDS_PERFORMANCE_MIDDLEWARE', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_query_ms = getattr(settings, 'DDS_SLOW_QUERY_MS', 100)
+        instrument_templates()
+
+    def __call__(self, request):
+        metrics = RequestMetrics(self.slow_query_ms)
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        metrics.total_ms = (time.perf_counter() - started) * 1000
+
+        response['Server-Timing'] = metrics.server_timing()
+        logger.info(json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(metrics.total_ms, 2),
+            'sql_count': metrics.sql_count,
+            'sql_ms': round(metrics.sql_ms, 2),
+            'template_ms': round(metrics.template_ms, 2),
+        }, ensure_ascii=False))
+        for duration, sql, params in metrics.slow_queries:
+            logger.warning(json.dumps({
+                'event': 'slow_query',
+                'path': request.get_full_path(),
+                'duration_ms': round(duration, 2),
+                'sql': sql,
+                'params': repr(params)[:1000],
+            }, ensure_ascii=False))
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='dds_app.category', verbose_name='Категория'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='status',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='dds_app.status', verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='subcategory',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='dds_app.subcategory', verbose_name='Подкатегория'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='dds_app.transactiontype', verbose_name='Тип операции'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['-created_date', '-created_at'], name='txn_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', '-created_date', '-created_at'], name='txn_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_type', '-created_date', '-created_at', 'amount'], name='txn_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['category', '-created_date', '-created_at', 'amount'], name='txn_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['subcategory', '-created_date', '-created_at'], name='txn_subcategory_date_idx'),
+        ),
+    ]
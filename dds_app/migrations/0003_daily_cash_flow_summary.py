@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_daily_summary(apps, schema_editor):
+    """Заполняет дневные итоги по уже существующим транзакциям"""
+    Transaction = apps.get_model('dds_app', 'Transaction')
+    DailyCashFlowSummary = apps.get_model('dds_app', 'DailyCashFlowSummary')
+    rows = Transaction.objects.order_by().values(
+        'created_date', 'status_id', 'transaction_type_id', 'category_id', 'subcategory_id'
+    ).annotate(total=models.Sum('amount'), transaction_count=models.Count('id'))
+    DailyCashFlowSummary.objects.bulk_create(
+        (DailyCashFlowSummary(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0002_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCashFlowSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateField(verbose_name='Дата')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сумма (руб)')),
+                ('transaction_count', models.IntegerField(default=0, verbose_name='Количество транзакций')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='dds_app.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='dds_app.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='dds_app.subcategory', verbose_name='Подкатегория')),
+                ('transaction_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='dds_app.transactiontype', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Дневной итог',
+                'verbose_name_plural': 'Дневные итоги',
+                'ordering': ['-created_date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailycashflowsummary',
+            constraint=models.UniqueConstraint(fields=('created_date', 'status', 'transaction_type', 'category', 'subcategory'), name='daily_summary_bucket_unique'),
+        ),
+        migrations.RunPython(fill_daily_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0003_daily_cash_flow_summary'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='transaction',
+            options={'ordering': ['-created_date', '-created_at', '-id'], 'verbose_name': 'Транзакция', 'verbose_name_plural': 'Транзакции'},
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_status_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_type_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_category_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_subcategory_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_date', 'created_at'], name='txn_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'created_date', 'created_at'], name='txn_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_type', 'created_date', 'created_at', 'id', 'amount'], name='txn_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['category', 'created_date', 'created_at', 'id', 'amount'], name='txn_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['subcategory', 'created_date', 'created_at'], name='txn_subcategory_date_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:47
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def create_ledger_state(apps, schema_editor):
+    DailyCashFlowSummary = apps.get_model('dds_app', 'DailyCashFlowSummary')
+    LedgerState = apps.get_model('dds_app', 'LedgerState')
+    total = DailyCashFlowSummary.objects.aggregate(total=Sum('transaction_count'))['total'] or 0
+    LedgerState.objects.get_or_create(pk=1, defaults={'transaction_count': total})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0004_keyset_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deletion_count', models.BigIntegerField(default=0, verbose_name='Количество удалений')),
+                ('transaction_count', models.BigIntegerField(default=0, verbose_name='Количество транзакций')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Состояние журнала',
+                'verbose_name_plural': 'Состояние журнала',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['updated_at'], name='txn_updated_idx'),
+        ),
+        migrations.RunPython(create_ledger_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:50
+
+from django.db import migrations, models
+
+
+# Названия типов, которые раньше считались пополнением (в нижнем регистре)
+INCOME_TYPE_NAMES = ('пополнение', 'доход', 'income')
+
+
+def fill_direction(apps, schema_editor):
+    # LOWER() в SQLite не работает с кириллицей, поэтому сравниваем в Python
+    TransactionType = apps.get_model('dds_app', 'TransactionType')
+    income_ids = [
+        pk for pk, name in TransactionType.objects.values_list('pk', 'name')
+        if name.lower() in INCOME_TYPE_NAMES
+    ]
+    TransactionType.objects.filter(pk__in=income_ids).update(direction='income')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0005_ledger_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactiontype',
+            name='direction',
+            field=models.CharField(choices=[('income', 'Пополнение'), ('expense', 'Списание')], db_index=True, default='expense', max_length=10, verbose_name='Направление'),
+        ),
+        migrations.RunPython(fill_direction, migrations.RunPython.noop),
+    ]
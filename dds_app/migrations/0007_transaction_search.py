@@ -0,0 +1,93 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:23
+
+import dds_app.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Индекс хранит только токены, текст читается из представления над транзакциями.
+# unicode61 приводит кириллицу к нижнему регистру, а "ё" заменяется на "е"
+# заранее, так как remove_diacritics действует только на латиницу
+NORMALIZED_COMMENT = "replace(replace({}.comment, 'ё', 'е'), 'Ё', 'Е')"
+CREATE_SEARCH_SQL = [
+    f"""
+    CREATE VIEW dds_app_transaction_search_source AS
+    SELECT id, {NORMALIZED_COMMENT.format('dds_app_transaction')} AS comment
+    FROM dds_app_transaction
+    """,
+    """
+    CREATE VIRTUAL TABLE dds_app_transaction_search USING fts5(
+        comment,
+        content='dds_app_transaction_search_source',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER dds_app_transaction_search_insert AFTER INSERT ON dds_app_transaction BEGIN
+        INSERT INTO dds_app_transaction_search (rowid, comment)
+        VALUES (new.id, {NORMALIZED_COMMENT.format('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER dds_app_transaction_search_delete AFTER DELETE ON dds_app_transaction BEGIN
+        INSERT INTO dds_app_transaction_search (dds_app_transaction_search, rowid, comment)
+        VALUES ('delete', old.id, {NORMALIZED_COMMENT.format('old')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER dds_app_transaction_search_update AFTER UPDATE OF comment ON dds_app_transaction BEGIN
+        INSERT INTO dds_app_transaction_search (dds_app_transaction_search, rowid, comment)
+        VALUES ('delete', old.id, {NORMALIZED_COMMENT.format('old')});
+        INSERT INTO dds_app_transaction_search (rowid, comment)
+        VALUES (new.id, {NORMALIZED_COMMENT.format('new')});
+    END
+    """,
+    # Индексация уже существующих транзакций
+    "INSERT INTO dds_app_transaction_search (dds_app_transaction_search) VALUES ('rebuild')",
+]
+DROP_SEARCH_SQL = [
+    'DROP TRIGGER IF EXISTS dds_app_transaction_search_update',
+    'DROP TRIGGER IF EXISTS dds_app_transaction_search_delete',
+    'DROP TRIGGER IF EXISTS dds_app_transaction_search_insert',
+    'DROP TABLE IF EXISTS dds_app_transaction_search',
+    'DROP VIEW IF EXISTS dds_app_transaction_search_source',
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 есть только в SQLite; в других СУБД поиск идет по LIKE
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SEARCH_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SEARCH_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0006_transaction_type_direction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearch',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='dds_app.transaction', verbose_name='Транзакция')),
+                ('comment', dds_app.models.FullTextField(verbose_name='Комментарий')),
+                ('rank', models.FloatField(verbose_name='Релевантность')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс транзакции',
+                'verbose_name_plural': 'Поисковый индекс транзакций',
+                'db_table': 'dds_app_transaction_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
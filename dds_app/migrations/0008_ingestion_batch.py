@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0007_transaction_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='Ключ идемпотентности')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='SHA-256 тела запроса')),
+                ('transaction_count', models.IntegerField(verbose_name='Количество транзакций')),
+                ('response', models.JSONField(verbose_name='Ответ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+            ],
+            options={
+                'verbose_name': 'Пакет загрузки',
+                'verbose_name_plural': 'Пакеты загрузки',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:37
+
+import django.core.validators
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Пока архивов нет, журнал совпадает с рабочей таблицей; архивация
+# пересоздает представление с UNION ALL по годовым архивным таблицам
+LEDGER_COLUMNS = (
+    'id, created_date, status_id, transaction_type_id, category_id, subcategory_id, '
+    'amount, comment, created_at, updated_at'
+)
+CREATE_LEDGER_SQL = f"""
+    CREATE VIEW dds_app_ledger AS
+    SELECT {LEDGER_COLUMNS}, 0 AS archived FROM dds_app_transaction
+"""
+DROP_LEDGER_SQL = 'DROP VIEW IF EXISTS dds_app_ledger'
+
+
+def create_ledger_view(apps, schema_editor):
+    schema_editor.execute(CREATE_LEDGER_SQL)
+
+
+def drop_ledger_view(apps, schema_editor):
+    schema_editor.execute(DROP_LEDGER_SQL)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0008_ingestion_batch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateField(default=django.utils.timezone.now, verbose_name='Дата создания')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0.01)], verbose_name='Сумма (руб)')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания записи')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('archived', models.BooleanField(default=False, verbose_name='В архиве')),
+            ],
+            options={
+                'verbose_name': 'Транзакция журнала',
+                'verbose_name_plural': 'Журнал транзакций',
+                'db_table': 'dds_app_ledger',
+                'ordering': ['-created_date', '-created_at', '-id'],
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(unique=True, verbose_name='Год')),
+                ('row_count', models.IntegerField(default=0, verbose_name='Количество транзакций')),
+                ('archived_at', models.DateTimeField(auto_now=True, verbose_name='Дата архивации')),
+            ],
+            options={
+                'verbose_name': 'Архив года',
+                'verbose_name_plural': 'Архивы по годам',
+                'ordering': ['year'],
+            },
+        ),
+        migrations.RunPython(create_ledger_view, drop_ledger_view),
+    ]
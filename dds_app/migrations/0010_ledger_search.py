@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:51
+
+import dds_app.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+NORMALIZED_COMMENT = "replace(replace(comment, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def source_sql(tables):
+    return 'CREATE VIEW dds_app_transaction_search_source AS ' + ' UNION ALL '.join(
+        f'SELECT id, {NORMALIZED_COMMENT} AS comment FROM {table}' for table in tables
+    )
+
+
+def archive_tables(apps):
+    TransactionArchive = apps.get_model('dds_app', 'TransactionArchive')
+    return [
+        f'dds_app_transaction_{year}'
+        for year in TransactionArchive.objects.values_list('year', flat=True)
+    ]
+
+
+def index_archives(apps, schema_editor):
+    # Архивы, созданные до общего индекса, выпали из него при переносе
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    tables = archive_tables(apps)
+    schema_editor.execute('DROP VIEW IF EXISTS dds_app_transaction_search_source')
+    schema_editor.execute(source_sql(['dds_app_transaction'] + tables))
+    for table in tables:
+        schema_editor.execute(
+            f'INSERT INTO dds_app_transaction_search (rowid, comment) '
+            f'SELECT id, {NORMALIZED_COMMENT} FROM {table}'
+        )
+
+
+def unindex_archives(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    tables = archive_tables(apps)
+    for table in tables:
+        schema_editor.execute(
+            "INSERT INTO dds_app_transaction_search (dds_app_transaction_search, rowid, comment) "
+            f"SELECT 'delete', id, {NORMALIZED_COMMENT} FROM {table}"
+        )
+    schema_editor.execute('DROP VIEW IF EXISTS dds_app_transaction_search_source')
+    schema_editor.execute(source_sql(['dds_app_transaction']))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0009_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerSearch',
+            fields=[
+                ('comment', dds_app.models.FullTextField(verbose_name='Комментарий')),
+                ('rank', models.FloatField(verbose_name='Релевантность')),
+                ('transaction', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='dds_app.ledgertransaction', verbose_name='Транзакция')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс журнала',
+                'verbose_name_plural': 'Поисковый индекс журнала',
+                'db_table': 'dds_app_transaction_search',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(index_archives, unindex_archives),
+    ]
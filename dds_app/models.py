@@ -19,7 +19,20 @@ class Status(models.Model):
 
 class TransactionType(models.Model):
     """Модель для типов операций (Пополнение/Списание)"""
+    
+    class Direction(models.TextChoices):
+        INCOME = 'income', 'Пополнение'
+        EXPENSE = 'expense', 'Списание'
+    
     name = models.CharField(max_length=100, verbose_name="Название типа")
+    # Разделение на доходы и расходы не зависит от названия типа
+    direction = models.CharField(
+        max_length=10,
+        choices=Direction.choices,
+        default=Direction.EXPENSE,
+        db_index=True,
+        verbose_name="Направление"
+    )
     description = models.TextField(blank=True, verbose_name="Описание")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     
@@ -71,8 +84,8 @@ class Subcategory(models.Model):
     def __str__(self):
         return f"{self.name} ({self.category})"
 
-class Transaction(models.Model):
-    """Основная модель для транзакций ДДС"""
+class AbstractTransaction(models.Model):
+    """Поля и методы транзакции, общие для рабочей таблицы и журнала с архивом"""
     created_date = models.DateField(
         default=timezone.now,
         verbose_name="Дата создания"
@@ -80,21 +93,25 @@ class Transaction(models.Model):
     status = models.ForeignKey(
         Status, 
         on_delete=models.PROTECT, 
+        db_index=False,
         verbose_name="Статус"
     )
     transaction_type = models.ForeignKey(
         TransactionType, 
         on_delete=models.PROTECT, 
+        db_index=False,
         verbose_name="Тип операции"
     )
     category = models.ForeignKey(
         Category, 
         on_delete=models.PROTECT, 
+        db_index=False,
         verbose_name="Категория"
     )
     subcategory = models.ForeignKey(
         Subcategory, 
         on_delete=models.PROTECT, 
+        db_index=False,
         verbose_name="Подкатегория"
     )
     amount = models.DecimalField(
@@ -108,17 +125,268 @@ class Transaction(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     
     class Meta:
-        verbose_name = "Транзакция"
-        verbose_name_plural = "Транзакции"
-        ordering = ['-created_date', '-created_at']
+        abstract = True
+        # id делает порядок однозначным для курсорной пагинации
+        ordering = ['-created_date', '-created_at', '-id']
     
     def __str__(self):
         return f"{self.created_date} - {self.amount} руб - {self.category}"
     
-    def get_absolute_url(self):
-        return reverse('transaction_list')
-    
     @property
     def is_income(self):
         """Проверяет, является ли транзакция пополнением"""
-        return self.transaction_type.name.lower() in ['пополнение', 'доход', 'income']
\ No newline at end of file
+        return self.transaction_type.direction == TransactionType.Direction.INCOME
+    
+    @property
+    def signed_amount(self):
+        """Сумма со знаком: пополнения увеличивают остаток, списания уменьшают"""
+        return self.amount if self.is_income else -self.amount
+
+class Transaction(AbstractTransaction):
+    """Основная модель для транзакций ДДС"""
+    
+    class Meta(AbstractTransaction.Meta):
+        verbose_name = "Транзакция"
+        verbose_name_plural = "Транзакции"
+        # Индексы по возрастанию: обратный проход по ним дает порядок по
+        # убыванию вместе с id (rowid), который SQLite хранит в конце ключа
+        indexes = [
+            # Сортировка по умолчанию и фильтр по диапазону дат
+            models.Index(fields=['created_date', 'created_at'], name='txn_date_idx'),
+            # Фильтры по справочникам вместе с диапазоном дат и сортировкой.
+            # Они же заменяют одиночные индексы внешних ключей, а сумма
+            # в конце (после явного id) делает индексы покрывающими для итогов
+            models.Index(
+                fields=['status', 'created_date', 'created_at'],
+                name='txn_status_date_idx'
+            ),
+            models.Index(
+                fields=['transaction_type', 'created_date', 'created_at', 'id', 'amount'],
+                name='txn_type_date_idx'
+            ),
+            models.Index(
+                fields=['category', 'created_date', 'created_at', 'id', 'amount'],
+                name='txn_category_date_idx'
+            ),
+            models.Index(
+                fields=['subcategory', 'created_date', 'created_at'],
+                name='txn_subcategory_date_idx'
+            ),
+            # Время последнего изменения журнала для условных GET-запросов
+            models.Index(fields=['updated_at'], name='txn_updated_idx'),
+        ]
+    
+    def get_absolute_url(self):
+        return reverse('transaction_list')
+
+class LedgerTransaction(AbstractTransaction):
+    """Транзакции рабочей таблицы вместе с архивными (представление БД).
+
+    Представление объединяет рабочую таблицу и годовые архивные таблицы
+    через UNION ALL и пересоздается при архивации. Модель только для чтения:
+    к ней обращаются списки и выгрузки, период которых заходит в архивные годы.
+    """
+    archived = models.BooleanField(default=False, verbose_name="В архиве")
+    
+    class Meta(AbstractTransaction.Meta):
+        managed = False
+        db_table = 'dds_app_ledger'
+        verbose_name = "Транзакция журнала"
+        verbose_name_plural = "Журнал транзакций"
+
+class TransactionArchive(models.Model):
+    """Закрытый год, транзакции которого перенесены в архивную таблицу"""
+    year = models.IntegerField(unique=True, verbose_name="Год")
+    row_count = models.IntegerField(default=0, verbose_name="Количество транзакций")
+    archived_at = models.DateTimeField(auto_now=True, verbose_name="Дата архивации")
+    
+    class Meta:
+        verbose_name = "Архив года"
+        verbose_name_plural = "Архивы по годам"
+        ordering = ['year']
+    
+    def __str__(self):
+        return f"{self.year} ({self.row_count})"
+
+class DailyCashFlowSummary(models.Model):
+    """Дневные итоги по транзакциям в разрезе справочников.
+
+    Поддерживаются сигналами при сохранении и удалении транзакций,
+    полностью пересчитываются командой rebuild_daily_summary.
+    """
+    created_date = models.DateField(verbose_name="Дата")
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.CASCADE,
+        verbose_name="Статус",
+        related_name='daily_summaries'
+    )
+    transaction_type = models.ForeignKey(
+        TransactionType,
+        on_delete=models.CASCADE,
+        verbose_name="Тип операции",
+        related_name='daily_summaries'
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        verbose_name="Категория",
+        related_name='daily_summaries'
+    )
+    subcategory = models.ForeignKey(
+        Subcategory,
+        on_delete=models.CASCADE,
+        verbose_name="Подкатегория",
+        related_name='daily_summaries'
+    )
+    total = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма (руб)"
+    )
+    transaction_count = models.IntegerField(default=0, verbose_name="Количество транзакций")
+    
+    class Meta:
+        verbose_name = "Дневной итог"
+        verbose_name_plural = "Дневные итоги"
+        ordering = ['-created_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['created_date', 'status', 'transaction_type', 'category', 'subcategory'],
+                name='daily_summary_bucket_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.created_date} - {self.total} руб - {self.category}"
+
+class LedgerState(models.Model):
+    """Служебная запись журнала транзакций (единственная строка с pk=1).
+
+    Удаление не оставляет следа в updated_at транзакций, поэтому счетчик
+    удалений нужен, чтобы отличать журнал после удаления от прежнего.
+    Число транзакций журнала (с архивом) ведется здесь же, чтобы отпечаток
+    журнала читал одну строку, а не суммировал все дневные итоги.
+    """
+    deletion_count = models.BigIntegerField(default=0, verbose_name="Количество удалений")
+    transaction_count = models.BigIntegerField(default=0, verbose_name="Количество транзакций")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    
+    class Meta:
+        verbose_name = "Состояние журнала"
+        verbose_name_plural = "Состояние журнала"
+    
+    def __str__(self):
+        return f"Транзакций: {self.transaction_count}, удалений: {self.deletion_count}"
+    
+    @classmethod
+    def record(cls, inserted=0, deleted=0, moved=0):
+        """Учитывает вставленные, удаленные и перенесенные в архив транзакции.
+
+        Перенос в архив для рабочей таблицы выглядит как удаление,
+        но число транзакций журнала не меняет.
+        """
+        updated = cls.objects.filter(pk=1).update(
+            transaction_count=models.F('transaction_count') + inserted - deleted,
+            deletion_count=models.F('deletion_count') + deleted + moved,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            cls.objects.get_or_create(pk=1, defaults={
+                'transaction_count': inserted - deleted, 'deletion_count': deleted + moved,
+            })
+    
+    @classmethod
+    def record_insertions(cls, count=1):
+        """Увеличивает число транзакций журнала"""
+        cls.record(inserted=count)
+    
+    @classmethod
+    def record_deletions(cls, count=1):
+        """Увеличивает счетчик удалений и уменьшает число транзакций журнала"""
+        cls.record(deleted=count)
+
+
+class IngestionBatch(models.Model):
+    """Принятый пакет транзакций из API загрузки.
+
+    Ключ идемпотентности уникален: повтор пакета с тем же ключом получает
+    сохраненный ответ вместо повторной вставки транзакций.
+    """
+    key = models.CharField(max_length=255, unique=True, verbose_name="Ключ идемпотентности")
+    request_hash = models.CharField(max_length=64, verbose_name="SHA-256 тела запроса")
+    transaction_count = models.IntegerField(verbose_name="Количество транзакций")
+    response = models.JSONField(verbose_name="Ответ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата загрузки")
+    
+    class Meta:
+        verbose_name = "Пакет загрузки"
+        verbose_name_plural = "Пакеты загрузки"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.key} ({self.transaction_count})"
+
+class FullTextField(models.TextField):
+    """Колонка полнотекстового индекса FTS5 с поиском через lookup match"""
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    """Запрос FTS5: column MATCH 'выражение'"""
+    lookup_name = 'match'
+    
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+class AbstractTransactionSearch(models.Model):
+    """Колонки полнотекстового индекса комментариев (виртуальная таблица FTS5)"""
+    comment = FullTextField(verbose_name="Комментарий")
+    # Скрытая колонка FTS5: релевантность bm25, чем меньше, тем лучше
+    rank = models.FloatField(verbose_name="Релевантность")
+    
+    class Meta:
+        abstract = True
+        managed = False
+        db_table = 'dds_app_transaction_search'
+
+class TransactionSearch(AbstractTransactionSearch):
+    """Полнотекстовый индекс комментариев транзакций (виртуальная таблица FTS5).
+
+    Таблица создается миграцией только в SQLite и поддерживается триггерами
+    БД при любых изменениях транзакций, включая массовые вставки в обход ORM.
+    Модель нужна для JOIN из запросов к транзакциям и не используется для записи.
+    """
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search',
+        verbose_name="Транзакция"
+    )
+    
+    class Meta(AbstractTransactionSearch.Meta):
+        verbose_name = "Поисковый индекс транзакции"
+        verbose_name_plural = "Поисковый индекс транзакций"
+
+class LedgerSearch(AbstractTransactionSearch):
+    """Тот же индекс FTS5 для JOIN из журнала с архивом.
+
+    Архивация заново индексирует перенесенные транзакции, поэтому индекс
+    покрывает и рабочую таблицу, и архивные.
+    """
+    transaction = models.OneToOneField(
+        LedgerTransaction,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search',
+        verbose_name="Транзакция"
+    )
+    
+    class Meta(AbstractTransactionSearch.Meta):
+        verbose_name = "Поисковый индекс журнала"
+        verbose_name_plural = "Поисковый индекс журнала"
\ No newline at end of file
@@ -0,0 +1,134 @@
+from django.core import signing
+from django.db.models import Q, Sum
+from django.http import Http404
+from django.utils.dateparse import parse_date, parse_datetime
+from .reports import balance_totals, money, signed_amount, with_running_balance
+
+class CursorPage:
+    """Страница курсорной пагинации с токенами соседних страниц"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+class CursorPaginator:
+    """Курсорная (keyset) пагинация транзакций по (created_date, created_at, id).
+
+    Вместо OFFSET следующая страница выбирается условием "строго после
+    последней строки", поэтому любая страница стоит столько же, сколько первая.
+    Курсоры подписаны и не раскрывают своего содержимого в URL.
+
+    С closing_balance (остаток после самой новой строки) строки страниц
+    получают running_balance. Курсор хранит только позицию: остаток на его
+    границе пересчитывается по дневным итогам summaries (те же фильтры без
+    начала периода) и строкам дня границы, поэтому правки журнала после
+    выдачи курсора не искажают остатки соседних страниц.
+    """
+    salt = 'dds_app.pagination.cursor'
+
+    def __init__(self, queryset, per_page, closing_balance=None, summaries=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.closing_balance = closing_balance
+        self.summaries = summaries
+
+    def encode_cursor(self, obj, direction):
+        return signing.dumps(
+            [obj.created_date.isoformat(), obj.created_at.isoformat(), obj.pk, direction],
+            salt=self.salt,
+            compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        try:
+            created_date, created_at, pk, direction = signing.loads(cursor, salt=self.salt)
+            created_date = parse_date(created_date)
+            created_at = parse_datetime(created_at)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise Http404('Неверный курсор страницы')
+        if created_date is None or created_at is None or direction not in ('next', 'prev'):
+            raise Http404('Неверный курсор страницы')
+        return created_date, created_at, pk, direction
+
+    def balance_at(self, created_date, created_at, pk, inclusive):
+        """Остаток на границе курсора: после строки pk (inclusive) или перед ней.
+
+        Дни до границы суммируются по дневным итогам, день границы -
+        по его транзакциям до строки курсора.
+        """
+        if self.closing_balance is None:
+            return None
+        before = Q(id__lte=pk) if inclusive else Q(id__lt=pk)
+        day = self.queryset.filter(created_date=created_date).filter(
+            Q(created_at__lt=created_at) | (Q(created_at=created_at) & before)
+        ).order_by().aggregate(total=Sum(signed_amount()))['total']
+        return balance_totals(self.summaries, created_date)['opening_balance'] + money(day or 0)
+
+    def with_balance(self, queryset, balance, oldest_first=False):
+        """Аннотирует остаток, если он нужен"""
+        if balance is None:
+            return queryset
+        return with_running_balance(queryset, balance, oldest_first=oldest_first)
+
+    def page(self, cursor=None):
+        """Возвращает страницу после (next) или перед (prev) строкой курсора"""
+        queryset = self.queryset.order_by('-created_date', '-created_at', '-id')
+        if not cursor:
+            rows = list(self.with_balance(queryset, self.closing_balance)[:self.per_page + 1])
+            return self.build_page(rows, has_more=len(rows) > self.per_page, has_before=False)
+
+        created_date, created_at, pk, direction = self.decode_cursor(cursor)
+        # Для более старых строк нужен остаток перед строкой курсора, для более новых - после нее
+        balance = self.balance_at(created_date, created_at, pk, inclusive=direction == 'prev')
+        if direction == 'next':
+            # Условие по дате использует индекс, остальное проверяется только в пределах одного дня
+            rows = list(self.with_balance(
+                queryset.filter(created_date__lte=created_date).filter(
+                    Q(created_date__lt=created_date)
+                    | Q(created_at__lt=created_at)
+                    | Q(created_at=created_at, id__lt=pk)
+                ), balance
+            )[:self.per_page + 1])
+            return self.build_page(rows, has_more=len(rows) > self.per_page, has_before=True)
+
+        # Более новые строки выбираются от старых к новым, остаток растет от курсора
+        rows = list(self.with_balance(
+            queryset.filter(created_date__gte=created_date).filter(
+                Q(created_date__gt=created_date)
+                | Q(created_at__gt=created_at)
+                | Q(created_at=created_at, id__gt=pk)
+            ).reverse(), balance, oldest_first=True
+        )[:self.per_page + 1])
+        if not rows:
+            # Более новых строк не осталось - показываем первую страницу
+            return self.page()
+        has_before = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self.build_page(rows, has_more=True, has_before=has_before)
+
+    def build_page(self, rows, has_more, has_before):
+        rows = rows[:self.per_page]
+        if not rows:
+            return CursorPage(rows)
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if has_more else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if has_before else None,
+        )
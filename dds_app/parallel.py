@@ -0,0 +1,32 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection
+
+def in_transaction():
+    return connection.in_atomic_block
+
+def isolated(query):
+    """Запрос в потоке пула со своим соединением, которое живет по правилам CONN_MAX_AGE"""
+    def run():
+        close_old_connections()
+        try:
+            return query()
+        finally:
+            close_old_connections()
+    return run
+
+async def run_queries(*queries):
+    """Выполняет независимые запросы одновременно и возвращает их результаты по порядку.
+
+    Асинхронные методы ORM Django 4.2 (aaggregate, async for) выполняют
+    запросы через sync_to_async в одном общем потоке, то есть по очереди,
+    поэтому каждый запрос здесь идет в отдельном потоке пула со своим
+    соединением с БД. Внутри транзакции (ATOMIC_REQUESTS, тесты) другие
+    соединения не видят ее изменений - тогда запросы выполняются по очереди
+    в потоке, которому принадлежит транзакция.
+    """
+    if await sync_to_async(in_transaction)():
+        return [await sync_to_async(query)() for query in queries]
+    return await asyncio.gather(*(
+        sync_to_async(isolated(query), thread_sensitive=False)() for query in queries
+    ))
\ No newline at end of file
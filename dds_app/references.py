@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+from django.utils.functional import cached_property
+from .caching import get_version
+from .models import Status, TransactionType, Category, Subcategory
+
+class ReferenceData:
+    """Снимок справочников с индексами по id и по родителю"""
+
+    def __init__(self, statuses, transaction_types, categories, subcategories):
+        self.statuses = statuses
+        self.transaction_types = transaction_types
+        self.categories = categories
+        self.subcategories = subcategories
+
+        self.by_id = {
+            Status: {obj.pk: obj for obj in statuses},
+            TransactionType: {obj.pk: obj for obj in transaction_types},
+            Category: {obj.pk: obj for obj in categories},
+            Subcategory: {obj.pk: obj for obj in subcategories},
+        }
+
+        # Родители подставляются из индекса, поэтому __str__ не обращается к БД
+        self.categories_by_type = {obj.pk: [] for obj in transaction_types}
+        for category in categories:
+            category.transaction_type = self.by_id[TransactionType][category.transaction_type_id]
+            self.categories_by_type[category.transaction_type_id].append(category)
+
+        self.subcategories_by_category = {obj.pk: [] for obj in categories}
+        for subcategory in subcategories:
+            subcategory.category = self.by_id[Category][subcategory.category_id]
+            self.subcategories_by_category[subcategory.category_id].append(subcategory)
+
+        self._memo = {}
+
+    @classmethod
+    def load(cls):
+        return cls(
+            list(Status.objects.all()),
+            list(TransactionType.objects.all()),
+            list(Category.objects.all()),
+            list(Subcategory.objects.all()),
+        )
+
+    def objects_for(self, model):
+        """Все объекты справочника model в порядке сортировки модели"""
+        return {
+            Status: self.statuses,
+            TransactionType: self.transaction_types,
+            Category: self.categories,
+            Subcategory: self.subcategories,
+        }[model]
+
+    def get(self, model, pk):
+        """Объект справочника model по id или None"""
+        return self.by_id[model].get(pk)
+
+    def categories_for_type(self, transaction_type_id):
+        return self.categories_by_type.get(transaction_type_id, [])
+
+    def subcategories_for_category(self, category_id):
+        return self.subcategories_by_category.get(category_id, [])
+
+    @cached_property
+    def tree(self):
+        """Дерево тип -> категории -> подкатегории для зависимых списков на клиенте"""
+        return {
+            'types': [
+                {
+                    'id': transaction_type.pk,
+                    'name': transaction_type.name,
+                    'direction': transaction_type.direction,
+                    'categories': [
+                        {
+                            'id': category.pk,
+                            'name': category.name,
+                            'subcategories': [
+                                {'id': subcategory.pk, 'name': subcategory.name}
+                                for subcategory in self.subcategories_for_category(category.pk)
+                            ],
+                        }
+                        for category in self.categories_for_type(transaction_type.pk)
+                    ],
+                }
+                for transaction_type in self.transaction_types
+            ],
+        }
+
+    @cached_property
+    def tree_json(self):
+        return json.dumps(self.tree, ensure_ascii=False, separators=(',', ':')).encode()
+
+    @cached_property
+    def tree_etag(self):
+        """Строгий ETag дерева: меняется только вместе с его содержимым"""
+        return hashlib.sha256(self.tree_json).hexdigest()
+
+    @cached_property
+    def fingerprint(self):
+        """Хеш содержимого всех справочников, включая статусы"""
+        statuses = json.dumps([[obj.pk, obj.name] for obj in self.statuses], ensure_ascii=False)
+        return hashlib.sha256(self.tree_json + statuses.encode()).hexdigest()
+
+    def memoize(self, key, compute):
+        """Значение, вычисленное один раз для этого снимка справочников"""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+class ReferenceRegistry:
+    """Кеш справочников в памяти процесса.
+
+    Снимок перечитывается из БД, когда меняется версия 'reference' в общем
+    кеше, поэтому изменения в одном воркере видны во всех остальных.
+    """
+
+    def __init__(self):
+        self._snapshot = (None, None)
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = get_version('reference')
+        snapshot_version, data = self._snapshot
+        if data is None or snapshot_version != version:
+            with self._lock:
+                snapshot_version, data = self._snapshot
+                if data is None or snapshot_version != version:
+                    data = ReferenceData.load()
+                    self._snapshot = (version, data)
+        return data
+
+registry = ReferenceRegistry()
+
+def get_references():
+    """Текущий снимок справочников"""
+    return registry.get()
@@ -0,0 +1,171 @@
+from decimal import Decimal
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, Q, RowRange, Sum, Value, When, Window
+)
+from django.db.models.functions import Coalesce, Round, TruncDay, TruncMonth, TruncQuarter, TruncWeek
+from .models import Category, Subcategory, TransactionType
+from .references import get_references
+from .summaries import CENT
+
+# Разделение итогов на доходы и расходы по направлению типа операции
+INCOME_FILTER = Q(transaction_type__direction=TransactionType.Direction.INCOME)
+EXPENSE_FILTER = Q(transaction_type__direction=TransactionType.Direction.EXPENSE)
+# Функции усечения даты до начала периода (неделя начинается с понедельника)
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+# Поле дневных итогов и модель справочника для разбивки отчета
+GROUPINGS = {
+    'category': Category,
+    'subcategory': Subcategory,
+}
+
+def amount_field():
+    return DecimalField(max_digits=16, decimal_places=2)
+
+def money(value):
+    return Decimal(value).quantize(CENT)
+
+def cash_flow_rows(summaries, period='month', group_by=''):
+    """Доходы, расходы и количество операций по периодам одним запросом.
+
+    Группировка выполняется в БД по дневным итогам: число строк ответа
+    зависит от числа периодов и элементов разбивки, а не от числа транзакций.
+    """
+    amount = amount_field()
+    fields = ['period'] + ([group_by] if group_by else [])
+    return summaries.order_by().annotate(
+        period=PERIODS[period]('created_date')
+    ).values(*fields).annotate(
+        income=Coalesce(Sum('total', filter=INCOME_FILTER), Decimal('0'), output_field=amount),
+        expense=Coalesce(Sum('total', filter=EXPENSE_FILTER), Decimal('0'), output_field=amount),
+        count=Sum('transaction_count'),
+    ).order_by(*fields)
+
+def breakdown(summaries, field):
+    """Доходы, расходы и количество операций по элементам справочника field одним запросом"""
+    model = summaries.model._meta.get_field(field).related_model
+    references = get_references()
+    amount = amount_field()
+    rows = summaries.order_by().values(field).annotate(
+        income=Coalesce(Sum('total', filter=INCOME_FILTER), Decimal('0'), output_field=amount),
+        expense=Coalesce(Sum('total', filter=EXPENSE_FILTER), Decimal('0'), output_field=amount),
+        count=Sum('transaction_count'),
+    ).order_by(field)
+    result = []
+    for row in rows:
+        obj = references.get(model, row[field])
+        result.append({
+            'id': row[field],
+            'name': obj.name if obj else None,
+            'income': str(money(row['income'])),
+            'expense': str(money(row['expense'])),
+            'count': row['count'],
+        })
+    return result
+
+def cash_flow_report(summaries, period='month', group_by=''):
+    """Отчет для JSON: строки по периодам и общие итоги.
+
+    Суммы передаются строками, чтобы не терять копейки во float;
+    названия категорий и подкатегорий берутся из реестра справочников.
+    """
+    references = get_references()
+    model = GROUPINGS.get(group_by)
+    rows = []
+    total_income = total_expense = Decimal('0')
+    total_count = 0
+    for row in cash_flow_rows(summaries, period, group_by):
+        income, expense = money(row['income']), money(row['expense'])
+        total_income += income
+        total_expense += expense
+        total_count += row['count']
+        item = {
+            'period': row['period'].isoformat(),
+            'income': str(income),
+            'expense': str(expense),
+            'net': str(income - expense),
+            'count': row['count'],
+        }
+        if model is not None:
+            obj = references.get(model, row[group_by])
+            item[group_by] = {'id': row[group_by], 'name': obj.name if obj else None}
+        rows.append(item)
+    return {
+        'period': period,
+        'group_by': group_by or None,
+        'rows': rows,
+        'totals': {
+            'income': str(total_income),
+            'expense': str(total_expense),
+            'net': str(total_income - total_expense),
+            'count': total_count,
+        },
+    }
+
+def balance_totals(summaries, start_date=None):
+    """Доходы, расходы и остатки на начало и конец периода одним запросом.
+
+    summaries - дневные итоги с фильтрами по справочникам и концу периода,
+    но без начала: входящий остаток на start_date складывается из дневных
+    итогов до этой даты, без пересчета всей истории транзакций.
+    """
+    # Пустой Q() в filter агрегата не добавляет условия
+    period = Q(created_date__gte=start_date) if start_date else Q()
+    history = Q(created_date__lt=start_date) if start_date else None
+    aggregates = {
+        'total_income': Sum('total', filter=INCOME_FILTER & period),
+        'total_expense': Sum('total', filter=EXPENSE_FILTER & period),
+        'total_count': Sum('transaction_count', filter=period),
+    }
+    if history is not None:
+        aggregates['opening_income'] = Sum('total', filter=INCOME_FILTER & history)
+        aggregates['opening_expense'] = Sum('total', filter=EXPENSE_FILTER & history)
+    values = summaries.order_by().aggregate(**aggregates)
+
+    totals = {
+        'total_income': money(values['total_income'] or 0),
+        'total_expense': money(values['total_expense'] or 0),
+        'total_count': values['total_count'] or 0,
+    }
+    totals['balance'] = totals['total_income'] - totals['total_expense']
+    totals['opening_balance'] = (
+        money(values.get('opening_income') or 0) - money(values.get('opening_expense') or 0)
+    )
+    totals['closing_balance'] = totals['opening_balance'] + totals['balance']
+    return totals
+
+def signed_amount():
+    """Сумма со знаком: доходы увеличивают остаток, расходы уменьшают"""
+    return Case(
+        When(INCOME_FILTER, then=F('amount')), default=-F('amount'), output_field=amount_field()
+    )
+
+def with_running_balance(queryset, balance, oldest_first=False):
+    """Аннотирует running_balance - остаток после каждой транзакции.
+
+    Остаток считается оконной функцией в БД в порядке выборки, поэтому
+    остаток на странице N не требует суммирования предыдущих страниц.
+    По умолчанию строки идут от новых к старым и balance - остаток после
+    самой новой строки; с oldest_first=True - от старых к новым, и balance -
+    остаток перед самой старой строкой.
+    """
+    order_by = [F('created_date'), F('created_at'), F('id')]
+    if not oldest_first:
+        order_by = [field.desc() for field in order_by]
+    cumulative = Window(
+        Sum(signed_amount()), order_by=order_by, frame=RowRange(start=None, end=0)
+    )
+    if oldest_first:
+        expression = Value(balance, output_field=amount_field()) + cumulative
+    else:
+        # Сумма от самой новой строки до текущей включительно; текущая строка
+        # возвращается обратно, так как остаток - после нее
+        expression = Value(balance, output_field=amount_field()) - cumulative + signed_amount()
+    # SQLite суммирует в double, округление убирает накопленную погрешность
+    return queryset.annotate(running_balance=Round(
+        ExpressionWrapper(expression, output_field=amount_field()), 2, output_field=amount_field()
+    ))
\ No newline at end of file
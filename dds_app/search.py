@@ -0,0 +1,83 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from .models import TransactionSearch
+
+# Слова запроса: буквы и цифры любого алфавита
+WORD_RE = re.compile(r'\w+')
+MAX_SEARCH_WORDS = 10
+# Текст комментария в индексе, как в миграции 0007: "ё" заменяется на "е"
+NORMALIZED_COMMENT = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+# Представление, из которого FTS5 читает текст комментариев (content=)
+SEARCH_SOURCE = 'dds_app_transaction_search_source'
+
+def search_words(text):
+    """Слова запроса в нижнем регистре, "ё" заменяется на "е", как в индексе"""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return words[:MAX_SEARCH_WORDS]
+
+def match_expression(words):
+    """Выражение FTS5: все слова обязательны, каждое - как начало слова.
+
+    Поиск по префиксу находит разные формы слова ("оплат" - "оплата",
+    "оплаты", "оплатой"); кавычки не дают словам стать операторами FTS5.
+    """
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_transactions(queryset, text):
+    """Транзакции, комментарий которых содержит все слова запроса.
+
+    В SQLite поиск идет по индексу FTS5 и не просматривает таблицу, в других
+    СУБД - условием LIKE по каждому слову.
+    """
+    words = search_words(text)
+    if not words:
+        return queryset
+    if connection.vendor == 'sqlite':
+        return queryset.filter(search__comment__match=match_expression(words))
+    condition = Q()
+    for word in words:
+        condition &= Q(comment__icontains=word)
+    return queryset.filter(condition)
+
+def rank_ordering():
+    """Сортировка найденных транзакций: сначала наиболее релевантные, затем новые"""
+    ordering = ['-created_date', '-created_at', '-id']
+    if connection.vendor == 'sqlite':
+        ordering.insert(0, 'search__rank')
+    return ordering
+
+def rebuild_search_source(tables):
+    """Пересоздает представление с текстом индекса FTS5 по таблицам транзакций tables.
+
+    Индекс покрывает рабочую таблицу и архивные, поэтому команда FTS5
+    'rebuild' не теряет перенесенные в архив транзакции.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    quote = connection.ops.quote_name
+    selects = [
+        f'SELECT id, {NORMALIZED_COMMENT.format("comment")} AS comment FROM {quote(table)}'
+        for table in tables
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP VIEW IF EXISTS {quote(SEARCH_SOURCE)}')
+        cursor.execute(f'CREATE VIEW {quote(SEARCH_SOURCE)} AS ' + ' UNION ALL '.join(selects))
+
+def index_rows(table, condition='1', params=(), delete=False):
+    """Добавляет в индекс FTS5 строки таблицы table по условию condition или удаляет их.
+
+    Нужна для таблиц без триггеров индекса - архивных.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    quote = connection.ops.quote_name
+    index = quote(TransactionSearch._meta.db_table)
+    source = f'id, {NORMALIZED_COMMENT.format("comment")} FROM {quote(table)} WHERE {condition}'
+    with connection.cursor() as cursor:
+        if delete:
+            cursor.execute(
+                f"INSERT INTO {index} ({index}, rowid, comment) SELECT 'delete', {source}", params
+            )
+        else:
+            cursor.execute(f'INSERT INTO {index} (rowid, comment) SELECT {source}', params)
\ No newline at end of file
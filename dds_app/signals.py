@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .caching import invalidate
+from .models import Transaction, Status, TransactionType, Category, Subcategory, LedgerState
+from .summaries import BUCKET_FIELDS, move_transaction
+
+def summary_values(instance):
+    """Значения полей транзакции, из которых складываются дневные итоги"""
+    values = {field: getattr(instance, field) for field in BUCKET_FIELDS}
+    values['amount'] = instance.amount
+    return values
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_values(sender, instance, raw=False, **kwargs):
+    """Запоминает сохраненные в БД значения перед изменением транзакции"""
+    instance._summary_previous = None
+    if instance.pk and not raw:
+        instance._summary_previous = Transaction.objects.filter(pk=instance.pk).values(
+            *BUCKET_FIELDS, 'amount'
+        ).first()
+
+@receiver(post_save, sender=Transaction)
+def update_summary_on_save(sender, instance, raw=False, **kwargs):
+    """Обновляет дневные итоги после создания или изменения транзакции"""
+    if raw:
+        return
+    move_transaction(getattr(instance, '_summary_previous', None), summary_values(instance))
+    instance._summary_previous = None
+
+@receiver(post_delete, sender=Transaction)
+def update_summary_on_delete(sender, instance, **kwargs):
+    """Вычитает удаленную транзакцию из дневных итогов"""
+    move_transaction(summary_values(instance), None)
+
+@receiver(post_save, sender=Transaction)
+def record_insertion(sender, instance, created, raw=False, **kwargs):
+    """Учитывает новую транзакцию в числе транзакций журнала"""
+    if created and not raw:
+        LedgerState.record_insertions()
+
+@receiver(post_delete, sender=Transaction)
+def record_deletion(sender, instance, **kwargs):
+    """Отмечает удаление в состоянии журнала для условных GET-запросов"""
+    LedgerState.record_deletions()
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=TransactionType)
+@receiver(post_delete, sender=TransactionType)
+def invalidate_ledger(sender, **kwargs):
+    """Сбрасывает кешированную статистику при любом изменении операций"""
+    invalidate('ledger')
+
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+@receiver(post_save, sender=TransactionType)
+@receiver(post_delete, sender=TransactionType)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+def invalidate_references(sender, **kwargs):
+    """Сбрасывает реестр справочников во всех процессах"""
+    invalidate('reference')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Выполняет прагмы DDS_SQLITE_PRAGMAS на новом подключении к SQLite"""
+    pragmas = getattr(settings, 'DDS_SQLITE_PRAGMAS', None)
+    if not pragmas or connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
\ No newline at end of file
@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+
+# Профили БД из настроек (DJANGO_DB_PROFILE), которые сравнивает нагрузочный прогон
+PROFILES = ('default', 'production')
+
+def setup_django(profile, path):
+    """Настраивает Django в новом процессе на файл БД path с профилем profile"""
+    os.environ['DJANGO_DB_PROFILE'] = profile
+    os.environ['DJANGO_DB_NAME'] = path
+    import django
+    django.setup()
+
+def prepare(profile, path, transactions):
+    """Схема, справочники и начальный журнал в новом файле БД"""
+    setup_django(profile, path)
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    call_command('load_sample_data', transactions=transactions, stdout=StringIO())
+
+class Workload:
+    """Смесь чтений и записей, как у нескольких воркеров приложения.
+
+    Записи повторяют пути приложения: создание транзакции формой (сигналы
+    обновляют дневные итоги), редактирование в транзакции БД (чтение, затем
+    запись) и массовая смена статуса - все в write_atomic(). Чтения - итоги
+    дашборда и страница списка в одной транзакции БД с обычным BEGIN: в профиле
+    production они не берут блокировку записи и не ждут пишущих воркеров.
+    """
+
+    def __init__(self, seed, write_share):
+        from .models import Status, Subcategory, Transaction
+        self.rng = random.Random(seed)
+        self.write_share = write_share
+        self.statuses = list(Status.objects.all())
+        self.subcategories = list(Subcategory.objects.select_related('category'))
+        self.max_pk = Transaction.objects.order_by('-pk').values_list('pk', flat=True).first()
+
+    def read(self):
+        from django.db import transaction
+        from .reports import balance_totals
+        from .models import DailyCashFlowSummary, Transaction
+        from .views import dashboard_totals
+        with transaction.atomic():
+            dashboard_totals()
+            balance_totals(DailyCashFlowSummary.objects.all())
+            list(Transaction.objects.select_related('status', 'category', 'subcategory')[:15])
+
+    def create(self):
+        from .locking import write_atomic
+        from .models import Transaction
+        subcategory = self.rng.choice(self.subcategories)
+        with write_atomic():
+            Transaction.objects.create(
+                status=self.rng.choice(self.statuses),
+                transaction_type_id=subcategory.category.transaction_type_id,
+                category=subcategory.category,
+                subcategory=subcategory,
+                amount=Decimal(self.rng.randint(100, 100000)) / 100,
+                comment='Нагрузочный тест',
+            )
+
+    def edit(self):
+        from .locking import write_atomic
+        from .models import Transaction
+        with write_atomic():
+            obj = Transaction.objects.filter(pk__gte=self.rng.randint(1, self.max_pk)).first()
+            if obj is not None:
+                obj.amount += 1
+                obj.save()
+
+    def change_status(self):
+        from .bulk import bulk_update_transactions
+        from .models import Transaction
+        start = self.rng.randint(1, self.max_pk)
+        bulk_update_transactions(
+            Transaction.objects.filter(pk__gte=start, pk__lt=start + 5),
+            status=self.rng.choice(self.statuses),
+        )
+
+    def step(self):
+        """Одна операция: 'read' или 'write'"""
+        if self.rng.random() >= self.write_share:
+            self.read()
+            return 'read'
+        self.rng.choice((self.create, self.create, self.edit, self.change_status))()
+        return 'write'
+
+def worker(profile, path, seed, seconds, write_share, barrier, results):
+    setup_django(profile, path)
+    from django.db import OperationalError, connection
+    workload = Workload(seed, write_share)
+    counts = {'read': 0, 'write': 0, 'locked': 0}
+    connection.close()
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            counts[workload.step()] += 1
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            counts['locked'] += 1
+    connection.close()
+    results.put(counts)
+
+def run_profile(profile, workers=4, seconds=5.0, write_share=0.3, transactions=5000, seed=42):
+    """Прогон одного профиля в workers процессах на новом файле БД.
+
+    Процессы запускаются через spawn и поднимают Django заново, поэтому
+    настройки профиля действуют в каждом из них так же, как в воркерах
+    gunicorn/uwsgi. Возвращает число операций в секунду и ошибок блокировки.
+    """
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'stress.sqlite3')
+        process = context.Process(target=prepare, args=(profile, path, transactions))
+        process.start()
+        process.join()
+        if process.exitcode:
+            raise RuntimeError(f'Не удалось подготовить БД профиля {profile}')
+
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=worker,
+                args=(profile, path, seed + number, seconds, write_share, barrier, results),
+            )
+            for number in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        counts = [results.get(timeout=seconds + 120) for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads = sum(item['read'] for item in counts)
+    writes = sum(item['write'] for item in counts)
+    return {
+        'profile': profile,
+        'workers': workers,
+        'seconds': seconds,
+        'reads': reads,
+        'writes': writes,
+        'locked': sum(item['locked'] for item in counts),
+        'reads_per_second': round(reads / seconds, 1),
+        'writes_per_second': round(writes / seconds, 1),
+    }
+
+def run_stress(profiles=PROFILES, **options):
+    return [run_profile(profile, **options) for profile in profiles]
\ No newline at end of file
@@ -0,0 +1,195 @@
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from .caching import invalidate
+from .locking import write_atomic
+from .models import DailyCashFlowSummary, LedgerState, LedgerTransaction, Transaction
+
+CENT = Decimal('0.01')
+
+# Поля транзакции, которые определяют строку дневного итога
+BUCKET_FIELDS = (
+    'created_date', 'status_id', 'transaction_type_id', 'category_id', 'subcategory_id'
+)
+
+def get_bucket(values):
+    """Возвращает ключ дневного итога по словарю значений полей транзакции"""
+    bucket = {field: values[field] for field in BUCKET_FIELDS}
+    # created_date может прийти как datetime (default=timezone.now)
+    bucket['created_date'] = Transaction._meta.get_field('created_date').to_python(
+        bucket['created_date']
+    )
+    return bucket
+
+def apply_delta(bucket, amount, count):
+    """Прибавляет amount и count к строке дневного итога, создавая ее при необходимости"""
+    with write_atomic():
+        rows = DailyCashFlowSummary.objects.filter(**bucket)
+        updated = rows.update(
+            total=F('total') + amount,
+            transaction_count=F('transaction_count') + count,
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    DailyCashFlowSummary.objects.create(
+                        total=amount, transaction_count=count, **bucket
+                    )
+            except IntegrityError:
+                # Строку успел создать параллельный запрос
+                rows.update(
+                    total=F('total') + amount,
+                    transaction_count=F('transaction_count') + count,
+                )
+        if count < 0:
+            rows.filter(transaction_count__lte=0).delete()
+
+def move_transaction(previous, current):
+    """Переносит транзакцию между дневными итогами.
+
+    previous и current - словари значений полей транзакции (BUCKET_FIELDS и amount)
+    до и после изменения; None означает, что транзакции не было или она удалена.
+    """
+    amount_field = Transaction._meta.get_field('amount')
+    if previous and current:
+        old_bucket, new_bucket = get_bucket(previous), get_bucket(current)
+        old_amount = amount_field.to_python(previous['amount'])
+        new_amount = amount_field.to_python(current['amount'])
+        if old_bucket == new_bucket:
+            if old_amount != new_amount:
+                apply_delta(new_bucket, new_amount - old_amount, 0)
+            return
+        with write_atomic():
+            apply_delta(old_bucket, -old_amount, -1)
+            apply_delta(new_bucket, new_amount, 1)
+    elif previous:
+        apply_delta(get_bucket(previous), -amount_field.to_python(previous['amount']), -1)
+    elif current:
+        apply_delta(get_bucket(current), amount_field.to_python(current['amount']), 1)
+
+def add_transactions(transactions):
+    """Прибавляет к дневным итогам транзакции, созданные в обход сигналов (bulk_create).
+
+    Вызывать внутри транзакции БД, в которой уже сохранены сами транзакции:
+    запись в нее удерживает блокировку, и строки итогов не меняются параллельно.
+    """
+    deltas = {}
+    for obj in transactions:
+        bucket = get_bucket(vars(obj))
+        key = tuple(bucket[field] for field in BUCKET_FIELDS)
+        total, count = deltas.get(key, (0, 0))
+        deltas[key] = (total + obj.amount, count + 1)
+    return apply_deltas(deltas)
+
+def apply_deltas(deltas):
+    """Прибавляет к дневным итогам суммы и количества по ключам BUCKET_FIELDS.
+
+    deltas - словарь ключ -> (сумма, количество), количество может быть
+    отрицательным. Существующие строки итогов обновляются одним bulk_update,
+    недостающие создаются bulk_create, опустевшие удаляются одним DELETE.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return 0
+
+    with write_atomic():
+        changed = []
+        emptied = []
+        dates = sorted({key[0] for key in deltas})
+        for start in range(0, len(dates), 500):
+            rows = DailyCashFlowSummary.objects.select_for_update().filter(
+                created_date__in=dates[start:start + 500]
+            )
+            for row in rows:
+                key = tuple(getattr(row, field) for field in BUCKET_FIELDS)
+                if key in deltas:
+                    total, count = deltas.pop(key)
+                    row.total += total
+                    row.transaction_count += count
+                    if row.transaction_count > 0:
+                        changed.append(row)
+                    else:
+                        emptied.append(row.pk)
+        DailyCashFlowSummary.objects.bulk_update(
+            changed, ['total', 'transaction_count'], batch_size=500
+        )
+        for start in range(0, len(emptied), 500):
+            DailyCashFlowSummary.objects.filter(pk__in=emptied[start:start + 500]).delete()
+        # Вычитать из отсутствующей строки нечего
+        deltas = {key: (total, count) for key, (total, count) in deltas.items() if count > 0}
+        try:
+            with transaction.atomic():
+                DailyCashFlowSummary.objects.bulk_create([
+                    DailyCashFlowSummary(
+                        total=total, transaction_count=count, **dict(zip(BUCKET_FIELDS, key))
+                    )
+                    for key, (total, count) in deltas.items()
+                ])
+        except IntegrityError:
+            # Часть строк успели создать параллельно - добавляем по одной
+            for key, (total, count) in deltas.items():
+                apply_delta(dict(zip(BUCKET_FIELDS, key)), total, count)
+    return len(changed) + len(emptied) + len(deltas)
+
+def grouped_transactions(queryset=None):
+    """Итоги транзакций, сгруппированные по ключам дневных итогов.
+
+    По умолчанию - все транзакции журнала, включая архивные.
+    """
+    if queryset is None:
+        queryset = LedgerTransaction.objects.all()
+    return queryset.order_by().values(*BUCKET_FIELDS).annotate(
+        total=Sum('amount'),
+        transaction_count=Count('id'),
+    )
+
+@write_atomic()
+def rebuild_daily_summary(batch_size=1000):
+    """Полностью пересчитывает дневные итоги по всем транзакциям, включая архивные.
+
+    Число транзакций в состоянии журнала при этом сверяется с фактическим.
+    """
+    DailyCashFlowSummary.objects.all().delete()
+    created = 0
+    transaction_count = 0
+    batch = []
+    for row in grouped_transactions().iterator(chunk_size=batch_size):
+        transaction_count += row['transaction_count']
+        batch.append(DailyCashFlowSummary(**row))
+        if len(batch) >= batch_size:
+            DailyCashFlowSummary.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        DailyCashFlowSummary.objects.bulk_create(batch)
+        created += len(batch)
+    LedgerState.objects.update_or_create(pk=1, defaults={'transaction_count': transaction_count})
+    invalidate('ledger')
+    return created
+
+def check_daily_summary():
+    """Сравнивает дневные итоги с транзакциями.
+
+    Возвращает список расхождений (ключ, (сумма, количество) по транзакциям,
+    (сумма, количество) по итогам); пустой список означает, что данные согласованы.
+    """
+    def collect(rows):
+        # SUM в SQLite считается в плавающей точке, поэтому сравниваем с точностью до копейки
+        return {
+            tuple(row[field] for field in BUCKET_FIELDS): (
+                Decimal(row['total']).quantize(CENT), row['transaction_count']
+            )
+            for row in rows
+        }
+
+    expected = collect(grouped_transactions())
+    actual = collect(
+        DailyCashFlowSummary.objects.order_by().values(
+            *BUCKET_FIELDS, 'total', 'transaction_count'
+        )
+    )
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(expected.keys() | actual.keys(), key=str)
+        if expected.get(key) != actual.get(key)
+    ]
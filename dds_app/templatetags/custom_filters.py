@@ -1,4 +1,6 @@
 ﻿from django import template
+from django.urls import reverse
+from ..references import get_references
 
 register = template.Library()
 
@@ -18,6 +20,14 @@ def param_replace(context, **kwargs):
         del d[k]
     return d.urlencode()
 
+@register.simple_tag
+def reference_tree_url():
+    """
+    Возвращает URL дерева справочников с версией содержимого,
+    чтобы браузер мог кешировать ответ без повторных запросов.
+    """
+    return f"{reverse('ajax_reference_tree')}?v={get_references().tree_etag}"
+
 @register.filter
 def format_currency(value):
     """Форматирует число как денежную сумму"""
@@ -1,15 +1,60 @@
-﻿from django.test import TestCase, Client
+﻿from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.template import RequestContext, Template
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.utils import load_backend
+from django.db.models import Count, F, ProtectedError
 from django.urls import reverse
 from django.utils import timezone
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from datetime import date, timedelta
 from decimal import Decimal
-from .models import Status, TransactionType, Category, Subcategory, Transaction
+from io import BytesIO, StringIO
+import csv
+import importlib
+import json
+import os
+import runpy
+import tempfile
+import threading
+import zipfile
+from unittest.mock import patch
+from .models import (
+    Status, TransactionType, Category, Subcategory, Transaction, DailyCashFlowSummary,
+    IngestionBatch, LedgerState, LedgerTransaction, TransactionArchive
+)
+from .archive import archived_years, hot_start
+from .benchmark import compare, percentile, run_concurrent, run_scenarios
+from .bulk import bulk_delete_transactions, bulk_update_transactions
+from .caching import invalidate
+from .conditional import ledger_fingerprint
+from .generator import wipe_ledger
+from .importing import insert_transactions
+from .locking import write_atomic
+from .parallel import run_queries
+from .references import get_references
+from .stress import run_profile
+from .summaries import check_daily_summary
+from .urls import urlpatterns
 
 class ModelTests(TestCase):
     def setUp(self):
         """Настройка тестовых данных"""
         self.status = Status.objects.create(name="Выполнено")
-        self.income_type = TransactionType.objects.create(name="Пополнение")
-        self.expense_type = TransactionType.objects.create(name="Списание")
+        self.income_type = TransactionType.objects.create(
+            name="Пополнение", direction=TransactionType.Direction.INCOME
+        )
+        self.expense_type = TransactionType.objects.create(
+            name="Списание", direction=TransactionType.Direction.EXPENSE
+        )
         
         self.category_income = Category.objects.create(
             name="Зарплата", 
@@ -83,7 +128,9 @@ class ViewTests(TestCase):
         """Настройка клиента и тестовых данных"""
         self.client = Client()
         self.status = Status.objects.create(name="Выполнено")
-        self.income_type = TransactionType.objects.create(name="Пополнение")
+        self.income_type = TransactionType.objects.create(
+            name="Пополнение", direction=TransactionType.Direction.INCOME
+        )
         self.category = Category.objects.create(
             name="Зарплата", 
             transaction_type=self.income_type
@@ -121,12 +168,2092 @@ class ViewTests(TestCase):
         self.assertTemplateUsed(response, 'dds_app/reference_management.html')
         self.assertContains(response, 'Управление справочниками')
 
+class LedgerTestMixin:
+    """Справочники доходов и расходов и создание транзакций по ним"""
+    
+    def setUp(self):
+        """Настройка справочников для доходов и расходов"""
+        self.status = Status.objects.create(name="Выполнено")
+        self.income_type = TransactionType.objects.create(
+            name="Пополнение", direction=TransactionType.Direction.INCOME
+        )
+        self.expense_type = TransactionType.objects.create(
+            name="Списание", direction=TransactionType.Direction.EXPENSE
+        )
+        self.category_income = Category.objects.create(
+            name="Зарплата",
+            transaction_type=self.income_type
+        )
+        self.category_expense = Category.objects.create(
+            name="Продукты",
+            transaction_type=self.expense_type
+        )
+        self.subcategory_income = Subcategory.objects.create(
+            name="Основная зарплата",
+            category=self.category_income
+        )
+        self.subcategory_expense = Subcategory.objects.create(
+            name="Супермаркет",
+            category=self.category_expense
+        )
+
+    def create_transactions(self, count):
+        """Создает count доходов и count расходов"""
+        for _ in range(count):
+            Transaction.objects.create(
+                status=self.status,
+                transaction_type=self.income_type,
+                category=self.category_income,
+                subcategory=self.subcategory_income,
+                amount=Decimal('100.00')
+            )
+            Transaction.objects.create(
+                status=self.status,
+                transaction_type=self.expense_type,
+                category=self.category_expense,
+                subcategory=self.subcategory_expense,
+                amount=Decimal('40.00')
+            )
+
+class DashboardTests(LedgerTestMixin, TestCase):
+    def test_dashboard_totals(self):
+        """Тест итогов и статистики по категориям"""
+        self.create_transactions(3)
+        response = self.client.get(reverse('dashboard'))
+        
+        self.assertEqual(response.context['total_income'], Decimal('300.00'))
+        self.assertEqual(response.context['total_expense'], Decimal('120.00'))
+        self.assertEqual(response.context['balance'], Decimal('180.00'))
+        self.assertEqual(response.context['total_transactions'], 6)
+        
+        stats = response.context['category_stats']
+        self.assertEqual([s['category'] for s in stats], [self.category_income, self.category_expense])
+        self.assertEqual(stats[0]['total'], Decimal('300.00'))
+        self.assertEqual(stats[0]['count'], 3)
+
+    def test_dashboard_empty(self):
+        """Тест дашборда без транзакций"""
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_income'], 0)
+        self.assertEqual(response.context['balance'], 0)
+        self.assertEqual(response.context['category_stats'], [])
+
+    def test_dashboard_query_count(self):
+        """Число запросов дашборда не зависит от количества данных"""
+        self.create_transactions(2)
+        get_references()
+        archived_years()
+        # Отпечаток журнала для ETag + итоги + топ категорий + последние транзакции
+        with self.assertNumQueries(4):
+            self.client.get(reverse('dashboard'))
+        
+        for i in range(15):
+            category = Category.objects.create(
+                name=f"Категория {i}",
+                transaction_type=self.expense_type
+            )
+            subcategory = Subcategory.objects.create(name=f"Подкатегория {i}", category=category)
+            Transaction.objects.create(
+                status=self.status,
+                transaction_type=self.expense_type,
+                category=category,
+                subcategory=subcategory,
+                amount=Decimal('10.00')
+            )
+        self.create_transactions(20)
+        get_references()
+        archived_years()
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['category_stats']), 10)
+
+class TransactionListTests(LedgerTestMixin, TestCase):
+    def test_list_totals(self):
+        """Тест итогов по всему списку"""
+        self.create_transactions(3)
+        response = self.client.get(reverse('transaction_list'))
+        
+        self.assertEqual(response.context['total_income'], Decimal('300.00'))
+        self.assertEqual(response.context['total_expense'], Decimal('120.00'))
+        self.assertEqual(response.context['balance'], Decimal('180.00'))
+        self.assertEqual(response.context['total_count'], 6)
+
+    def test_filtered_totals(self):
+        """Тест итогов с учетом активного фильтра"""
+        self.create_transactions(3)
+        response = self.client.get(
+            reverse('transaction_list'),
+            {'transaction_type': self.expense_type.id}
+        )
+        
+        self.assertEqual(response.context['total_income'], 0)
+        self.assertEqual(response.context['total_expense'], Decimal('120.00'))
+        self.assertEqual(response.context['total_count'], 3)
+        self.assertEqual(response.context['paginator'].count, 3)
+
+    def test_totals_use_direction(self):
+        """Доходы и расходы определяются направлением типа, а не его названием"""
+        self.create_transactions(1)
+        refund_type = TransactionType.objects.create(
+            name="Возврат", direction=TransactionType.Direction.INCOME
+        )
+        category = Category.objects.create(name="Возврат покупки", transaction_type=refund_type)
+        transaction = Transaction.objects.create(
+            status=self.status,
+            transaction_type=refund_type,
+            category=category,
+            subcategory=Subcategory.objects.create(name="Магазин", category=category),
+            amount=Decimal('15.00')
+        )
+        self.assertTrue(transaction.is_income)
+        
+        response = self.client.get(reverse('transaction_list'))
+        self.assertEqual(response.context['total_income'], Decimal('115.00'))
+        self.assertEqual(response.context['total_expense'], Decimal('40.00'))
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_income'], Decimal('115.00'))
+        self.assertEqual(response.context['total_expense'], Decimal('40.00'))
+
+    def test_list_query_count(self):
+        """Число запросов списка не зависит от количества найденных строк"""
+        self.create_transactions(2)
+        get_references()
+        archived_years()
+        # Отпечаток журнала для ETag + итоги + строки страницы + остатки строк
+        with self.assertNumQueries(4):
+            self.client.get(reverse('transaction_list'))
+        
+        self.create_transactions(20)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('transaction_list'), {'page': 2})
+        self.assertEqual(response.context['paginator'].num_pages, 3)
+
+class ConditionalGetTests(LedgerTestMixin, TestCase):
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 за один запрос к БД"""
+        self.create_transactions(2)
+        get_references()
+        archived_years()
+        urls = ('dashboard', 'dashboard_async', 'transaction_list', 'transaction_stats')
+        for url in map(reverse, urls):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ETag', response)
+            self.assertIn('Last-Modified', response)
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertIn('private', response['Cache-Control'])
+            with self.assertNumQueries(1):
+                response = self.revalidate(url, response)
+            self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Создание, изменение и удаление транзакции меняют ETag"""
+        self.create_transactions(1)
+        url = reverse('transaction_list')
+        
+        response = self.client.get(url)
+        transaction = Transaction.objects.create(
+            status=self.status,
+            transaction_type=self.expense_type,
+            category=self.category_expense,
+            subcategory=self.subcategory_expense,
+            amount=Decimal('5.00')
+        )
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        
+        response = self.client.get(url)
+        transaction.amount = Decimal('7.00')
+        transaction.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        
+        response = self.client.get(url)
+        transaction.delete()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        
+        response = self.client.get(url)
+        self.status.name = "Проведено"
+        self.status.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_fingerprint_reads_ledger_state(self):
+        """Число транзакций в отпечатке ведут пути вставки и удаления, а не SUM по дневным итогам"""
+        self.create_transactions(2)
+        insert_transactions([
+            Transaction(
+                status=self.status, transaction_type=self.expense_type,
+                category=self.category_expense, subcategory=self.subcategory_expense,
+                amount=Decimal('5.00'),
+            )
+            for _ in range(3)
+        ])
+        bulk_delete_transactions(Transaction.objects.filter(
+            pk__in=list(Transaction.objects.filter(amount=Decimal('5.00')).values_list('pk', flat=True)[:2])
+        ))
+        Transaction.objects.filter(transaction_type=self.income_type).first().delete()
+        self.assertEqual(LedgerState.objects.get(pk=1).transaction_count, 4)
+        
+        with CaptureQueriesContext(connection) as queries:
+            fingerprint = ledger_fingerprint()
+        self.assertEqual(fingerprint['transaction_count'], 4)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('dds_app_dailycashflowsummary', queries[0]['sql'])
+        
+        # Полный пересчет итогов сверяет счетчик с журналом
+        LedgerState.objects.filter(pk=1).update(transaction_count=0)
+        call_command('rebuild_daily_summary', stdout=StringIO())
+        self.assertEqual(LedgerState.objects.get(pk=1).transaction_count, 4)
+    
+    def test_etag_depends_on_filters(self):
+        """Разные фильтры дают разные ETag"""
+        self.create_transactions(1)
+        url = reverse('transaction_list')
+        response = self.client.get(url)
+        filtered = self.client.get(url, {'transaction_type': self.expense_type.id})
+        self.assertNotEqual(response['ETag'], filtered['ETag'])
+        response = self.revalidate(url, response, transaction_type=self.expense_type.id)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_skip_304(self):
+        """Страница с непоказанным сообщением отдается полностью"""
+        self.create_transactions(1)
+        url = reverse('transaction_list')
+        response = self.client.get(url)
+        self.client.post(reverse('transaction_create'), {
+            'created_date': date.today(),
+            'status': self.status.id,
+            'transaction_type': self.expense_type.id,
+            'category': self.category_expense.id,
+            'subcategory': self.subcategory_expense.id,
+            'amount': '10.00',
+        })
+        response = self.client.get(url)
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'Транзакция успешно создана!')
+
+class ReferenceManagementTests(LedgerTestMixin, TestCase):
+    def test_usage_counts(self):
+        """Счетчики использования справочников"""
+        self.create_transactions(2)
+        response = self.client.get(reverse('reference_management'))
+        statuses = list(response.context['statuses'])
+        self.assertEqual(statuses[0].transaction_count, 4)
+        types = {obj.pk: obj for obj in response.context['transaction_types']}
+        self.assertEqual(types[self.income_type.pk].transaction_count, 2)
+        self.assertEqual(types[self.income_type.pk].category_count, 1)
+        categories = {obj.pk: obj for obj in response.context['categories']}
+        self.assertEqual(categories[self.category_expense.pk].transaction_count, 2)
+        self.assertEqual(categories[self.category_expense.pk].subcategory_count, 1)
+        self.assertContains(response, 'Используется в 2 транзакциях')
+        
+        unused = Status.objects.create(name="Черновик")
+        response = self.client.get(reverse('reference_management'))
+        self.assertContains(response, f'class="btn btn-outline-danger delete-status" data-id="{unused.pk}"')
+
+    def test_query_count(self):
+        """Число запросов страницы не зависит от количества справочников"""
+        self.create_transactions(1)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('reference_management'))
+        
+        for i in range(20):
+            Status.objects.create(name=f"Статус {i}")
+            category = Category.objects.create(
+                name=f"Категория {i}",
+                transaction_type=self.expense_type
+            )
+            Subcategory.objects.create(name=f"Подкатегория {i}", category=category)
+        self.create_transactions(5)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('reference_management'))
+
+class CursorPaginationTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        """40 транзакций за несколько дней, часть с одинаковым временем создания"""
+        super().setUp()
+        self.create_transactions(20)
+        for i, pk in enumerate(Transaction.objects.order_by('id').values_list('id', flat=True)):
+            Transaction.objects.filter(pk=pk).update(created_date=date(2024, 1, 1 + i % 4))
+        Transaction.objects.filter(id__lte=10).update(created_at=timezone.now())
+        self.expected = list(Transaction.objects.values_list('id', flat=True))
+
+    def walk(self, data=None):
+        """Проходит все страницы вперед, затем назад, и возвращает id строк"""
+        url = reverse('transaction_list')
+        params = {'pagination': 'cursor', **(data or {})}
+        forward, pages = [], []
+        response = self.client.get(url, params)
+        while True:
+            self.assertTrue(response.context['cursor_mode'])
+            page = response.context['page_obj']
+            pages.append([t.id for t in page])
+            forward += pages[-1]
+            if not page.has_next():
+                break
+            response = self.client.get(url, {**params, 'cursor': page.next_cursor})
+        
+        backward = [pages[-1]]
+        while page.has_previous():
+            response = self.client.get(url, {**params, 'cursor': page.previous_cursor})
+            page = response.context['page_obj']
+            backward.append([t.id for t in page])
+        self.assertEqual(backward, pages[::-1])
+        return forward
+
+    def test_walk_all_pages(self):
+        """Тест обхода всех страниц по курсорам в обе стороны"""
+        self.assertEqual(self.walk(), self.expected)
+
+    def test_cursor_keeps_filters(self):
+        """Тест курсорной пагинации вместе с фильтром"""
+        ids = self.walk({'transaction_type': self.income_type.id})
+        self.assertEqual(
+            ids,
+            list(Transaction.objects.filter(transaction_type=self.income_type).values_list('id', flat=True))
+        )
+
+    def test_deep_page_query_count(self):
+        """Глубокая страница стоит столько же запросов, сколько вторая, и не считает COUNT"""
+        url = reverse('transaction_list')
+        response = self.client.get(url, {'pagination': 'cursor'})
+        cursor = response.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url, {'pagination': 'cursor', 'cursor': cursor})
+        cursor = response.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(url, {'pagination': 'cursor', 'cursor': cursor})
+        
+        self.assertEqual(len(second), len(deep))
+        for query in deep.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_invalid_cursor(self):
+        """Тест подделанного курсора"""
+        response = self.client.get(
+            reverse('transaction_list'), {'pagination': 'cursor', 'cursor': 'garbage'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_offset_mode_page_range(self):
+        """В обычном режиме выводится окно номеров страниц, а не все номера"""
+        self.create_transactions(100)
+        response = self.client.get(reverse('transaction_list'), {'page': 8})
+        page_range = list(response.context['page_range'])
+        self.assertIn(8, page_range)
+        self.assertIn(response.context['paginator'].ELLIPSIS, page_range)
+        self.assertLess(len(page_range), response.context['paginator'].num_pages)
+
+class RunningBalanceTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        """40 транзакций разных сумм за 10 дней"""
+        super().setUp()
+        for i in range(40):
+            income = i % 3 == 0
+            Transaction.objects.create(
+                created_date=date(2024, 3, 1) + timedelta(days=i // 4),
+                status=self.status,
+                transaction_type=self.income_type if income else self.expense_type,
+                category=self.category_income if income else self.category_expense,
+                subcategory=self.subcategory_income if income else self.subcategory_expense,
+                amount=Decimal(f'{(i + 1) * 10}.{i:02d}'),
+            )
+
+    def expected_balances(self):
+        """Остатки после каждой транзакции, посчитанные в Python по всей истории"""
+        transactions = list(Transaction.objects.select_related('transaction_type').order_by(
+            'created_date', 'created_at', 'id'
+        ))
+        balance, balances = Decimal('0'), {}
+        for transaction in transactions:
+            balance += transaction.signed_amount
+            balances[transaction.pk] = balance
+        return balances
+
+    def page_balances(self, response):
+        return {t.pk: t.running_balance for t in response.context['page_obj']}
+
+    def test_offset_pages(self):
+        """Остаток на любой странице совпадает с суммой всей предшествующей истории"""
+        expected = self.expected_balances()
+        for page in (1, 2, 3):
+            response = self.client.get(reverse('transaction_list'), {'page': page})
+            balances = self.page_balances(response)
+            self.assertEqual(len(balances), 15 if page < 3 else 10)
+            for pk, balance in balances.items():
+                self.assertEqual(balance, expected[pk])
+        self.assertEqual(response.context['opening_balance'], 0)
+        self.assertEqual(response.context['closing_balance'], list(expected.values())[-1])
+
+    def test_opening_balance(self):
+        """Входящий остаток на начало периода берется из дневных итогов до него"""
+        expected = self.expected_balances()
+        before = Transaction.objects.filter(created_date__lt=date(2024, 3, 4)).order_by(
+            'created_date', 'created_at', 'id'
+        ).last()
+        response = self.client.get(
+            reverse('transaction_list'), {'start_date': '2024-03-04', 'end_date': '2024-03-06'}
+        )
+        self.assertEqual(response.context['opening_balance'], expected[before.pk])
+        balances = self.page_balances(response)
+        self.assertEqual(len(balances), 12)
+        for pk, balance in balances.items():
+            self.assertEqual(balance, expected[pk])
+        newest = Transaction.objects.filter(created_date=date(2024, 3, 6)).first()
+        self.assertEqual(response.context['closing_balance'], expected[newest.pk])
+
+    def test_cursor_pages(self):
+        """Остаток на границе курсора берется из дневных итогов в обе стороны"""
+        expected = self.expected_balances()
+        url = reverse('transaction_list')
+        params = {'pagination': 'cursor'}
+        response = self.client.get(url, params)
+        pages = [response.context['page_obj']]
+        while pages[-1].has_next():
+            response = self.client.get(url, {**params, 'cursor': pages[-1].next_cursor})
+            pages.append(response.context['page_obj'])
+        self.assertEqual(len(pages), 3)
+        response = self.client.get(url, {**params, 'cursor': pages[-1].previous_cursor})
+        pages.append(response.context['page_obj'])
+        for page in pages:
+            for transaction in page:
+                self.assertEqual(transaction.running_balance, expected[transaction.pk])
+
+    def test_cursor_after_edit(self):
+        """Курсор, выданный до правки журнала, не переносит устаревший остаток"""
+        url = reverse('transaction_list')
+        params = {'pagination': 'cursor'}
+        first = self.client.get(url, params).context['page_obj']
+        second = self.client.get(url, {**params, 'cursor': first.next_cursor}).context['page_obj']
+        # Правка строки старше границы меняет остатки всех более новых строк
+        oldest = Transaction.objects.order_by('created_date', 'created_at', 'id').first()
+        oldest.amount += Decimal('1000.00')
+        oldest.save()
+        expected = self.expected_balances()
+        for cursor in (first.next_cursor, second.previous_cursor, second.next_cursor):
+            page = self.client.get(url, {**params, 'cursor': cursor}).context['page_obj']
+            for transaction in page:
+                self.assertEqual(transaction.running_balance, expected[transaction.pk])
+    
+    def test_balance_query(self):
+        """Остаток считается оконной функцией в запросе страницы"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('transaction_list'), {'page': 2})
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertIn('OVER (ORDER BY', page_query)
+        self.assertIn('LIMIT 15 OFFSET 15', page_query)
+
+class DailySummaryTests(LedgerTestMixin, TestCase):
+    def create_income(self, amount='100.00', **kwargs):
+        """Создает транзакцию пополнения"""
+        data = {
+            'status': self.status,
+            'transaction_type': self.income_type,
+            'category': self.category_income,
+            'subcategory': self.subcategory_income,
+            'amount': Decimal(amount),
+        }
+        data.update(kwargs)
+        return Transaction.objects.create(**data)
+
+    def test_summary_on_create(self):
+        """Тест накопления итогов при создании транзакций"""
+        self.create_income('100.00')
+        self.create_income('50.00')
+        
+        summary = DailyCashFlowSummary.objects.get()
+        self.assertEqual(summary.total, Decimal('150.00'))
+        self.assertEqual(summary.transaction_count, 2)
+        self.assertEqual(summary.created_date, timezone.localdate())
+        self.assertEqual(check_daily_summary(), [])
+
+    def test_summary_on_update(self):
+        """Тест переноса транзакции между итогами при изменении"""
+        transaction = self.create_income('100.00')
+        self.create_income('30.00')
+        
+        transaction.amount = Decimal('70.00')
+        transaction.save()
+        self.assertEqual(DailyCashFlowSummary.objects.get().total, Decimal('100.00'))
+        
+        transaction.created_date = date(2024, 1, 31)
+        transaction.transaction_type = self.expense_type
+        transaction.category = self.category_expense
+        transaction.subcategory = self.subcategory_expense
+        transaction.save()
+        
+        self.assertEqual(DailyCashFlowSummary.objects.count(), 2)
+        moved = DailyCashFlowSummary.objects.get(created_date=date(2024, 1, 31))
+        self.assertEqual(moved.total, Decimal('70.00'))
+        self.assertEqual(moved.category, self.category_expense)
+        self.assertEqual(check_daily_summary(), [])
+
+    def test_summary_on_delete(self):
+        """Тест вычитания удаленных транзакций из итогов"""
+        transaction = self.create_income('100.00')
+        other = self.create_income('30.00')
+        
+        transaction.delete()
+        self.assertEqual(DailyCashFlowSummary.objects.get().total, Decimal('30.00'))
+        
+        other.delete()
+        self.assertFalse(DailyCashFlowSummary.objects.exists())
+        self.assertEqual(check_daily_summary(), [])
+
+    def test_rebuild_and_check(self):
+        """Тест проверки расхождений и полного пересчета итогов"""
+        self.create_transactions(3)
+        self.create_income('10.00', created_date=date(2024, 5, 1))
+        
+        DailyCashFlowSummary.objects.filter(created_date=date(2024, 5, 1)).delete()
+        DailyCashFlowSummary.objects.filter(category=self.category_expense).update(total=0)
+        self.assertEqual(len(check_daily_summary()), 2)
+        with self.assertRaises(CommandError):
+            call_command('check_daily_summary', stdout=StringIO())
+        
+        call_command('rebuild_daily_summary', batch_size=1, stdout=StringIO())
+        self.assertEqual(check_daily_summary(), [])
+        self.assertEqual(DailyCashFlowSummary.objects.count(), 3)
+
+    def test_admin_read_only(self):
+        """В админке дневные итоги можно только просматривать"""
+        self.create_income()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        summary = DailyCashFlowSummary.objects.get()
+        url = reverse('admin:dds_app_dailycashflowsummary_delete', args=[summary.pk])
+        self.assertEqual(self.client.post(url, {'post': 'yes'}).status_code, 403)
+        self.client.post(reverse('admin:dds_app_dailycashflowsummary_changelist'), {
+            'action': 'delete_selected', '_selected_action': [summary.pk], 'post': 'yes',
+        })
+        self.assertTrue(DailyCashFlowSummary.objects.filter(pk=summary.pk).exists())
+
+class ImportTransactionsTests(LedgerTestMixin, TestCase):
+    header = 'created_date,status,transaction_type,category,subcategory,amount,comment\n'
+    rows = [
+        '2024-01-10,Выполнено,Пополнение,Зарплата,Основная зарплата,1000.00,Январь\n',
+        '11.01.2024,выполнено,списание,продукты,супермаркет,"1 250,50",\n',
+        '2024-01-12,Выполнено,Списание,Зарплата,Основная зарплата,10.00,Чужая категория\n',
+        '2024-01-13,Выполнено,Списание,Продукты,Супермаркет,abc,Неверная сумма\n',
+        '2024-13-40,Выполнено,Списание,Продукты,Супермаркет,5.00,Неверная дата\n',
+        '2024-01-14,Выполнено,Списание,Продукты,Супермаркет,5.00,Пятая\n',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'transactions.csv')
+        self.rejects_path = os.path.join(self.directory.name, 'rejects.csv')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(self.header + ''.join(self.rows))
+
+    def run_import(self, **options):
+        output = StringIO()
+        call_command('import_transactions', self.path, rejects=self.rejects_path, stdout=output, **options)
+        return output.getvalue()
+
+    def read_rejects(self):
+        with open(self.rejects_path, encoding='utf-8') as file:
+            return list(csv.reader(file))
+
+    def test_import(self):
+        """Импорт загружает корректные строки и отклоняет остальные"""
+        output = self.run_import(batch_size=2)
+        self.assertIn('загружено 3, отклонено 3', output)
+        
+        amounts = sorted(Transaction.objects.values_list('amount', flat=True))
+        self.assertEqual(amounts, [Decimal('5.00'), Decimal('1000.00'), Decimal('1250.50')])
+        transaction = Transaction.objects.get(amount=Decimal('1250.50'))
+        self.assertEqual(transaction.created_date, date(2024, 1, 11))
+        self.assertEqual(transaction.subcategory, self.subcategory_expense)
+        self.assertEqual(check_daily_summary(), [])
+        
+        rejects = self.read_rejects()
+        self.assertEqual(rejects[0][0], 'line')
+        self.assertEqual([row[0] for row in rejects[1:]], ['4', '5', '6'])
+        self.assertIn('не относится', rejects[1][-1])
+        
+        # Повторная загрузка прибавляется к уже существующим строкам итогов
+        self.run_import()
+        self.assertEqual(Transaction.objects.count(), 6)
+        self.assertEqual(DailyCashFlowSummary.objects.count(), 3)
+        self.assertEqual(check_daily_summary(), [])
+
+    def test_resume_from_offset(self):
+        """Повторный запуск с --offset продолжает импорт без дублей"""
+        self.run_import(offset=4)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual([row[0] for row in self.read_rejects()], ['line', '6'])
+        
+        self.run_import(offset=5, defer_summary=True)
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(check_daily_summary(), [])
+
+    def test_missing_columns(self):
+        """Файл без обязательных колонок не импортируется"""
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('created_date,amount\n2024-01-10,5.00\n')
+        with self.assertRaises(CommandError):
+            self.run_import()
+
+class ExportTests(LedgerTestMixin, TestCase):
+    def export(self, export_format, **params):
+        response = self.client.get(reverse('transaction_export', args=[export_format]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        """CSV содержит отфильтрованные транзакции и загружается обратно импортом"""
+        self.create_transactions(2)
+        content = self.export('csv', transaction_type=self.expense_type.id)
+        rows = list(csv.reader(StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0], ['created_date', 'status', 'transaction_type', 'category',
+                                   'subcategory', 'amount', 'comment', 'balance'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][1:6], ['Выполнено', 'Списание', 'Продукты', 'Супермаркет', '40.00'])
+        self.assertEqual([row[7] for row in rows[1:]], ['-80.00', '-40.00'])
+        
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        call_command('import_transactions', file.name, stdout=StringIO())
+        self.assertEqual(
+            Transaction.objects.filter(transaction_type=self.expense_type).count(), 4
+        )
+
+    def test_csv_formula_escaped(self):
+        """Текст, похожий на формулу, экранируется, отрицательные суммы - нет"""
+        self.create_transactions(1)
+        Transaction.objects.filter(transaction_type=self.expense_type).update(comment='=HYPERLINK("x")')
+        self.category_expense.name = '@Продукты'
+        self.category_expense.save()
+        content = self.export('csv', transaction_type=self.expense_type.id)
+        row = list(csv.reader(StringIO(content.decode('utf-8-sig'))))[1]
+        self.assertEqual(row[3], "'@Продукты")
+        self.assertEqual(row[6], '\'=HYPERLINK("x")')
+        self.assertEqual(row[7], '-40.00')
+
+    def test_xlsx_export(self):
+        """XLSX - корректный zip-архив с листом транзакций"""
+        self.create_transactions(1)
+        content = self.export('xlsx')
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 3)
+        self.assertIn('Основная зарплата', sheet)
+        self.assertIn('<v>100.00</v>', sheet)
+
+    def test_export_query_count(self):
+        """Выгрузка - остаток по дневным итогам и один запрос с JOIN справочников"""
+        self.create_transactions(5)
+        get_references()
+        archived_years()
+        with self.assertNumQueries(2):
+            self.export('csv', status=self.status.id)
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('transaction_export', args=['pdf']))
+        self.assertEqual(response.status_code, 404)
+
+class ReportTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for created_date, income, expense in (
+            (date(2024, 1, 10), '100.00', '30.50'),
+            (date(2024, 1, 25), '50.00', '20.00'),
+            (date(2024, 2, 5), '70.00', '90.25'),
+            (date(2024, 4, 1), '10.00', '5.00'),
+        ):
+            self.create_pair(created_date, income, expense)
+
+    def create_pair(self, created_date, income, expense):
+        Transaction.objects.create(
+            created_date=created_date, status=self.status, transaction_type=self.income_type,
+            category=self.category_income, subcategory=self.subcategory_income,
+            amount=Decimal(income)
+        )
+        Transaction.objects.create(
+            created_date=created_date, status=self.status, transaction_type=self.expense_type,
+            category=self.category_expense, subcategory=self.subcategory_expense,
+            amount=Decimal(expense)
+        )
+
+    def report(self, **params):
+        response = self.client.get(reverse('cash_flow_report'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_monthly(self):
+        """По умолчанию - помесячно, сальдо и итоги считаются без потери копеек"""
+        report = self.report()
+        self.assertEqual(report['period'], 'month')
+        self.assertEqual(report['rows'], [
+            {'period': '2024-01-01', 'income': '150.00', 'expense': '50.50',
+             'net': '99.50', 'count': 4},
+            {'period': '2024-02-01', 'income': '70.00', 'expense': '90.25',
+             'net': '-20.25', 'count': 2},
+            {'period': '2024-04-01', 'income': '10.00', 'expense': '5.00',
+             'net': '5.00', 'count': 2},
+        ])
+        self.assertEqual(report['totals'], {
+            'income': '230.00', 'expense': '145.75', 'net': '84.25', 'count': 8
+        })
+
+    def test_periods(self):
+        """Неделя начинается с понедельника, квартал - с первого месяца"""
+        weeks = [row['period'] for row in self.report(period='week')['rows']]
+        self.assertEqual(weeks, ['2024-01-08', '2024-01-22', '2024-02-05', '2024-04-01'])
+        quarters = self.report(period='quarter')['rows']
+        self.assertEqual([row['period'] for row in quarters], ['2024-01-01', '2024-04-01'])
+        self.assertEqual(quarters[0]['income'], '220.00')
+        days = self.report(period='day', start_date='2024-01-01', end_date='2024-01-31')['rows']
+        self.assertEqual([row['period'] for row in days], ['2024-01-10', '2024-01-25'])
+
+    def test_group_by_category(self):
+        report = self.report(group_by='category', transaction_type=self.expense_type.id)
+        self.assertEqual(len(report['rows']), 3)
+        self.assertEqual(
+            report['rows'][0]['category'], {'id': self.category_expense.id, 'name': 'Продукты'}
+        )
+        self.assertEqual(report['totals']['income'], '0.00')
+        self.assertEqual(report['totals']['expense'], '145.75')
+
+    def test_group_by_subcategory(self):
+        rows = self.report(period='quarter', group_by='subcategory')['rows']
+        self.assertEqual(
+            [(row['period'], row['subcategory']['name']) for row in rows],
+            [('2024-01-01', 'Основная зарплата'), ('2024-01-01', 'Супермаркет'),
+             ('2024-04-01', 'Основная зарплата'), ('2024-04-01', 'Супермаркет')],
+        )
+
+    def test_invalid_parameters(self):
+        for params in ({'period': 'year'}, {'group_by': 'status'},
+                       {'start_date': '2024-02-01', 'end_date': '2024-01-01'}):
+            response = self.client.get(reverse('cash_flow_report'), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('errors', response.json())
+
+    def test_single_query(self):
+        """Группировка по периодам - один запрос к дневным итогам"""
+        get_references()
+        archived_years()
+        self.report()
+        with CaptureQueriesContext(connection) as queries:
+            self.report(period='week', group_by='subcategory', status=self.status.id)
+        report_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'GROUP BY' in query['sql']
+        ]
+        self.assertEqual(len(report_queries), 1)
+        self.assertIn('dds_app_dailycashflowsummary', report_queries[0])
+        self.assertNotIn('dds_app_transaction"', report_queries[0])
+
+@override_settings(DDS_INGEST_TOKEN='secret')
+class IngestTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('transaction_ingest')
+    
+    def row(self, amount='10.00', **kwargs):
+        return {
+            'created_date': '2024-03-01', 'status': 'Выполнено', 'transaction_type': 'Списание',
+            'category': 'Продукты', 'subcategory': 'Супермаркет', 'amount': amount, **kwargs,
+        }
+    
+    def post(self, rows, key='batch-1', **headers):
+        headers.setdefault('HTTP_AUTHORIZATION', 'Bearer secret')
+        if key is not None:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        return self.client.post(self.url, json.dumps(rows), content_type='application/json', **headers)
+    
+    def test_insert_batch(self):
+        """Пакет вставляется целиком, в ответе - номера созданных транзакций по строкам"""
+        rows = [
+            self.row('10.50', comment='Первая'),
+            self.row(status=self.status.pk, transaction_type=self.income_type.pk,
+                     category=self.category_income.pk, subcategory=self.subcategory_income.pk),
+            self.row(),
+        ]
+        response = self.post({'transactions': rows})
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['created'], 3)
+        ids = [result['id'] for result in data['results']]
+        self.assertEqual([result['status'] for result in data['results']], ['created'] * 3)
+        self.assertEqual(Transaction.objects.get(pk=ids[0]).comment, 'Первая')
+        self.assertEqual(Transaction.objects.get(pk=ids[1]).subcategory, self.subcategory_income)
+        self.assertEqual(check_daily_summary(), [])
+    
+    def test_decimal_amounts(self):
+        """Суммы числом JSON не проходят через float"""
+        response = self.client.post(
+            self.url, '[{"created_date": "2024-03-01", "status": "Выполнено", '
+            '"transaction_type": "Списание", "category": "Продукты", '
+            '"subcategory": "Супермаркет", "amount": 0.29}]',
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='decimal',
+            HTTP_AUTHORIZATION='Bearer secret',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Transaction.objects.get().amount, Decimal('0.29'))
+        response = self.post([self.row(0.295)], key='float')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_invalid_rows_reject_batch(self):
+        """Ошибка в одной строке отклоняет весь пакет с результатами по строкам"""
+        response = self.post([
+            self.row(),
+            self.row(category='Зарплата'),
+            self.row(subcategory=self.subcategory_income.pk),
+            'строка',
+        ])
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertEqual(data['errors'], 3)
+        self.assertEqual(
+            [result['status'] for result in data['results']], ['ok', 'error', 'error', 'error']
+        )
+        self.assertIn('не относится', data['results'][1]['error'])
+        self.assertFalse(Transaction.objects.exists())
+        # Отклоненный пакет можно исправить и отправить с тем же ключом
+        self.assertEqual(self.post([self.row()]).status_code, 201)
+    
+    def test_idempotency(self):
+        """Повтор пакета с тем же ключом возвращает прежний ответ без вставки"""
+        first = self.post([self.row(), self.row('20.00')])
+        second = self.post([self.row(), self.row('20.00')])
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(IngestionBatch.objects.get().transaction_count, 2)
+        
+        conflict = self.post([self.row('30.00')])
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(Transaction.objects.count(), 2)
+    
+    def test_bad_requests(self):
+        self.assertEqual(self.post([self.row()], key=None).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post({'rows': []}).status_code, 400)
+        response = self.client.post(
+            self.url, 'not json', content_type='application/json', HTTP_IDEMPOTENCY_KEY='x',
+            HTTP_AUTHORIZATION='Bearer secret',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        with patch('dds_app.ingest.MAX_BATCH_SIZE', 2):
+            self.assertEqual(self.post([self.row()] * 3).status_code, 413)
+        self.assertFalse(Transaction.objects.exists())
+    
+    def test_token(self):
+        self.assertEqual(self.post([self.row()], HTTP_AUTHORIZATION='').status_code, 401)
+        self.assertEqual(self.post([self.row()], HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.post([self.row()], HTTP_AUTHORIZATION='Bearer secret').status_code, 201)
+    
+    @override_settings(DDS_INGEST_TOKEN='')
+    def test_without_token(self):
+        """Без токена в настройках API закрыто, пока загрузка без проверки не разрешена явно"""
+        self.assertEqual(self.post([self.row()], HTTP_AUTHORIZATION='').status_code, 503)
+        self.assertFalse(Transaction.objects.exists())
+        with self.settings(DDS_INGEST_ALLOW_ANONYMOUS=True):
+            self.assertEqual(self.post([self.row()], HTTP_AUTHORIZATION='').status_code, 201)
+    
+    def test_queries_do_not_depend_on_rows(self):
+        """Проверка строк не обращается к БД: запросы растут только с пакетами INSERT"""
+        get_references()
+        archived_years()
+        counts = {}
+        for size in (5, 500):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post([self.row()] * size, key=f'size-{size}')
+            self.assertEqual(response.status_code, 201)
+            counts[size] = [
+                q['sql'] for q in queries.captured_queries
+                if not q['sql'].startswith('INSERT INTO "dds_app_transaction"')
+            ]
+        self.assertEqual(len(counts[500]), len(counts[5]), counts[500])
+        self.assertEqual(Transaction.objects.count(), 505)
+
+class BulkActionTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.pending = Status.objects.create(name="В обработке")
+        self.create_transactions(3)
+        self.subcategory_other = Subcategory.objects.create(
+            name="Аванс", category=self.category_income
+        )
+        self.url = reverse('transaction_bulk')
+    
+    def assertSummaryConsistent(self):
+        self.assertEqual(check_daily_summary(), [])
+    
+    def statements(self, queries, prefix):
+        return [q['sql'] for q in queries.captured_queries if q['sql'].startswith(prefix)]
+    
+    def test_preview_counts_without_changes(self):
+        """GET показывает число затрагиваемых транзакций и ничего не меняет"""
+        response = self.client.get(self.url, {
+            'action': 'status', 'new_status': self.pending.pk, 'scope': 'filter',
+            'filters': f'transaction_type={self.expense_type.pk}',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['count'], 3)
+        self.assertContains(response, 'Будет затронуто транзакций: 3')
+        self.assertFalse(Transaction.objects.filter(status=self.pending).exists())
+    
+    def test_change_status_of_selected(self):
+        """Статус выбранных транзакций меняется одним UPDATE"""
+        ids = list(Transaction.objects.values_list('pk', flat=True)[:4])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'action': 'status', 'new_status': self.pending.pk, 'scope': 'selected',
+                'ids': ids, 'filters': 'page=2',
+            })
+        self.assertRedirects(response, reverse('transaction_list') + '?page=2', fetch_redirect_response=False)
+        self.assertEqual(len(self.statements(queries, 'UPDATE "dds_app_transaction"')), 1)
+        self.assertEqual(
+            set(Transaction.objects.filter(status=self.pending).values_list('pk', flat=True)), set(ids)
+        )
+        self.assertSummaryConsistent()
+    
+    def test_change_status_by_filter(self):
+        """Действие над всем фильтром затрагивает только подходящие транзакции"""
+        self.client.post(self.url, {
+            'action': 'status', 'new_status': self.pending.pk, 'scope': 'filter',
+            'filters': f'category={self.category_expense.pk}',
+        })
+        self.assertEqual(
+            set(Transaction.objects.filter(status=self.pending).values_list('category', flat=True)),
+            {self.category_expense.pk}
+        )
+        self.assertEqual(Transaction.objects.filter(status=self.pending).count(), 3)
+        self.assertSummaryConsistent()
+    
+    def test_recategorize_keeps_hierarchy(self):
+        """Перенос в подкатегорию меняет категорию и тип операции по иерархии"""
+        ids = list(Transaction.objects.filter(
+            transaction_type=self.expense_type
+        ).values_list('pk', flat=True))
+        self.client.post(self.url, {
+            'action': 'recategorize', 'new_subcategory': self.subcategory_other.pk,
+            'scope': 'selected', 'ids': ids,
+        })
+        moved = Transaction.objects.filter(pk__in=ids)
+        self.assertEqual(
+            set(moved.values_list('transaction_type', 'category', 'subcategory')),
+            {(self.income_type.pk, self.category_income.pk, self.subcategory_other.pk)}
+        )
+        self.assertSummaryConsistent()
+        self.assertEqual(self.client.get(reverse('transaction_list')).context['balance'], Decimal('420.00'))
+    
+    def test_delete_by_filter(self):
+        """Удаление одним DELETE с учетом удалений и дневных итогов"""
+        deletions = LedgerState.objects.get(pk=1).deletion_count
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {
+                'action': 'delete', 'scope': 'filter',
+                'filters': f'transaction_type={self.expense_type.pk}',
+            })
+        self.assertEqual(len(self.statements(queries, 'DELETE FROM "dds_app_transaction"')), 1)
+        self.assertFalse(Transaction.objects.filter(transaction_type=self.expense_type).exists())
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(LedgerState.objects.get(pk=1).deletion_count, deletions + 3)
+        self.assertSummaryConsistent()
+    
+    def test_invalidates_once(self):
+        """Кеш журнала сбрасывается один раз на операцию, а не на каждую строку"""
+        with patch('dds_app.bulk.invalidate') as invalidate:
+            bulk_update_transactions(Transaction.objects.all(), status=self.pending)
+        invalidate.assert_called_once_with('ledger')
+        with patch('dds_app.bulk.invalidate') as invalidate:
+            bulk_delete_transactions(Transaction.objects.all())
+        invalidate.assert_called_once_with('ledger')
+        self.assertFalse(DailyCashFlowSummary.objects.exists())
+    
+    def test_changes_etag(self):
+        """После массового изменения список не отвечает 304 по старому ETag"""
+        url = reverse('transaction_list')
+        etag = self.client.get(url)['ETag']
+        bulk_update_transactions(Transaction.objects.all(), status=self.pending)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_invalid_requests(self):
+        """Без цели действия или без выбранных строк ничего не меняется"""
+        for data in [
+            {'action': 'status', 'scope': 'filter'},
+            {'action': 'recategorize', 'scope': 'filter'},
+            {'action': 'delete', 'scope': 'selected'},
+            {'action': 'delete', 'scope': 'selected', 'ids': ['x']},
+            {'action': 'delete', 'scope': 'filter', 'filters': 'start_date=oops'},
+        ]:
+            with self.subTest(data=data):
+                response = self.client.post(self.url, data)
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(Transaction.objects.count(), 6)
+                self.assertFalse(Transaction.objects.filter(status=self.pending).exists())
+
+class SearchTests(LedgerTestMixin, TestCase):
+    def create(self, comment, amount='100.00', expense=False, **kwargs):
+        if expense:
+            references = dict(
+                transaction_type=self.expense_type, category=self.category_expense,
+                subcategory=self.subcategory_expense,
+            )
+        else:
+            references = dict(
+                transaction_type=self.income_type, category=self.category_income,
+                subcategory=self.subcategory_income,
+            )
+        return Transaction.objects.create(
+            status=self.status, amount=Decimal(amount), comment=comment, **references, **kwargs
+        )
+    
+    def search(self, text, **data):
+        response = self.client.get(reverse('transaction_list'), {'search': text, **data})
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def found(self, text, **data):
+        return {t.comment for t in self.search(text, **data).context['transactions']}
+    
+    def test_prefix_and_case(self):
+        """Поиск по началу слова без учета регистра и различия букв е и ё"""
+        self.create("Оплата счёта поставщику")
+        self.create("Оплаты за аренду")
+        self.create("Возврат аванса", expense=True)
+        self.assertEqual(self.found('оплат'), {"Оплата счёта поставщику", "Оплаты за аренду"})
+        self.assertEqual(self.found('СЧЕТ'), {"Оплата счёта поставщику"})
+        self.assertEqual(self.found('оплата поставщ'), {"Оплата счёта поставщику"})
+        self.assertEqual(self.found('аренда'), set())
+        # Операторы и кавычки FTS5 в запросе не ломают поиск
+        self.assertEqual(self.found('"аванс" OR NOT*'), set())
+        self.assertEqual(self.found('аванс -'), {"Возврат аванса"})
+    
+    def test_search_with_filters(self):
+        """Поиск сочетается с фильтрами, итоги считаются по найденным транзакциям"""
+        self.create("Аренда офиса", amount='300.00', expense=True)
+        self.create("Аренда склада", amount='200.00', expense=True,
+                    created_date=date.today() - timedelta(days=40))
+        self.create("Субаренда офиса", amount='50.00')
+        self.create_transactions(2)
+        
+        response = self.search('аренда')
+        self.assertTrue(response.context['searching'])
+        self.assertEqual(response.context['total_count'], 2)
+        self.assertEqual(response.context['total_expense'], Decimal('500.00'))
+        self.assertEqual(response.context['total_income'], Decimal('0.00'))
+        self.assertNotContains(response, 'Быстрая прокрутка')
+        
+        start_date = (date.today() - timedelta(days=7)).isoformat()
+        response = self.search('аренда', start_date=start_date)
+        self.assertEqual(response.context['total_count'], 1)
+        self.assertEqual(response.context['opening_balance'], Decimal('-200.00'))
+        self.assertEqual(self.found('офис', transaction_type=self.income_type.id), {"Субаренда офиса"})
+        
+        stats = self.client.get(reverse('transaction_stats'), {'search': 'офис'}).json()
+        self.assertEqual(stats['totals']['total_count'], 2)
+        report = self.client.get(reverse('cash_flow_report'), {'search': 'аренда'}).json()
+        self.assertEqual(report['totals'], {
+            'income': '0.00', 'expense': '500.00', 'net': '-500.00', 'count': 2
+        })
+    
+    def test_rank_ordering(self):
+        """Сначала идут транзакции, где слова запроса занимают большую часть комментария"""
+        self.create("Налог на имущество организаций за квартал")
+        self.create("Налог налог налог")
+        self.create("Налог")
+        comments = [t.comment for t in self.search('налог').context['transactions']]
+        self.assertEqual(comments, [
+            "Налог налог налог", "Налог", "Налог на имущество организаций за квартал"
+        ])
+        # Остаток по хронологии для выдачи по релевантности не показывается
+        self.assertNotContains(self.search('налог'), '<th>Остаток</th>')
+    
+    def test_index_follows_changes(self):
+        """Триггеры поддерживают индекс при изменении, удалении и массовой вставке"""
+        transaction = self.create("Командировка в Казань")
+        transaction.comment = "Командировка в Самару"
+        transaction.save()
+        self.assertEqual(self.found('казань'), set())
+        self.assertEqual(self.found('самар'), {"Командировка в Самару"})
+        
+        transaction.delete()
+        self.assertEqual(self.found('командировка'), set())
+        
+        insert_transactions([
+            Transaction(
+                status=self.status, transaction_type=self.income_type,
+                category=self.category_income, subcategory=self.subcategory_income,
+                amount=Decimal('10.00'), comment=f"Партия {i}",
+            )
+            for i in range(30)
+        ])
+        self.assertEqual(self.search('партия').context['total_count'], 30)
+        Transaction.objects.filter(comment="Партия 1").update(comment="Возврат")
+        self.assertEqual(self.search('партия').context['total_count'], 29)
+        self.assertEqual(self.found('возврат'), {"Возврат"})
+    
+    def test_query_plan(self):
+        """Поиск идет по индексу FTS5, а не просмотром таблицы транзакций"""
+        self.create("Оплата аренды")
+        self.create_transactions(10)
+        with CaptureQueriesContext(connection) as queries:
+            self.search('аренд')
+        searches = [q['sql'] for q in queries.captured_queries if ' MATCH ' in q['sql']]
+        self.assertTrue(searches)
+        for sql in searches:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.assertTrue(any('VIRTUAL TABLE INDEX' in step for step in plan), plan)
+            for step in plan:
+                self.assertFalse(
+                    step.startswith('SCAN dds_app_transaction') and 'INDEX' not in step,
+                    f"Полный просмотр таблицы:\n{sql}\n{plan}"
+                )
+    
+    def test_query_count(self):
+        """Поиск укладывается в бюджет списка транзакций"""
+        self.create("Оплата аренды")
+        get_references()
+        archived_years()
+        with self.assertNumQueries(3):
+            self.search('аренд')
+    
+    def test_admin_search(self):
+        """Поиск в админке по комментарию и по сумме"""
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        self.create("Оплата аренды", amount='123.45')
+        self.create("Оплата связи", amount='77.00')
+        url = reverse('admin:dds_app_transaction_changelist')
+        response = self.client.get(url, {'q': 'аренд'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get(url, {'q': '77'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get(url, {'q': 'оплата'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+class ArchiveTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Кеш архивных лет переживает откат транзакции теста
+        self.addCleanup(invalidate, 'archive')
+        for year in (2022, 2023, 2025):
+            for month in (2, 6, 11):
+                self.create(date(year, month, 10), f'Аренда склада {year}')
+    
+    def create(self, created_date, comment='', income=False):
+        return Transaction.objects.create(
+            created_date=created_date,
+            status=self.status,
+            transaction_type=self.income_type if income else self.expense_type,
+            category=self.category_income if income else self.category_expense,
+            subcategory=self.subcategory_income if income else self.subcategory_expense,
+            amount=Decimal('100.00') if income else Decimal('40.00') + created_date.month,
+            comment=comment,
+        )
+    
+    def archive(self, **options):
+        output = StringIO()
+        call_command('archive_transactions', until_year=2023, stdout=output, **options)
+        return output.getvalue()
+    
+    def snapshot(self):
+        """Все, что пользователь видит в списке, отчетах и выгрузке"""
+        result = {}
+        for name, params in (('all', {}), ('period', {'start_date': '2023-01-01'}),
+                             ('cursor', {'pagination': 'cursor'})):
+            response = self.client.get(reverse('transaction_list'), params)
+            result[name] = (
+                [(t.pk, t.amount, t.running_balance) for t in response.context['transactions']],
+                response.context['total_count'], response.context['closing_balance'],
+            )
+        result['stats'] = self.client.get(reverse('transaction_stats')).json()
+        result['report'] = self.client.get(reverse('cash_flow_report'), {'group_by': 'category'}).json()
+        export = self.client.get(reverse('transaction_export', args=['csv']))
+        result['export'] = b''.join(export.streaming_content)
+        return result
+    
+    def test_archive_keeps_totals(self):
+        """После переноса закрытых лет списки, итоги, отчеты и выгрузка не меняются"""
+        self.create(date(2025, 12, 1), income=True)
+        before = self.snapshot()
+        output = self.archive(batch_size=2)
+        self.assertIn('Перенесено транзакций: 6', output)
+        
+        self.assertEqual(Transaction.objects.count(), 4)
+        self.assertEqual(
+            list(TransactionArchive.objects.values_list('year', 'row_count')), [(2022, 3), (2023, 3)]
+        )
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(check_daily_summary(), [])
+        # Перенос не меняет числа транзакций журнала
+        self.assertEqual(LedgerState.objects.get(pk=1).transaction_count, 10)
+        # Повторный запуск ничего не переносит
+        self.assertIn('Нет транзакций', self.archive())
+    
+    def test_dry_run(self):
+        output = self.archive(dry_run=True)
+        self.assertIn('2022: будет перенесено 3', output)
+        self.assertEqual(Transaction.objects.count(), 9)
+        self.assertFalse(TransactionArchive.objects.exists())
+    
+    def test_archive_read_only_when_period_reaches_it(self):
+        """Журнал с архивом читается, только если период начинается в архивном году"""
+        self.archive()
+        archived_years()
+        for start_date, reads_archive in (('2025-01-01', False), ('2023-06-01', True), ('', True)):
+            with self.subTest(start_date=start_date):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse('transaction_list'), {'start_date': start_date})
+                sql = ' '.join(query['sql'] for query in queries.captured_queries)
+                self.assertEqual('"dds_app_ledger"' in sql, reads_archive)
+        # Архивные строки показываются без действий редактирования
+        response = self.client.get(reverse('transaction_list'), {'end_date': '2023-12-31'})
+        self.assertContains(response, 'bi-archive', count=6)
+        self.assertNotContains(response, 'form="bulkForm">')
+    
+    def test_closed_period_is_read_only(self):
+        """В архивные годы нельзя добавить или перенести транзакцию"""
+        archived = Transaction.objects.filter(created_date__year=2023).first()
+        self.archive()
+        self.assertEqual(self.client.get(reverse('transaction_edit', args=[archived.pk])).status_code, 404)
+        
+        from .forms import TransactionForm
+        form = TransactionForm(data={
+            'created_date': '2023-12-31', 'status': self.status.pk,
+            'transaction_type': self.expense_type.pk, 'category': self.category_expense.pk,
+            'subcategory': self.subcategory_expense.pk, 'amount': '10.00',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('закрыт', form.errors['created_date'][0])
+        
+        with self.settings(DDS_INGEST_TOKEN='secret'):
+            response = self.client.post(reverse('transaction_ingest'), json.dumps([{
+                'created_date': '2023-12-31', 'status': 'Выполнено', 'transaction_type': 'Списание',
+                'category': 'Продукты', 'subcategory': 'Супермаркет', 'amount': '10.00',
+            }]), content_type='application/json', HTTP_IDEMPOTENCY_KEY='closed',
+                HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('закрыт', response.json()['results'][0]['error'])
+    
+    def test_search_in_archive(self):
+        self.archive()
+        response = self.client.get(reverse('transaction_list'), {'search': 'склада 2022'})
+        self.assertEqual(
+            {t.comment for t in response.context['transactions']}, {'Аренда склада 2022'}
+        )
+        self.assertEqual(response.context['total_count'], 3)
+    
+    def test_archived_reference_is_protected(self):
+        """Справочник, на который ссылаются только архивные транзакции, не удаляется"""
+        status = Status.objects.create(name="Закрыт")
+        Transaction.objects.filter(created_date__year=2022).update(status=status)
+        call_command('rebuild_daily_summary', stdout=StringIO())
+        self.archive()
+        summaries = DailyCashFlowSummary.objects.filter(status=status).count()
+        self.assertEqual(summaries, 3)
+        
+        # Django находит архивные строки через журнал (PROTECT в LedgerTransaction)
+        with self.assertRaises(ProtectedError):
+            with transaction.atomic():
+                status.delete()
+        # Внешний ключ архивной таблицы отказывает и удалению в обход ORM
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('DELETE FROM dds_app_status WHERE id = %s', [status.pk])
+        self.assertTrue(Status.objects.filter(pk=status.pk).exists())
+        self.assertEqual(DailyCashFlowSummary.objects.filter(status=status).count(), summaries)
+        self.assertEqual(check_daily_summary(), [])
+    
+    def test_search_mixed_case_across_archive(self):
+        """Поиск по FTS5 находит кириллицу в любом регистре и в рабочей таблице, и в архиве"""
+        self.create(date(2022, 3, 1), 'Оплата поставщику', income=True)
+        self.create(date(2023, 4, 1), 'ОПЛАТА СВЯЗИ')
+        self.create(date(2025, 5, 1), 'оплата интернета')
+        self.create(date(2025, 7, 1), 'Оплатили аренду', income=True)
+        self.archive()
+        
+        response = self.client.get(reverse('transaction_list'), {'search': 'оплат'})
+        self.assertEqual(response.context['total_count'], 4)
+        self.assertEqual(len(response.context['transactions']), 4)
+        
+        # Период в открытых годах: строки и итоги периода - только из рабочей таблицы,
+        # найденные архивные транзакции входят во входящий остаток
+        params = {'search': 'ОПЛАТ', 'start_date': '2025-01-01'}
+        response = self.client.get(reverse('transaction_list'), params)
+        self.assertEqual(
+            {t.comment for t in response.context['transactions']},
+            {'оплата интернета', 'Оплатили аренду'}
+        )
+        self.assertEqual(response.context['total_count'], 2)
+        self.assertEqual(response.context['opening_balance'], Decimal('100.00') - Decimal('44.00'))
+        self.assertEqual(response.context['closing_balance'], Decimal('156.00') - Decimal('45.00'))
+        stats = self.client.get(reverse('transaction_stats'), params).json()
+        self.assertEqual(stats['totals']['opening_balance'], '56.00')
+        
+        # Суммы по архиву закешированы: повторный поиск не обращается к журналу с архивом
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('transaction_list'), params)
+        self.assertFalse(any('"dds_app_ledger"' in query['sql'] for query in queries.captured_queries))
+    
+    def test_wipe_ledger_drops_archives(self):
+        self.archive()
+        wipe_ledger()
+        self.assertFalse(TransactionArchive.objects.exists())
+        self.assertEqual(LedgerTransaction.objects.count(), 0)
+        self.assertIsNone(hot_start())
+        self.assertEqual(LedgerState.objects.get(pk=1).deletion_count, 15)
+
+class AsyncViewTests(LedgerTestMixin, TestCase):
+    def test_dashboard_async(self):
+        """Асинхронный дашборд показывает то же, что и синхронный"""
+        self.create_transactions(3)
+        sync_context = self.client.get(reverse('dashboard')).context
+        response = self.client.get(reverse('dashboard_async'))
+        self.assertEqual(response.status_code, 200)
+        for name in ('total_income', 'total_expense', 'balance', 'total_transactions',
+                     'recent_transactions', 'category_stats'):
+            self.assertEqual(response.context[name], sync_context[name])
+
+    def test_transaction_stats(self):
+        """Итоги совпадают со списком, разбивки считаются по отфильтрованным итогам"""
+        self.create_transactions(3)
+        params = {'status': self.status.id}
+        stats = self.client.get(reverse('transaction_stats'), params).json()
+        context = self.client.get(reverse('transaction_list'), params).context
+        self.assertEqual(stats['totals'], {
+            'total_income': str(context['total_income']),
+            'total_expense': str(context['total_expense']),
+            'total_count': context['total_count'],
+            'balance': str(context['balance']),
+            'opening_balance': str(context['opening_balance']),
+            'closing_balance': str(context['closing_balance']),
+        })
+        self.assertEqual(stats['by_status'], [{
+            'id': self.status.id, 'name': 'Выполнено',
+            'income': '300.00', 'expense': '120.00', 'count': 6,
+        }])
+        self.assertEqual(
+            [(row['name'], row['count']) for row in stats['by_category']],
+            [('Зарплата', 3), ('Продукты', 3)]
+        )
+
+    def test_transaction_stats_search_cold_cache(self):
+        """Поиск в статистике с пустым кешем не обращается к БД из event loop"""
+        self.create_transactions(2)
+        Transaction.objects.filter(transaction_type=self.income_type).update(comment='Аванс')
+        cache.clear()
+        response = self.client.get(reverse('transaction_stats'), {'search': 'аванс'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['total_count'], 2)
+    
+    def test_transaction_stats_invalid(self):
+        response = self.client.get(reverse('transaction_stats'), {'status': 999})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json()['errors'])
+
+class SqliteProfileTests(SimpleTestCase):
+    """Профиль production: прагмы при подключении, BEGIN IMMEDIATE и многопроцессная нагрузка"""
+    pragmas = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    }
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'profile.sqlite3')
+    
+    def open(self, engine='dds_app.backends.sqlite3'):
+        """Новое подключение к файлу БД теста с указанным движком"""
+        settings_dict = {**connection.settings_dict, 'ENGINE': engine, 'NAME': self.path}
+        wrapper = load_backend(engine).DatabaseWrapper(settings_dict, alias='profile')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+    
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+    
+    def test_pragmas(self):
+        """Прагмы выполняются на каждом новом подключении"""
+        with self.settings(DDS_SQLITE_PRAGMAS=self.pragmas):
+            wrapper = self.open()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 256 * 1024 * 1024)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64 * 1024)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)
+    
+    def test_begin_immediate(self):
+        """write_atomic() берет блокировку записи сразу, atomic() - только на первом изменении"""
+        self.addCleanup(connections.__delitem__, 'profile')
+        for engine, block, locked in [
+            ('django.db.backends.sqlite3', transaction.atomic, False),
+            ('django.db.backends.sqlite3', write_atomic, False),
+            ('dds_app.backends.sqlite3', transaction.atomic, False),
+            ('dds_app.backends.sqlite3', write_atomic, True),
+        ]:
+            with self.subTest(engine=engine, block=block.__name__):
+                first, second = self.open(engine), self.open(engine)
+                connections['profile'] = first
+                with first.cursor() as cursor:
+                    cursor.execute('CREATE TABLE IF NOT EXISTS item (id INTEGER PRIMARY KEY)')
+                with second.cursor() as cursor:
+                    cursor.execute('PRAGMA busy_timeout = 0')
+                with block(using='profile'):
+                    with second.cursor() as cursor:
+                        if locked:
+                            with self.assertRaisesMessage(OperationalError, 'locked'):
+                                cursor.execute('INSERT INTO item DEFAULT VALUES')
+                        else:
+                            cursor.execute('INSERT INTO item DEFAULT VALUES')
+                    # Вложенные atomic() не наследуют BEGIN IMMEDIATE внешнего блока
+                    self.assertFalse(getattr(first, 'begin_immediate', False))
+    
+    def load_settings(self, **environ):
+        """Настройки проекта, вычисленные заново с переменными окружения environ"""
+        path = importlib.import_module(settings.SETTINGS_MODULE).__file__
+        with patch.dict(os.environ, environ):
+            return runpy.run_path(path)
+    
+    def test_production_cache_is_shared(self):
+        """В профиле production кеш по умолчанию общий для процессов, LocMemCache не допускается"""
+        production = self.load_settings(DJANGO_DB_PROFILE='production', DJANGO_DB_NAME=self.path)
+        self.assertEqual(
+            production['CACHES']['default']['BACKEND'],
+            'django.core.cache.backends.filebased.FileBasedCache'
+        )
+        self.assertEqual(production['CACHES']['default']['LOCATION'], f'{self.path}-cache')
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings(
+                DJANGO_DB_PROFILE='production',
+                DJANGO_CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache',
+            )
+    
+    def test_stress_without_lock_errors(self):
+        """Несколько процессов читают и пишут в профиле production без ошибок блокировки"""
+        result = run_profile('production', workers=3, seconds=1, transactions=200)
+        self.assertGreater(result['reads'], 0)
+        self.assertGreater(result['writes'], 0)
+        self.assertEqual(result['locked'], 0)
+
+class ParallelQueryTests(LedgerTestMixin, TransactionTestCase):
+    def test_queries_run_in_separate_threads(self):
+        """Вне транзакции запросы идут в потоках пула, результаты - в порядке вызова"""
+        self.create_transactions(2)
+        threads = []
+        
+        def query(model):
+            def run():
+                threads.append(threading.get_ident())
+                return model.objects.count()
+            return run
+        
+        results = async_to_sync(run_queries)(query(Transaction), query(Category), query(Status))
+        self.assertEqual(results, [4, 2, 1])
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_queries_in_transaction(self):
+        """Внутри транзакции запросы видят ее незафиксированные изменения"""
+        with transaction.atomic():
+            self.create_transactions(1)
+            results = async_to_sync(run_queries)(Transaction.objects.count, Category.objects.count)
+        self.assertEqual(results, [2, 2])
+
+    def test_run_concurrent(self):
+        """Сравнение WSGI и ASGI дает перцентили и пропускную способность для обоих"""
+        self.create_transactions(2)
+        results = run_concurrent(clients=2, requests=2, warmup=0)
+        self.assertEqual(set(results), {'dashboard', 'dashboard_async', 'transaction_stats'})
+        for servers in results.values():
+            self.assertEqual(set(servers), {'wsgi', 'asgi'})
+            for metrics in servers.values():
+                self.assertEqual(set(metrics), {'p50_ms', 'p95_ms', 'p99_ms', 'rps'})
+
+class SampleDataTests(TestCase):
+    options = {'transactions': 500, 'seed': 7, 'years': 2, 'end_date': date(2024, 12, 31)}
+
+    def load(self, **options):
+        call_command('load_sample_data', stdout=StringIO(), flush=True, **{**self.options, **options})
+        return list(Transaction.objects.order_by('created_date', 'created_at', 'id').values_list(
+            'created_date', 'status__name', 'category__name', 'subcategory__name', 'amount', 'comment'
+        ))
+
+    def test_demo_data(self):
+        """Без --transactions загружаются демонстрационные транзакции"""
+        call_command('load_sample_data', stdout=StringIO())
+        self.assertEqual(Transaction.objects.count(), 15)
+        self.assertEqual(
+            TransactionType.objects.get(name='Пополнение').direction,
+            TransactionType.Direction.INCOME
+        )
+        self.assertEqual(check_daily_summary(), [])
+
+    def test_generated_ledger(self):
+        """Сгенерированный журнал согласован со справочниками и дневными итогами"""
+        rows = self.load()
+        self.assertEqual(len(rows), 500)
+        self.assertEqual(min(row[0] for row in rows), date(2023, 1, 2))
+        self.assertEqual(max(row[0] for row in rows), date(2024, 12, 31))
+        self.assertFalse(Transaction.objects.exclude(
+            category__transaction_type=F('transaction_type'),
+            subcategory__category=F('category'),
+        ).exists())
+        self.assertEqual(check_daily_summary(), [])
+        
+        # Распределение по подкатегориям неравномерное
+        counts = sorted(
+            Transaction.objects.values('subcategory').annotate(count=Count('id'))
+            .values_list('count', flat=True),
+            reverse=True
+        )
+        self.assertGreater(counts[0], 5 * counts[-1])
+
+    def test_existing_ledger_needs_flush(self):
+        """Без --flush непустой журнал не удаляется"""
+        self.load()
+        with self.assertRaisesMessage(CommandError, '--flush'):
+            call_command('load_sample_data', stdout=StringIO(), **self.options)
+        with self.assertRaisesMessage(CommandError, '--flush'):
+            call_command('load_sample_data', stdout=StringIO())
+        self.assertEqual(Transaction.objects.count(), 500)
+    
+    def test_existing_references(self):
+        """Без --flush журнал генерируется по уже заведенным справочникам"""
+        status = Status.objects.create(name="Проведено")
+        expense = TransactionType.objects.create(name="Расход", direction=TransactionType.Direction.EXPENSE)
+        category = Category.objects.create(name="Аренда", transaction_type=expense)
+        subcategory = Subcategory.objects.create(name="Офис", category=category)
+        output = StringIO()
+        call_command('load_sample_data', stdout=output, **self.options)
+        self.assertIn('существующие справочники', output.getvalue())
+        self.assertEqual(Transaction.objects.filter(status=status, subcategory=subcategory).count(), 500)
+        self.assertEqual(Subcategory.objects.count(), 1)
+        self.assertEqual(check_daily_summary(), [])
+        # Демонстрационные транзакции нужны со своими справочниками
+        Transaction.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, '--flush'):
+            call_command('load_sample_data', stdout=StringIO())
+    
+    def test_deterministic(self):
+        """Одинаковый seed дает одинаковые данные, другой - другие"""
+        first = self.load()
+        self.assertEqual(self.load(), first)
+        self.assertNotEqual(self.load(seed=8), first)
+        self.assertEqual(Transaction.objects.count(), 500)
+
+class BenchmarkTests(LedgerTestMixin, TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_run_scenarios(self):
+        """Все сценарии отвечают 200 и дают полный набор метрик"""
+        self.create_transactions(20)
+        results = run_scenarios(iterations=2, warmup=0)
+        self.assertIn('list_deep_cursor', results)
+        for metrics in results.values():
+            self.assertEqual(
+                set(metrics),
+                {'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'sql_ms', 'peak_memory_kb'}
+            )
+        self.assertEqual(results['ajax_reference_tree']['queries'], 0)
+
+    def test_compare(self):
+        """Регрессией считается рост числа запросов или заметный рост p95"""
+        base = {'p95_ms': 10.0, 'queries': 3}
+        baseline = {'1000': {'list': base, 'dashboard': base}}
+        results = {'1000': {
+            'list': {'p95_ms': 11.0, 'queries': 3},
+            'dashboard': {'p95_ms': 20.0, 'queries': 4},
+            'new': {'p95_ms': 100.0, 'queries': 9},
+        }}
+        regressions = compare(results, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(item.startswith('1000/dashboard') for item in regressions))
+
+class ReferenceRegistryTests(LedgerTestMixin, TestCase):
+    def test_indexes(self):
+        """Тест индексов реестра справочников"""
+        references = get_references()
+        self.assertEqual(references.get(Category, self.category_income.pk), self.category_income)
+        self.assertEqual(references.categories_for_type(self.income_type.pk), [self.category_income])
+        self.assertEqual(
+            references.subcategories_for_category(self.category_expense.pk),
+            [self.subcategory_expense]
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                str(references.get(Subcategory, self.subcategory_income.pk)),
+                "Основная зарплата (Зарплата (Пополнение))"
+            )
+
+    def test_invalidation(self):
+        """Реестр перечитывается после изменения справочника"""
+        get_references()
+        archived_years()
+        category = Category.objects.create(name="Фриланс", transaction_type=self.income_type)
+        self.assertIn(category, get_references().categories_for_type(self.income_type.pk))
+        
+        category.delete()
+        self.assertNotIn(category, get_references().categories_for_type(self.income_type.pk))
+
+    def test_no_reference_queries_in_steady_state(self):
+        """Формы и AJAX-представления не обращаются к справочникам в БД"""
+        transaction = Transaction.objects.create(
+            status=self.status,
+            transaction_type=self.income_type,
+            category=self.category_income,
+            subcategory=self.subcategory_income,
+            amount=Decimal('100.00')
+        )
+        get_references()
+        archived_years()
+        requests = [
+            (reverse('transaction_list'), {'status': self.status.pk, 'category': self.category_income.pk}),
+            (reverse('transaction_create'), {}),
+            (reverse('transaction_edit', args=[transaction.pk]), {}),
+            (reverse('ajax_load_categories'), {'transaction_type_id': self.income_type.pk}),
+            (reverse('ajax_load_subcategories'), {'category_id': self.category_income.pk}),
+        ]
+        reference_tables = [
+            '"dds_app_status"', '"dds_app_transactiontype"', '"dds_app_category"', '"dds_app_subcategory"'
+        ]
+        for url, data in requests:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data)
+                self.assertEqual(response.status_code, 200)
+                for query in queries.captured_queries:
+                    if query['sql'].startswith('SELECT "dds_app_transaction"'):
+                        continue
+                    for table in reference_tables:
+                        self.assertNotIn(f'FROM {table}', query['sql'])
+
+    def test_transaction_form_hierarchy(self):
+        """Форма принимает только категории выбранного типа"""
+        from .forms import TransactionForm
+        
+        get_references()
+        archived_years()
+        form_data = {
+            'created_date': timezone.now().date(),
+            'status': self.status.id,
+            'transaction_type': self.income_type.id,
+            'category': self.category_expense.id,
+            'subcategory': self.subcategory_expense.id,
+            'amount': '10.00',
+        }
+        with self.assertNumQueries(0):
+            form = TransactionForm(data=form_data)
+            self.assertFalse(form.is_valid())
+        self.assertIn('category', form.errors)
+
+class ReferenceTreeTests(LedgerTestMixin, TestCase):
+    def test_tree_content(self):
+        """Тест содержимого дерева справочников"""
+        response = self.client.get(reverse('ajax_reference_tree'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        tree = response.json()
+        income = next(t for t in tree['types'] if t['id'] == self.income_type.id)
+        self.assertEqual(income['name'], 'Пополнение')
+        self.assertEqual(income['categories'], [{
+            'id': self.category_income.id,
+            'name': 'Зарплата',
+            'subcategories': [{'id': self.subcategory_income.id, 'name': 'Основная зарплата'}],
+        }])
+
+    def test_tree_etag(self):
+        """Тест условного запроса и смены ETag при изменении справочников"""
+        response = self.client.get(reverse('ajax_reference_tree'))
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        
+        response = self.client.get(reverse('ajax_reference_tree'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        Subcategory.objects.create(name="Премия", category=self.category_income)
+        response = self.client.get(reverse('ajax_reference_tree'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_versioned_tree_url(self):
+        """Форма ссылается на версионированный URL, который кешируется надолго"""
+        response = self.client.get(reverse('transaction_create'))
+        url = f"{reverse('ajax_reference_tree')}?v={get_references().tree_etag}"
+        self.assertContains(response, url)
+        
+        response = self.client.get(url)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_legacy_endpoints(self):
+        """Старые AJAX-представления отдают варианты из того же снимка"""
+        get_references()
+        archived_years()
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('ajax_load_categories'), {'transaction_type_id': self.income_type.id}
+            )
+        self.assertContains(response, f'<option value="{self.category_income.id}">Зарплата</option>')
+        self.assertNotContains(response, 'Продукты')
+        
+        response = self.client.get(
+            reverse('ajax_load_subcategories'), {'category_id': self.category_expense.id}
+        )
+        self.assertContains(response, 'Супермаркет')
+        
+        response = self.client.get(reverse('ajax_load_subcategories'), {'category_id': 999})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Супермаркет')
+        
+        response = self.client.get(reverse('ajax_load_categories'))
+        self.assertEqual(response.status_code, 400)
+
+class GlobalStatsTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        """Пользователь и очищенный кеш статистики"""
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.client.force_login(self.user)
+
+    def render(self, template):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return Template(template).render(RequestContext(request))
+
+    def test_stats_values(self):
+        """Тест значений глобальной статистики"""
+        self.create_transactions(2)
+        self.assertEqual(
+            self.render(
+                '{{ global_income|floatformat:2 }} {{ global_expense|floatformat:2 }} '
+                '{{ global_balance|floatformat:2 }}'
+            ),
+            '200,00 80,00 120,00'
+        )
+
+    def test_stats_not_computed_unless_used(self):
+        """Статистика не считается, если шаблон к ней не обращается"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('ajax_load_categories'),
+                {'transaction_type_id': self.income_type.id}
+            )
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            self.assertNotIn('dds_app_dailycashflowsummary', query['sql'])
+
+    def test_stats_cached_until_ledger_changes(self):
+        """Статистика берется из кеша, пока не изменятся транзакции"""
+        self.create_transactions(1)
+        self.assertEqual(self.render('{{ global_balance|floatformat:2 }}'), '60,00')
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.render('{{ global_balance|floatformat:2 }} {{ global_income|floatformat:2 }}'),
+                '60,00 100,00'
+            )
+        
+        self.create_transactions(1)
+        self.assertEqual(self.render('{{ global_balance|floatformat:2 }}'), '120,00')
+        
+        Transaction.objects.filter(transaction_type=self.expense_type).first().delete()
+        self.assertEqual(self.render('{{ global_balance|floatformat:2 }}'), '160,00')
+
+class QueryPlanTests(LedgerTestMixin, TestCase):
+    """Проверка планов запросов к таблице транзакций через EXPLAIN QUERY PLAN"""
+    
+    def get_plans(self, url, data=None):
+        """Выполняет запрос к странице и возвращает планы SQL по транзакциям"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data or {})
+        self.assertEqual(response.status_code, 200)
+        
+        plans = []
+        for query in queries.captured_queries:
+            if '"dds_app_transaction"' not in query['sql']:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append((query['sql'], [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertIndexedPlans(self, url, data=None):
+        """Ни один запрос не читает таблицу транзакций целиком и не сортирует ее во временном B-дереве"""
+        for sql, plan in self.get_plans(url, data):
+            for step in plan:
+                self.assertFalse(
+                    step.startswith('SCAN dds_app_transaction') and 'INDEX' not in step,
+                    f"Полный просмотр таблицы:\n{sql}\n{plan}"
+                )
+                # Сортировка сгруппированных строк справочника допустима
+                if sql.split(' FROM ', 1)[1].startswith('"dds_app_transaction"'):
+                    self.assertNotIn(
+                        'TEMP B-TREE', step,
+                        f"Сортировка без индекса:\n{sql}\n{plan}"
+                    )
+
+    def test_dashboard_plans(self):
+        """Тест планов запросов дашборда"""
+        self.create_transactions(3)
+        self.assertIndexedPlans(reverse('dashboard'))
+
+    def test_list_plans(self):
+        """Тест планов запросов списка без фильтров"""
+        self.create_transactions(10)
+        self.assertIndexedPlans(reverse('transaction_list'))
+        self.assertIndexedPlans(reverse('transaction_list'), {'page': 2})
+
+    def test_cursor_plans(self):
+        """Тест планов запросов курсорной пагинации"""
+        self.create_transactions(20)
+        url = reverse('transaction_list')
+        for data in [{}, {'status': self.status.id}, {'category': self.category_income.id}]:
+            params = {'pagination': 'cursor', **data}
+            page = self.client.get(url, params).context['page_obj']
+            self.assertIndexedPlans(url, {**params, 'cursor': page.next_cursor})
+            page = self.client.get(url, {**params, 'cursor': page.next_cursor}).context['page_obj']
+            self.assertIndexedPlans(url, {**params, 'cursor': page.previous_cursor})
+
+    def test_filter_plans(self):
+        """Тест планов запросов списка с фильтрами"""
+        self.create_transactions(3)
+        date_range = {'start_date': '2020-01-01', 'end_date': '2030-12-31'}
+        filters = [
+            {},
+            {'status': self.status.id},
+            {'transaction_type': self.income_type.id},
+            {'category': self.category_income.id},
+            {'subcategory': self.subcategory_income.id},
+            {'status': self.status.id, 'transaction_type': self.expense_type.id},
+            {'category': self.category_income.id, 'subcategory': self.subcategory_income.id},
+        ]
+        for data in filters:
+            with self.subTest(data=data):
+                self.assertIndexedPlans(reverse('transaction_list'), data)
+                self.assertIndexedPlans(reverse('transaction_list'), {**data, **date_range})
+
+class QueryBudgetMixin:
+    """Проверки числа SQL-запросов с выводом самих запросов при превышении"""
+    
+    def capture_queries(self, url, data=None):
+        if isinstance(data, list):
+            # Список - пакет для API загрузки, каждый раз с новым ключом идемпотентности
+            self.batch_number = getattr(self, 'batch_number', 0) + 1
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    url, json.dumps(data), content_type='application/json',
+                    HTTP_IDEMPOTENCY_KEY=f'budget-{self.batch_number}',
+                )
+            self.assertEqual(response.status_code, 201, url)
+            return [query['sql'] for query in queries.captured_queries]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data or {})
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return [query['sql'] for query in queries.captured_queries]
+    
+    def format_queries(self, queries):
+        return '\n'.join(f'{number}. {sql}' for number, sql in enumerate(queries, start=1))
+    
+    def assertQueryBudget(self, url, budget, data=None):
+        """Страница выполняет не больше budget запросов; возвращает их число"""
+        queries = self.capture_queries(url, data)
+        if len(queries) > budget:
+            self.fail(
+                f'{url}: {len(queries)} запросов при бюджете {budget}:\n'
+                + self.format_queries(queries)
+            )
+        return len(queries)
+    
+    def assertSameQueries(self, url, expected, data=None):
+        """Страница выполняет ровно expected запросов, как до изменения данных"""
+        queries = self.capture_queries(url, data)
+        if len(queries) != expected:
+            self.fail(
+                f'{url}: {expected} запросов до роста данных и {len(queries)} после:\n'
+                + self.format_queries(queries)
+            )
+
+@override_settings(DDS_INGEST_ALLOW_ANONYMOUS=True)
+class QueryBudgetTests(QueryBudgetMixin, LedgerTestMixin, TestCase):
+    """Бюджет запросов для каждого маршрута dds_app.urls.
+    
+    Бюджеты указаны для прогретых реестра справочников и списка архивных лет. Новый маршрут без
+    бюджета роняет test_every_url_has_budget.
+    """
+    budgets = {
+        'dashboard': 4,
+        'dashboard_async': 4,
+        'transaction_list': 4,
+        'transaction_create': 0,
+        'transaction_edit': 1,
+        'transaction_delete': 1,
+        'transaction_bulk': 1,
+        'transaction_ingest': 14,
+        'transaction_stats': 4,
+        'transaction_export': 2,
+        'cash_flow_report': 2,
+        'reference_management': 4,
+        'ajax_reference_tree': 0,
+        'ajax_load_categories': 0,
+        'ajax_load_subcategories': 0,
+    }
+    
+    def setUp(self):
+        super().setUp()
+        self.create_transactions(5)
+        self.transaction = Transaction.objects.first()
+    
+    def requests(self):
+        """Название маршрута -> (URL, параметры GET)"""
+        pk = self.transaction.pk
+        return {
+            'dashboard': (reverse('dashboard'), {}),
+            'dashboard_async': (reverse('dashboard_async'), {}),
+            'transaction_list': (reverse('transaction_list'), {}),
+            'transaction_create': (reverse('transaction_create'), {}),
+            'transaction_edit': (reverse('transaction_edit', args=[pk]), {}),
+            'transaction_delete': (reverse('transaction_delete', args=[pk]), {}),
+            'transaction_bulk': (reverse('transaction_bulk'), {
+                'action': 'status', 'new_status': self.status.pk, 'scope': 'filter',
+                'filters': f'category={self.category_income.pk}',
+            }),
+            'transaction_stats': (reverse('transaction_stats'), {'start_date': '2024-01-01'}),
+            'transaction_export': (reverse('transaction_export', args=['csv']), {}),
+            'cash_flow_report': (reverse('cash_flow_report'), {'group_by': 'category'}),
+            'transaction_ingest': (reverse('transaction_ingest'), [
+                {
+                    'created_date': '2024-03-01', 'status': self.status.pk,
+                    'transaction_type': self.expense_type.pk, 'category': self.category_expense.pk,
+                    'subcategory': self.subcategory_expense.pk, 'amount': '10.00',
+                },
+            ] * 3),
+            'reference_management': (reverse('reference_management'), {}),
+            'ajax_reference_tree': (reverse('ajax_reference_tree'), {}),
+            'ajax_load_categories': (
+                reverse('ajax_load_categories'), {'transaction_type_id': self.expense_type.pk}
+            ),
+            'ajax_load_subcategories': (
+                reverse('ajax_load_subcategories'), {'category_id': self.category_expense.pk}
+            ),
+        }
+    
+    def grow(self):
+        """Добавляет справочники и около тысячи транзакций"""
+        for i in range(10):
+            Status.objects.create(name=f"Статус {i}")
+            category = Category.objects.create(
+                name=f"Категория {i}",
+                transaction_type=self.expense_type
+            )
+            for j in range(3):
+                Subcategory.objects.create(name=f"Подкатегория {i}.{j}", category=category)
+        subcategories = list(Subcategory.objects.select_related('category'))
+        statuses = list(Status.objects.all())
+        insert_transactions([
+            Transaction(
+                created_date=date(2024, 1, 1) + timedelta(days=i % 200),
+                status=statuses[i % len(statuses)],
+                transaction_type_id=subcategories[i % len(subcategories)].category.transaction_type_id,
+                category_id=subcategories[i % len(subcategories)].category_id,
+                subcategory=subcategories[i % len(subcategories)],
+                amount=Decimal('10.00') + i,
+            )
+            for i in range(1000)
+        ])
+    
+    def test_every_url_has_budget(self):
+        """Для каждого именованного маршрута приложения задан бюджет"""
+        names = {pattern.name for pattern in urlpatterns if pattern.name}
+        self.assertEqual(names, set(self.budgets))
+        self.assertEqual(names, set(self.requests()))
+    
+    def test_budgets(self):
+        for name, (url, data) in self.requests().items():
+            with self.subTest(name):
+                get_references()
+                archived_years()
+                self.assertQueryBudget(url, self.budgets[name], data)
+    
+    def test_queries_do_not_grow(self):
+        """Число запросов не зависит от объема журнала и справочников"""
+        requests = self.requests()
+        counts = {}
+        for name, (url, data) in requests.items():
+            get_references()
+            archived_years()
+            counts[name] = len(self.capture_queries(url, data))
+        self.grow()
+        for name, (url, data) in requests.items():
+            with self.subTest(name):
+                get_references()
+                archived_years()
+                self.assertSameQueries(url, counts[name], data)
+
+@override_settings(DDS_PERFORMANCE_MIDDLEWARE=True, DDS_SLOW_QUERY_MS=100)
+class PerformanceMiddlewareTests(LedgerTestMixin, TestCase):
+    def test_server_timing(self):
+        """Ответ содержит Server-Timing, а журнал - строку JSON с теми же замерами"""
+        self.create_transactions(2)
+        with self.assertLogs('dds_app.performance', 'INFO') as logs:
+            response = self.client.get(reverse('transaction_list'))
+        timing = response['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'request')
+        self.assertEqual(record['status'], 200)
+        self.assertIn(f'desc="SQL ({record["sql_count"]})"', timing)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['template_ms'])
+
+    @override_settings(DDS_SLOW_QUERY_MS=0)
+    def test_slow_queries(self):
+        """Запросы дольше порога записываются с SQL"""
+        with self.assertLogs('dds_app.performance', 'WARNING') as logs:
+            self.client.get(reverse('dashboard'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'slow_query')
+        self.assertIn('SELECT', record['sql'])
+
+    @override_settings(DDS_PERFORMANCE_MIDDLEWARE=False)
+    def test_disabled(self):
+        """Выключенный middleware не участвует в обработке запросов"""
+        response = self.client.get(reverse('dashboard'))
+        self.assertNotIn('Server-Timing', response)
+
 class FormTests(TestCase):
     def setUp(self):
         """Настройка тестовых данных для форм"""
         self.status = Status.objects.create(name="Выполнено")
-        self.income_type = TransactionType.objects.create(name="Пополнение")
-        self.expense_type = TransactionType.objects.create(name="Списание")
+        self.income_type = TransactionType.objects.create(
+            name="Пополнение", direction=TransactionType.Direction.INCOME
+        )
+        self.expense_type = TransactionType.objects.create(
+            name="Списание", direction=TransactionType.Direction.EXPENSE
+        )
         
         self.category_income = Category.objects.create(
             name="Зарплата", 
@@ -5,14 +5,23 @@ urlpatterns = [
     # Основные маршруты для транзакций
     path('', views.TransactionListView.as_view(), name='transaction_list'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/async/', views.dashboard_async, name='dashboard_async'),
     path('transactions/create/', views.TransactionCreateView.as_view(), name='transaction_create'),
     path('transactions/<int:pk>/edit/', views.TransactionUpdateView.as_view(), name='transaction_edit'),
     path('transactions/<int:pk>/delete/', views.TransactionDeleteView.as_view(), name='transaction_delete'),
+    path('transactions/bulk/', views.transaction_bulk, name='transaction_bulk'),
+    path('transactions/stats/', views.transaction_stats, name='transaction_stats'),
+    path('transactions/export.<str:export_format>', views.TransactionExportView.as_view(), name='transaction_export'),
+    path('reports/cash-flow/', views.report, name='cash_flow_report'),
+    
+    # API загрузки транзакций для интеграций
+    path('api/transactions/batch/', views.transaction_ingest, name='transaction_ingest'),
     
     # Управление справочниками
     path('references/', views.reference_management, name='reference_management'),
     
     # AJAX endpoints для динамических форм
+    path('ajax/reference-tree/', views.reference_tree, name='ajax_reference_tree'),
     path('ajax/load-categories/', views.load_categories, name='ajax_load_categories'),
     path('ajax/load-subcategories/', views.load_subcategories, name='ajax_load_subcategories'),
 ]
\ No newline at end of file
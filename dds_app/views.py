@@ -1,13 +1,39 @@
-﻿from django.shortcuts import render, get_object_or_404, redirect
+﻿import hmac
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
-from django.db.models import Q
-from django.http import JsonResponse
+from django.urls import reverse, reverse_lazy
+from decimal import Decimal
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+from django.conf import settings
 from django.contrib import messages
 from django.core.paginator import Paginator
-from .models import Transaction, Status, TransactionType, Category, Subcategory
-from .forms import TransactionForm, TransactionFilterForm
+from .models import (
+    Transaction, Status, TransactionType, Category, Subcategory, DailyCashFlowSummary
+)
+from .bulk import bulk_delete_transactions, bulk_update_transactions
+from .conditional import ledger_condition
+from .exporting import export_rows, stream_csv, stream_xlsx
+from .forms import BulkActionForm, ReportForm, TransactionForm, TransactionFilterForm
+from .ingest import BatchError, ingest_batch
+from .locking import write_atomic
+from .pagination import CursorPaginator
+from .references import get_references
+from .search import rank_ordering
+from .parallel import run_queries
+from .reports import (
+    EXPENSE_FILTER, INCOME_FILTER, breakdown, cash_flow_report, with_running_balance
+)
 
+@method_decorator(ledger_condition, name='get')
 class TransactionListView(ListView):
     """Представление для списка транзакций с фильтрацией"""
     model = Transaction
@@ -15,57 +41,103 @@ class TransactionListView(ListView):
     context_object_name = 'transactions'
     paginate_by = 15
     
+    def filter_queryset(self, queryset):
+        """Применяет фильтры формы к транзакциям или к их дневным итогам"""
+        return self.filter_form.filter_queryset(queryset)
+    
     def get_queryset(self):
-        queryset = super().get_queryset()
         self.filter_form = TransactionFilterForm(self.request.GET)
+        queryset = self.filter_queryset(self.filter_form.transactions())
+        if self.filter_form.searching:
+            queryset = queryset.order_by(*rank_ordering())
         
-        if self.filter_form.is_valid():
-            data = self.filter_form.cleaned_data
-            
-            # Фильтрация по дате
-            if data.get('start_date'):
-                queryset = queryset.filter(created_date__gte=data['start_date'])
-            if data.get('end_date'):
-                queryset = queryset.filter(created_date__lte=data['end_date'])
-            
-            # Фильтрация по справочникам
-            if data.get('status'):
-                queryset = queryset.filter(status=data['status'])
-            if data.get('transaction_type'):
-                queryset = queryset.filter(transaction_type=data['transaction_type'])
-            if data.get('category'):
-                queryset = queryset.filter(category=data['category'])
-            if data.get('subcategory'):
-                queryset = queryset.filter(subcategory=data['subcategory'])
-        
+        # __str__ категорий и подкатегорий обращается к родителям
         return queryset.select_related(
-            'status', 'transaction_type', 'category', 'subcategory'
+            'status', 'transaction_type', 'category__transaction_type',
+            'subcategory__category__transaction_type'
+        )
+    
+    def get_totals(self):
+        """Итоги и остатки по активному фильтру одним запросом к дневным итогам"""
+        return self.filter_form.totals()
+    
+    def paginate_queryset(self, queryset, page_size):
+        # Остаток после каждой строки считается в БД от конечного остатка фильтра
+        closing_balance = self.totals['closing_balance']
+        # Результаты поиска упорядочены по релевантности: курсоры по дате
+        # к ним не применимы, а остаток по хронологии теряет смысл
+        searching = self.filter_form.searching
+        if searching or self.request.GET.get('pagination') != 'cursor':
+            paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+            page.object_list = list(object_list)
+            if page.object_list and not searching:
+                # Окно считается отдельным запросом только по id и суммам: строки
+                # со всеми JOIN справочников до OFFSET обходятся в разы дороже
+                offset = (page.number - 1) * paginator.per_page
+                balances = dict(with_running_balance(queryset, closing_balance).values_list(
+                    'pk', 'running_balance'
+                )[offset:offset + len(page.object_list)])
+                for transaction in page.object_list:
+                    transaction.running_balance = balances[transaction.pk]
+            return (paginator, page, page.object_list, is_paginated)
+        
+        # Курсорный режим: без COUNT и OFFSET, глубокие страницы не дороже первой
+        paginator = CursorPaginator(
+            queryset, page_size, closing_balance=closing_balance,
+            summaries=self.filter_form.summaries(history=True)
         )
+        page = paginator.page(self.request.GET.get('cursor'))
+        return (paginator, page, page.object_list, page.has_other_pages())
+    
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        # Количество уже посчитано вместе с итогами, повторный COUNT не нужен
+        paginator.count = self.totals['total_count']
+        return paginator
     
     def get_context_data(self, **kwargs):
+        # Форма фильтра и queryset уже построены в get_queryset()
+        self.totals = self.get_totals()
         context = super().get_context_data(**kwargs)
         context['filter_form'] = self.filter_form
+        context['bulk_form'] = BulkActionForm()
+        context['searching'] = self.filter_form.searching
+        context.update(self.totals)
         
-        # Статистика для отображения
-        queryset = self.get_queryset()
-        total_income = sum(
-            t.amount for t in queryset 
-            if t.transaction_type.name.lower() in ['пополнение', 'доход']
-        )
-        total_expense = sum(
-            t.amount for t in queryset 
-            if t.transaction_type.name.lower() in ['списание', 'расход']
-        )
-        
-        context.update({
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'balance': total_income - total_expense,
-            'total_count': queryset.count()
-        })
+        context['cursor_mode'] = isinstance(context['paginator'], CursorPaginator)
+        if context['is_paginated'] and not context['cursor_mode']:
+            # Вместо всех номеров страниц - окно вокруг текущей
+            context['page_range'] = list(context['paginator'].get_elided_page_range(
+                context['page_obj'].number, on_each_side=2, on_ends=1
+            ))
         
         return context
 
+class TransactionExportView(TransactionListView):
+    """Потоковая выгрузка отфильтрованного списка транзакций в CSV или XLSX"""
+    formats = {
+        'csv': (stream_csv, 'text/csv; charset=utf-8'),
+        'xlsx': (
+            stream_xlsx,
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        ),
+    }
+    
+    def get(self, request, *args, **kwargs):
+        export_format = kwargs['export_format']
+        if export_format not in self.formats:
+            raise Http404('Неизвестный формат выгрузки')
+        stream, content_type = self.formats[export_format]
+        
+        # Те же фильтры, что и у списка, но без моделей и без загрузки всех строк в память
+        self.filter_form = TransactionFilterForm(request.GET)
+        queryset = self.filter_queryset(self.filter_form.transactions())
+        queryset = with_running_balance(queryset, self.get_totals()['closing_balance'])
+        response = StreamingHttpResponse(stream(export_rows(queryset)), content_type=content_type)
+        filename = f'transactions_{timezone.localdate():%Y%m%d}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 class TransactionCreateView(CreateView):
     """Представление для создания новой транзакции"""
     model = Transaction
@@ -75,7 +147,9 @@ class TransactionCreateView(CreateView):
     
     def form_valid(self, form):
         messages.success(self.request, 'Транзакция успешно создана!')
-        return super().form_valid(form)
+        # Транзакция и ее дневной итог сохраняются вместе, с блокировкой записи сразу
+        with write_atomic():
+            return super().form_valid(form)
     
     def form_invalid(self, form):
         messages.error(self.request, 'Пожалуйста, исправьте ошибки в форме.')
@@ -90,7 +164,9 @@ class TransactionUpdateView(UpdateView):
     
     def form_valid(self, form):
         messages.success(self.request, 'Транзакция успешно обновлена!')
-        return super().form_valid(form)
+        # Транзакция и ее дневной итог сохраняются вместе, с блокировкой записи сразу
+        with write_atomic():
+            return super().form_valid(form)
     
     def form_invalid(self, form):
         messages.error(self.request, 'Пожалуйста, исправьте ошибки в форме.')
@@ -99,67 +175,255 @@ class TransactionUpdateView(UpdateView):
 class TransactionDeleteView(DeleteView):
     """Представление для удаления транзакции"""
     model = Transaction
+    # Страница подтверждения показывает справочники вместе с их родителями
+    queryset = Transaction.objects.select_related(
+        'status', 'transaction_type', 'category__transaction_type',
+        'subcategory__category__transaction_type'
+    )
     template_name = 'dds_app/transaction_confirm_delete.html'
     success_url = reverse_lazy('transaction_list')
     
     def delete(self, request, *args, **kwargs):
         messages.success(request, 'Транзакция успешно удалена!')
         return super().delete(request, *args, **kwargs)
+    
+    def form_valid(self, form):
+        with write_atomic():
+            return super().form_valid(form)
+
+@require_http_methods(['GET', 'POST'])
+def transaction_bulk(request):
+    """Массовое действие над транзакциями: GET показывает, сколько строк будет затронуто, POST выполняет"""
+    form = BulkActionForm(request.POST if request.method == 'POST' else request.GET)
+    valid = form.is_valid()
+    filters = form.cleaned_data.get('filters', '') if valid else form.data.get('filters', '')
+    list_url = reverse('transaction_list') + (f'?{filters}' if filters else '')
+    if not valid:
+        for errors in form.errors.values():
+            messages.error(request, ' '.join(errors))
+        return redirect(list_url)
+    
+    queryset = form.get_queryset()
+    action = form.cleaned_data['action']
+    values = form.get_values() if action != 'delete' else {}
+    if request.method != 'POST':
+        return render(request, 'dds_app/transaction_bulk_confirm.html', {
+            'form': form,
+            'action': action,
+            'action_label': dict(form.ACTION_CHOICES)[action],
+            'values': values,
+            'count': queryset.count(),
+            'list_url': list_url,
+        })
+    
+    if action == 'delete':
+        count = bulk_delete_transactions(queryset)
+        messages.success(request, f'Удалено транзакций: {count}')
+    else:
+        count = bulk_update_transactions(queryset, **values)
+        messages.success(request, f'Изменено транзакций: {count}')
+    return redirect(list_url)
+
+def transaction_count(field):
+    """Подзапрос: число транзакций справочника по дневным итогам (индекс внешнего ключа)"""
+    counts = DailyCashFlowSummary.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(count=Sum('transaction_count')).values('count')
+    return Coalesce(Subquery(counts), 0)
 
 def reference_management(request):
     """Представление для управления справочниками"""
+    # Счетчики использования считаются в тех же запросах, что и сами справочники
     context = {
-        'statuses': Status.objects.all(),
-        'transaction_types': TransactionType.objects.all(),
-        'categories': Category.objects.select_related('transaction_type').all(),
-        'subcategories': Subcategory.objects.select_related('category').all(),
+        'statuses': Status.objects.annotate(transaction_count=transaction_count('status')),
+        'transaction_types': TransactionType.objects.annotate(
+            transaction_count=transaction_count('transaction_type'),
+            category_count=Count('categories'),
+        ),
+        'categories': Category.objects.select_related('transaction_type').annotate(
+            transaction_count=transaction_count('category'),
+            subcategory_count=Count('subcategories'),
+        ),
+        'subcategories': Subcategory.objects.select_related(
+            'category__transaction_type'
+        ).annotate(transaction_count=transaction_count('subcategory')),
     }
     return render(request, 'dds_app/reference_management.html', context)
 
+def reference_tree_etag(request, *args, **kwargs):
+    return get_references().tree_etag
+
+@condition(etag_func=reference_tree_etag)
+def reference_tree(request):
+    """JSON-дерево тип -> категории -> подкатегории для зависимых списков формы"""
+    references = get_references()
+    response = HttpResponse(references.tree_json, content_type='application/json')
+    if request.GET.get('v') == references.tree_etag:
+        # URL с версией неизменен: новая версия справочников получит новый URL
+        patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+def render_reference_options(template_name, context_name, parent_id, children_by_parent):
+    """HTML вариантов выбора для дочерних элементов справочника, отрисованный один раз на снимок"""
+    references = get_references()
+    children = getattr(references, children_by_parent)
+    if parent_id not in children:
+        return render_to_string(template_name, {context_name: []})
+    return references.memoize(
+        (template_name, parent_id),
+        lambda: render_to_string(template_name, {context_name: children[parent_id]})
+    )
+
+@condition(etag_func=reference_tree_etag)
 def load_categories(request):
     """AJAX view для загрузки категорий по типу операции"""
     transaction_type_id = request.GET.get('transaction_type_id')
-    if transaction_type_id:
-        categories = Category.objects.filter(transaction_type_id=transaction_type_id)
-        return render(request, 'dds_app/category_dropdown_options.html', 
-                     {'categories': categories})
+    if transaction_type_id and transaction_type_id.isdigit():
+        return HttpResponse(render_reference_options(
+            'dds_app/category_dropdown_options.html', 'categories',
+            int(transaction_type_id), 'categories_by_type'
+        ))
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
+@condition(etag_func=reference_tree_etag)
 def load_subcategories(request):
     """AJAX view для загрузки подкатегорий по категории"""
     category_id = request.GET.get('category_id')
-    if category_id:
-        subcategories = Subcategory.objects.filter(category_id=category_id)
-        return render(request, 'dds_app/subcategory_dropdown_options.html', 
-                     {'subcategories': subcategories})
+    if category_id and category_id.isdigit():
+        return HttpResponse(render_reference_options(
+            'dds_app/subcategory_dropdown_options.html', 'subcategories',
+            int(category_id), 'subcategories_by_category'
+        ))
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
+def dashboard_totals():
+    """Базовая статистика одним запросом к дневным итогам"""
+    return DailyCashFlowSummary.objects.aggregate(
+        total_income=Coalesce(Sum('total', filter=INCOME_FILTER), Decimal('0')),
+        total_expense=Coalesce(Sum('total', filter=EXPENSE_FILTER), Decimal('0')),
+        total_transactions=Coalesce(Sum('transaction_count'), 0),
+    )
+
+def dashboard_top_categories():
+    """Статистика по категориям: группировка и топ-10 считаются в БД"""
+    return list(Category.objects.annotate(
+        total=Sum('daily_summaries__total'),
+        transaction_count=Sum('daily_summaries__transaction_count'),
+    ).filter(total__gt=0).select_related('transaction_type').order_by('-total', 'name')[:10])
+
+def dashboard_recent_transactions():
+    return list(Transaction.objects.select_related(
+        'status', 'transaction_type', 'category__transaction_type'
+    ).order_by('-created_date')[:5])
+
+def dashboard_context(totals, top_categories, recent_transactions):
+    category_stats = [
+        {
+            'category': category,
+            'total': category.total,
+            'count': category.transaction_count,
+        }
+        for category in top_categories
+    ]
+    return {
+        'total_income': totals['total_income'],
+        'total_expense': totals['total_expense'],
+        'balance': totals['total_income'] - totals['total_expense'],
+        'total_transactions': totals['total_transactions'],
+        'recent_transactions': recent_transactions,
+        'category_stats': category_stats,
+    }
+
+@ledger_condition
 def dashboard(request):
     """Дашборд с общей статистикой"""
-    transactions = Transaction.objects.all()
-    
-    # Базовая статистика
-    total_income = sum(t.amount for t in transactions if t.is_income)
-    total_expense = sum(t.amount for t in transactions if not t.is_income)
-    
-    # Статистика по категориям
-    category_stats = []
-    for category in Category.objects.all():
-        category_total = sum(t.amount for t in transactions if t.category == category)
-        if category_total > 0:
-            category_stats.append({
-                'category': category,
-                'total': category_total,
-                'count': transactions.filter(category=category).count()
-            })
+    context = dashboard_context(
+        dashboard_totals(), dashboard_top_categories(), dashboard_recent_transactions()
+    )
+    return render(request, 'dds_app/dashboard.html', context)
+
+@ledger_condition
+async def dashboard_async(request):
+    """Дашборд для ASGI: независимые запросы статистики выполняются одновременно"""
+    results = await run_queries(
+        dashboard_totals, dashboard_top_categories, dashboard_recent_transactions
+    )
+    # Отрисовка обращается к сессии и пользователю, то есть к ORM
+    return await sync_to_async(render)(
+        request, 'dds_app/dashboard.html', dashboard_context(*results)
+    )
+
+@ledger_condition
+async def transaction_stats(request):
+    """JSON-статистика отфильтрованного списка для ASGI.
+
+    Итоги с остатками, разбивка по категориям и по статусам считаются
+    одновременно, ответ отдается после завершения всех трех запросов.
+    """
+    form = TransactionFilterForm(request.GET)
     
-    context = {
-        'total_income': total_income,
-        'total_expense': total_expense,
-        'balance': total_income - total_expense,
-        'total_transactions': transactions.count(),
-        'recent_transactions': transactions.order_by('-created_date')[:5],
-        'category_stats': sorted(category_stats, key=lambda x: x['total'], reverse=True)[:10]
-    }
+    def prepare():
+        # Проверка формы читает реестр справочников, а выбор таблицы для поиска -
+        # список архивных лет; оба могут обратиться к БД, поэтому вне event loop
+        return form.summaries() if form.is_valid() else None
     
-    return render(request, 'dds_app/dashboard.html', context)
\ No newline at end of file
+    summaries = await sync_to_async(prepare)()
+    if summaries is None:
+        return JsonResponse({'errors': form.errors}, status=400)
+    totals, by_category, by_status = await run_queries(
+        form.totals,
+        lambda: breakdown(summaries, 'category'),
+        lambda: breakdown(summaries, 'status'),
+    )
+    return JsonResponse({
+        'totals': {
+            name: value if name == 'total_count' else str(value)
+            for name, value in totals.items()
+        },
+        'by_category': by_category,
+        'by_status': by_status,
+    })
+
+@ledger_condition
+def report(request):
+    """JSON-отчет: доходы, расходы и сальдо по периодам с разбивкой по справочникам"""
+    form = ReportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    summaries = form.summaries()
+    return JsonResponse(cash_flow_report(
+        summaries, form.cleaned_data['period'], form.cleaned_data['group_by']
+    ))
+
+def ingest_token_valid(request, token):
+    """Токен API загрузки из заголовка Authorization: Bearer"""
+    scheme, _, value = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(value.strip(), token)
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def transaction_ingest(request):
+    """JSON API пакетной загрузки транзакций с ключом идемпотентности в заголовке Idempotency-Key.
+
+    API без CSRF, поэтому без токена в настройках закрыт, пока загрузка
+    без проверки не разрешена явно (DDS_INGEST_ALLOW_ANONYMOUS).
+    """
+    token = getattr(settings, 'DDS_INGEST_TOKEN', '')
+    if token:
+        if not ingest_token_valid(request, token):
+            return JsonResponse({'error': 'Неверный токен'}, status=401)
+    elif not getattr(settings, 'DDS_INGEST_ALLOW_ANONYMOUS', False):
+        return JsonResponse({'error': 'API загрузки не настроено: не задан токен'}, status=503)
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if not key or len(key) > 255:
+        return JsonResponse({'error': 'Нужен заголовок Idempotency-Key до 255 символов'}, status=400)
+    try:
+        status, data, replayed = ingest_batch(key, request.body)
+    except BatchError as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    response = JsonResponse(data, status=status)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
\ No newline at end of file